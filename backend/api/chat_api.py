@@ -1,18 +1,93 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, Response
 from pydantic import BaseModel
-from backend.services.llm_service import LLMIntegrationService
-from backend.services.database_service import DatabaseService
+from backend.services.database_service import AsyncDatabaseService, DatabaseService
+from backend.database.setup import engine, init_async_db
+from backend.services.profiler import ProfileStore, RequestProfiler, init_fastapi_profiling, profiled
+from backend.services.task_queue import TaskQueue, task_metadata
 from backend.config.settings import settings
+from contextlib import asynccontextmanager
+import threading
 import uuid
 
-app = FastAPI(title="Conversational AI Backend", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app):
+    await init_async_db(async_database_service.engine)
+    task_metadata.create_all(engine)
+    task_queue.start()
+    yield
+    task_queue.stop()
+    await async_database_service.close()
 
-# Initialize services
+app = FastAPI(title="Conversational AI Backend", version="1.0.0", lifespan=lifespan)
+
+profiler = RequestProfiler(
+    ProfileStore(settings.PROFILE_DIR, max_profiles=settings.PROFILE_MAX_STORED),
+    token=settings.PROFILE_TOKEN,
+    sample_rate=settings.PROFILE_SAMPLE_RATE,
+    interval=settings.PROFILE_INTERVAL_MS / 1000
+)
+init_fastapi_profiling(app, profiler)
+
+# Initialize services: request handlers read through the async service so a
+# database round trip never blocks the event loop; the sync one writes chat
+# turns (on the thread pool) and backs the task queue's handlers
 database_service = DatabaseService()
-llm_service = LLMIntegrationService(
-    groq_api_key=settings.GROQ_API_KEY,
-    database_service=database_service
+async_database_service = AsyncDatabaseService()
+
+# Interaction rows are written with the reply; database_results too large to
+# keep inline are compressed and stored afterwards. The queue polls the
+# shared sync engine DatabaseService writes through
+task_queue = TaskQueue(
+    lambda: [engine],
+    max_workers=settings.TASK_WORKERS,
+    max_attempts=settings.TASK_MAX_ATTEMPTS,
+    retry_base_seconds=settings.TASK_RETRY_BASE_SECONDS,
+    lease_seconds=settings.TASK_LEASE_SECONDS,
+    poll_seconds=settings.TASK_POLL_SECONDS
 )
+task_queue.register('store_interaction_results')(database_service.store_interaction_results)
+# Drains whole-interaction tasks queued by earlier versions
+task_queue.register('store_interaction')(database_service.store_interaction)
+
+# The LLM client and the chat service (and the HTTP and numpy stacks behind
+# them) are built by the first chat request rather than at import, so the
+# server answers /health sooner after a restart
+_llm_lock = threading.Lock()
+_llm_client = None
+_llm_service = None
+
+def get_llm_service():
+    global _llm_client, _llm_service
+    if _llm_service is None:
+        with _llm_lock:
+            if _llm_service is None:
+                from backend.services.llm_client import CircuitBreaker, ResilientLLMClient
+                from backend.services.llm_service import LLMIntegrationService
+                from backend.services.simple_ai_service import SimpleAIService
+
+                _llm_client = ResilientLLMClient(
+                    api_key=settings.GROQ_API_KEY,
+                    base_url=settings.GROQ_BASE_URL,
+                    model=settings.GROQ_MODEL,
+                    slo_seconds=settings.CHAT_SLO_SECONDS,
+                    pool_size=settings.LLM_POOL_SIZE,
+                    max_retries=settings.LLM_MAX_RETRIES,
+                    min_attempt_seconds=settings.LLM_MIN_ATTEMPT_SECONDS,
+                    breaker=CircuitBreaker(
+                        failure_threshold=settings.LLM_BREAKER_FAILURE_THRESHOLD,
+                        reset_timeout=settings.LLM_BREAKER_RESET_SECONDS
+                    ),
+                    fallback=SimpleAIService().generate_response
+                )
+                _llm_service = LLMIntegrationService(
+                    groq_api_key=settings.GROQ_API_KEY,
+                    database_service=database_service,
+                    llm_client=_llm_client,
+                    task_queue=task_queue
+                )
+    return _llm_service
 
 class ChatRequest(BaseModel):
     message: str
@@ -31,11 +106,13 @@ async def chat_endpoint(request: ChatRequest):
         # Generate conversation ID if not provided
         conversation_id = request.conversation_id or str(uuid.uuid4())
         
-        # Process the message
-        result = llm_service.query_database_and_respond(
-            request.message, 
-            conversation_id
-        )
+        # Process the message. The chat service is synchronous end to end (sync
+        # engine, history read, blocking LLM HTTP calls), so it runs on the
+        # thread pool and the event loop keeps serving other requests meanwhile
+        # (profiled: a profile of this request samples the worker thread)
+        result = await run_in_threadpool(profiled(
+            lambda: get_llm_service().query_database_and_respond(request.message, conversation_id)
+        ))
         
         return ChatResponse(
             response=result["response"],
@@ -51,12 +128,54 @@ async def chat_endpoint(request: ChatRequest):
 async def get_conversation_history(conversation_id: str):
     """Get conversation history"""
     try:
-        history = database_service.get_conversation_history(conversation_id)
+        history = await async_database_service.get_conversation_history(conversation_id)
         return {"conversation_id": conversation_id, "history": history}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/interactions/{interaction_id}/results")
+async def get_interaction_results(interaction_id: int):
+    """Get the database results behind one interaction (not included in history)"""
+    try:
+        results = await async_database_service.get_database_results(interaction_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if results is None:
+        raise HTTPException(status_code=404, detail="Interaction not found")
+    return {"interaction_id": interaction_id, **results}
+
+def require_profile_token(token):
+    if not profiler.token:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not profiler.authorized(token):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+@app.get("/api/admin/profiles")
+async def list_profiles(x_profile: str = Header(None)):
+    """Captured request profiles, newest first"""
+    require_profile_token(x_profile)
+    profiles = profiler.store.list()
+    return {"profiles": profiles, "total": len(profiles), "max_stored": profiler.store.max_profiles}
+
+@app.get("/api/admin/profiles/{profile_id}")
+async def get_profile(profile_id: int, format: str = "svg", x_profile: str = Header(None)):
+    """One profile as an SVG flamegraph, or format=folded for flamegraph tools"""
+    require_profile_token(x_profile)
+    if format not in ("svg", "folded"):
+        raise HTTPException(status_code=400, detail="format must be svg or folded")
+    body = profiler.store.read(profile_id, format)
+    if body is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "svg":
+        return Response(body, media_type="image/svg+xml")
+    return PlainTextResponse(body)
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "Conversational AI Backend"}
\ No newline at end of file
+    return {
+        "status": "healthy",
+        "service": "Conversational AI Backend",
+        # No client yet means no LLM call has been made, so nothing has tripped it
+        "llm_circuit": _llm_client.breaker.state if _llm_client is not None else "closed"
+    }
\ No newline at end of file
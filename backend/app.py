@@ -1,76 +1,569 @@
 # app.py - Milestone 4: Core Chat API Implementation (Fixed)
 
-from flask import Flask, request, jsonify
-from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from flask import Flask, Response, g, request, jsonify
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import DBAPIError
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+import functools
+import threading
+import time
 import uuid
 import os
 
+from config.settings import settings
+from models import ChangeLog, Conversation, ConversationSummary, Message, Product, User, UserSyncState, db
+from services.batch_runner import group_items, run_batch
+from services.compression import init_compression
+from services.conversation_locks import ConversationBusy, ConversationLocks
+from services.http_cache import apply_etag, make_etag, not_modified
+from services.json_provider import get_json_provider_class
+from services.lru_cache import LRUCache
+from services.migrations import latest_version, migrate
+from services.partitions import HISTORY_CLOCK_SKEW, PartitionMaintainer
+from services.product_index import ProductIndex
+from services.profiler import PROFILE_HEADER, ProfileStore, RequestProfiler, init_profiling
+from services.pubsub import create_broker
+from services.query_counter import init_query_counting
+from services.replica_router import RecentWriters, ReplicaSet
+from services.search_service import MessageSearchService
+from services.shard_router import ShardMap
+from services.simple_ai_service import SimpleAIService
+from services.summary_service import RollingSummarizer
+from services.task_queue import TaskQueue
+
 app = Flask(__name__)
+app.json = get_json_provider_class(settings.JSON_PROVIDER)(app)
+init_compression(app, min_size=settings.COMPRESSION_MIN_BYTES, level=settings.COMPRESSION_LEVEL)
+
+# Opt-in sampling profiler: requests with the profiling token in X-Profile,
+# plus PROFILE_SAMPLE_RATE of the rest; no hooks are installed when neither is set
+profiler = RequestProfiler(
+    ProfileStore(settings.PROFILE_DIR, max_profiles=settings.PROFILE_MAX_STORED),
+    token=settings.PROFILE_TOKEN,
+    sample_rate=settings.PROFILE_SAMPLE_RATE,
+    interval=settings.PROFILE_INTERVAL_MS / 1000
+)
+init_profiling(app, profiler)
+
+# Statements and DB time per request: logged over budget or when one statement
+# repeats (N+1), and returned as X-DB-Queries / X-DB-Time-Ms in debug mode
+init_query_counting(
+    app,
+    budget=settings.QUERY_BUDGET,
+    repeat_threshold=settings.QUERY_REPEAT_THRESHOLD,
+    headers={'true': True, 'false': False}.get(settings.QUERY_COUNT_HEADERS)
+)
 
 # Database Configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///conversational_ai.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = settings.DATABASE_URL
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
-
-# Database Models (using SQLAlchemy ORM)
-class User(db.Model):
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    username = db.Column(db.String(80), unique=True, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    conversations = db.relationship('Conversation', backref='user', lazy=True)
-
-class Conversation(db.Model):
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False)
-    title = db.Column(db.String(200), default="New Conversation")
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    messages = db.relationship('Message', backref='conversation', lazy=True, cascade='all, delete-orphan')
-
-class Message(db.Model):
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    conversation_id = db.Column(db.String(36), db.ForeignKey('conversation.id'), nullable=False)
-    content = db.Column(db.Text, nullable=False)
-    role = db.Column(db.String(20), nullable=False)  # 'user' or 'assistant'
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
-    
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'conversation_id': self.conversation_id,
-            'content': self.content,
-            'role': self.role,
-            'timestamp': self.timestamp.isoformat()
-        }
+db.init_app(app)
 
-# Simple AI Response Generator (placeholder for Milestone 5)
-class SimpleAIService:
-    """Simple AI service that generates responses based on user input"""
-    
-    def generate_response(self, user_message, conversation_history=None):
-        """Generate a simple AI response based on user input"""
-        
-        user_message_lower = user_message.lower()
+# Sharding: with SHARD_DATABASE_URLS set, each user's rows live on one shard
+# chosen by ShardMap and every per-user route runs against that shard only
+shards = ShardMap([url.strip() for url in settings.SHARD_DATABASE_URLS.split(',') if url.strip()])
+
+def user_shard_route(view):
+    """Pin the request's session to the shard owning its user or conversation"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if shards:
+            if 'conversation_id' in kwargs:
+                g.db_shard = shards.engine_for_conversation(kwargs['conversation_id'])
+            else:
+                body = request.get_json(silent=True) or {}
+                username = request.args.get('user_id') or body.get('user_id') or 'default_user'
+                conversation_id = body.get('conversation_id')
+                g.db_shard = (shards.engine_for_conversation(conversation_id) if conversation_id
+                              else shards.engine_for_user(username))
+        return view(*args, **kwargs)
+    return wrapper
+
+# Turns on one conversation run one at a time in arrival order, so each sees
+# the previous turn's messages; different conversations don't wait on each other
+conversation_locks = ConversationLocks(
+    stripes=settings.CONVERSATION_LOCK_STRIPES,
+    timeout=settings.CONVERSATION_LOCK_TIMEOUT_SECONDS
+)
+
+def conversation_turn_route(view):
+    """Serialize requests that continue the same conversation (after the shard is pinned)"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        body = request.get_json(silent=True) or {}
+        conversation_id = body.get('conversation_id')
+        if not isinstance(conversation_id, str) or not conversation_id:
+            return view(*args, **kwargs)
+        try:
+            with conversation_locks.hold(conversation_id, db.session):
+                return view(*args, **kwargs)
+        except ConversationBusy as e:
+            db.session.rollback()
+            return jsonify({'error': str(e), 'retry': True}), 409
+    return wrapper
+
+# Read replicas: read-only routes go to a healthy replica unless the client
+# wrote recently (read-your-writes), in which case they stay on the primary
+replicas = ReplicaSet(
+    [url.strip() for url in settings.REPLICA_DATABASE_URLS.split(',') if url.strip()],
+    retry_after=settings.REPLICA_RETRY_SECONDS
+)
+recent_writers = RecentWriters(window=settings.READ_YOUR_WRITES_SECONDS)
+READ_YOUR_WRITES_COOKIE = 'rw_until'
+
+def mark_recent_write(response, username=None):
+    """Pin this client's reads to the primary for the read-your-writes window"""
+    if not replicas:
+        return response
+    if username:
+        recent_writers.record(username)
+    response.set_cookie(
+        READ_YOUR_WRITES_COOKIE,
+        str(time.time() + settings.READ_YOUR_WRITES_SECONDS),
+        max_age=int(settings.READ_YOUR_WRITES_SECONDS) + 1,
+        httponly=True,
+        samesite='Lax'
+    )
+    return response
+
+def read_replica_route(view):
+    """Run a read-only view on a replica, falling back to the primary on failure"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        username = request.args.get('user_id', 'default_user')
+        sticky = (recent_writers.wrote_recently(username)
+                  or request.cookies.get(READ_YOUR_WRITES_COOKIE, 0, type=float) > time.time())
+        # Replicas apply to the unsharded primary only
+        replica = None if sticky or shards or not replicas else replicas.pick()
+        if replica is None:
+            return view(*args, **kwargs)
         
-        # Simple response logic
-        if 'hello' in user_message_lower or 'hi' in user_message_lower:
-            return "Hello! How can I help you today?"
-        elif 'product' in user_message_lower or 'buy' in user_message_lower:
-            return "I can help you find products. We have electronics, accessories, and more. What are you looking for?"
-        elif 'price' in user_message_lower or 'cost' in user_message_lower:
-            return "Our products are competitively priced. Would you like me to check specific item prices for you?"
-        elif 'thank' in user_message_lower:
-            return "You're welcome! Is there anything else I can help you with?"
-        elif 'bye' in user_message_lower or 'goodbye' in user_message_lower:
-            return "Goodbye! Feel free to come back anytime if you need assistance."
-        else:
-            return f"I understand you're asking about: '{user_message}'. Let me help you with that. Could you provide more details about what you're looking for?"
+        g.db_replica = replica
+        try:
+            return view(*args, **kwargs)
+        except DBAPIError as e:
+            print(f"[REPLICA ERROR] {str(e)} - retrying on primary")
+            db.session.rollback()
+            replicas.mark_down(replica)
+            g.db_replica = None
+            return view(*args, **kwargs)
+    return wrapper
+
+# Usernames never change owner, so a resolved id can be cached for the
+# life of the process and a returning user costs no identity query. Each
+# shard has its own users table, so entries are keyed by (shard, username).
+user_ids = LRUCache(max_entries=settings.USER_ID_CACHE_SIZE)
+
+def resolve_user_id(username, create=False):
+    """
+    Map a username to its user id, or None if the user doesn't exist.
+    
+    Looks on the shard the request is pinned to (see user_shard_route).
+    With create=True a missing user is inserted with
+    INSERT ... ON CONFLICT DO NOTHING RETURNING in its own committed
+    transaction, so concurrent first messages from one user can't race on
+    the unique constraint and the id is safe to cache straight away.
+    """
+    shard = g.get('db_shard')
+    cache_key = (shard.url.render_as_string() if shard is not None else None, username)
+    owner_id = user_ids.get(cache_key)
+    if owner_id is not None:
+        return owner_id
+    
+    if create:
+        table = User.__table__
+        engine = db.session.get_bind()
+        insert = sqlite_insert if engine.dialect.name == 'sqlite' else postgresql_insert
+        with engine.begin() as conn:
+            owner_id = conn.execute(
+                insert(table).values(id=str(uuid.uuid4()), username=username, created_at=datetime.utcnow())
+                .on_conflict_do_nothing(index_elements=[table.c.username])
+                .returning(table.c.id)
+            ).scalar()
+            if owner_id is not None:
+                print(f"[API] Created new user: {username}")
+            else:
+                owner_id = conn.execute(db.select(table.c.id).where(table.c.username == username)).scalar_one()
+    else:
+        owner_id = db.session.execute(db.select(User.id).where(User.username == username)).scalar()
+        if owner_id is None:
+            return None
+    
+    user_ids.put(cache_key, owner_id)
+    return owner_id
+
+def record_changes(user_id, changes):
+    """
+    Append (kind, entity_id, conversation_id) changes to the user's change log
+    
+    Returns the sequence number of the last change. Must run inside the
+    transaction that makes the changes. The counter is bumped with a single
+    INSERT ... ON CONFLICT DO UPDATE ... RETURNING, which takes the row (or
+    SQLite database) write lock, so concurrent writers for one user get
+    disjoint ranges and concurrent first changes can't race on the key.
+    """
+    if not changes:
+        return None
+    table = UserSyncState.__table__
+    insert = sqlite_insert if db.session.get_bind().dialect.name == 'sqlite' else postgresql_insert
+    last_seq = db.session.execute(
+        insert(table).values(user_id=user_id, last_seq=len(changes))
+        .on_conflict_do_update(index_elements=[table.c.user_id],
+                               set_={'last_seq': table.c.last_seq + len(changes)})
+        .returning(table.c.last_seq)
+    ).scalar_one()
+    
+    first_seq = last_seq - len(changes) + 1
+    db.session.add_all([
+        ChangeLog(user_id=user_id, seq=first_seq + i, kind=kind, entity_id=entity_id, conversation_id=conversation_id)
+        for i, (kind, entity_id, conversation_id) in enumerate(changes)
+    ])
+    return last_seq
+
+def conversation_metadata(conv):
+    return {
+        'id': conv.id,
+        'title': conv.title,
+        'created_at': conv.created_at,
+        'updated_at': conv.updated_at
+    }
+
+def message_history(conversation):
+    """
+    Messages of a conversation, bounded below by its creation time
+    
+    On Postgres messages are partitioned by month; the timestamp bound lets
+    the planner skip every partition older than the conversation instead of
+    probing each month's index.
+    """
+    return Message.query.filter(
+        Message.conversation_id == conversation.id,
+        Message.timestamp >= conversation.created_at - HISTORY_CLOCK_SKEW
+    )
+
+# Product retrieval: the catalog is indexed in memory and kept current by
+# polling for rows newer than the last one indexed (CSV loads only insert).
+# The first full load runs on the refresher thread so the server answers
+# before a large catalog is indexed; until then replies carry no products
+product_index = ProductIndex()
+product_index_ready = threading.Event()
+_product_watermark = None
+
+def sync_product_index(batch_size=50000):
+    """Index products added since the last sync (the whole catalog the first time)"""
+    global _product_watermark
+    table = Product.__table__
+    query = db.select(table).order_by(table.c.created_at)
+    if _product_watermark is not None:
+        # >= so rows sharing the watermark's timestamp aren't skipped; already indexed ids are
+        query = query.where(table.c.created_at >= _product_watermark)
+    
+    added = 0
+    with db.engine.connect() as conn:
+        result = conn.execution_options(stream_results=True).execute(query).mappings()
+        for batch in result.partitions(batch_size):
+            added += product_index.add(dict(row) for row in batch if row['id'] not in product_index)
+            _product_watermark = batch[-1]['created_at'] or _product_watermark
+    return added
+
+def run_product_index_refresher():
+    while True:
+        try:
+            with app.app_context():
+                added = sync_product_index()
+            if not product_index_ready.is_set():
+                product_index_ready.set()
+                print(f"✅ Product index ready ({len(product_index)} products)!")
+            elif added:
+                print(f"[PRODUCTS] Indexed {added} new products ({len(product_index)} total)")
+        except Exception as e:
+            print(f"[PRODUCTS ERROR] {str(e)}")
+        time.sleep(settings.PRODUCT_INDEX_REFRESH_SECONDS)
+
+def run_partition_maintenance():
+    """Create upcoming monthly message partitions and expire old ones (Postgres only)"""
+    while True:
+        try:
+            for engine in task_engines():
+                result = PartitionMaintainer(
+                    engine, months_ahead=settings.PARTITION_MONTHS_AHEAD,
+                    retention_months=settings.MESSAGE_RETENTION_MONTHS, drop=settings.PARTITION_DROP_EXPIRED
+                ).run()
+                if result['created'] or result['expired']:
+                    print(f"[PARTITIONS] Created {result['created']}, expired {result['expired']}")
+        except Exception as e:
+            print(f"[PARTITIONS ERROR] {str(e)}")
+        time.sleep(settings.PARTITION_MAINTENANCE_SECONDS)
+
+def prune_change_log(engine, older_than, batch_size):
+    """
+    Delete sync changes created before `older_than`, in batches
+    
+    A user's newest change is always kept, so /api/sync can tell a cursor
+    that fell behind the retained log (it must resync) from one that is
+    simply up to date. Returns the number of rows deleted.
+    """
+    table, state = ChangeLog.__table__, UserSyncState.__table__
+    expired = db.select(table.c.user_id, table.c.seq).where(
+        table.c.created_at < older_than,
+        table.c.seq < db.select(state.c.last_seq).where(state.c.user_id == table.c.user_id).scalar_subquery()
+    ).limit(batch_size)
+    deleted = 0
+    while True:
+        with engine.begin() as conn:
+            count = conn.execute(table.delete().where(
+                db.tuple_(table.c.user_id, table.c.seq).in_(expired)
+            )).rowcount
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+def run_change_log_retention():
+    """Prune sync changes older than CHANGE_LOG_RETENTION_DAYS on every database"""
+    while True:
+        try:
+            older_than = datetime.utcnow() - timedelta(days=settings.CHANGE_LOG_RETENTION_DAYS)
+            for engine in task_engines():
+                deleted = prune_change_log(engine, older_than, settings.CHANGE_LOG_PRUNE_BATCH)
+                if deleted:
+                    print(f"[SYNC] Pruned {deleted} expired changes")
+        except Exception as e:
+            print(f"[SYNC ERROR] {str(e)}")
+        time.sleep(settings.CHANGE_LOG_PRUNE_SECONDS)
+
+ai_service = SimpleAIService(product_index=product_index, product_results=settings.PRODUCT_RESULTS)
+broker = create_broker(settings.PUBSUB_URL, settings.PUBSUB_AUTHKEY.encode())
+
+def publish_user_event(user_id, event):
+    """Push an event to the user's live subscribers; never fails the request"""
+    try:
+        broker.publish(f"user:{user_id}", event)
+    except Exception as e:
+        print(f"[PUSH ERROR] {str(e)}")
+summarizer = RollingSummarizer(max_chars=settings.SUMMARY_MAX_CHARS)
+
+# Deferred work (titles, summary folds) runs after the response on a bounded
+# pool; chat() enqueues it in its own transaction and it is retried until done
+def task_engines():
+    with app.app_context():
+        return shards.engines if shards else [db.engine]
+
+task_queue = TaskQueue(
+    task_engines,
+    max_workers=settings.TASK_WORKERS,
+    max_attempts=settings.TASK_MAX_ATTEMPTS,
+    retry_base_seconds=settings.TASK_RETRY_BASE_SECONDS,
+    lease_seconds=settings.TASK_LEASE_SECONDS,
+    poll_seconds=settings.TASK_POLL_SECONDS
+)
 
-ai_service = SimpleAIService()
+def conversation_task(name):
+    """Register a task handler that runs in an app context pinned to its conversation's shard"""
+    def decorator(handler):
+        @task_queue.register(name)
+        @functools.wraps(handler)
+        def run(payload):
+            with app.app_context():
+                if shards:
+                    g.db_shard = shards.engine_for_conversation(payload['conversation_id'])
+                try:
+                    handler(**payload)
+                except Exception:
+                    db.session.rollback()
+                    raise
+                finally:
+                    db.session.remove()
+        return run
+    return decorator
+
+@conversation_task('conversation_summary')
+def update_conversation_summary(conversation_id):
+    """Fold every message older than the recent window into the rolling summary"""
+    conversation = Conversation.query.get(conversation_id)
+    if conversation is None:
+        return  # deleted before the task ran
+    summary = ConversationSummary.query.get(conversation_id)
+    if not summary:
+        summary = ConversationSummary(conversation_id=conversation_id, summary='', summarized_count=0)
+        db.session.add(summary)
+    
+    total = message_history(conversation).count()
+    fold_count = total - settings.SUMMARY_KEEP_RECENT - summary.summarized_count
+    if fold_count <= 0:
+        return
+    
+    older = message_history(conversation).order_by(Message.timestamp.asc()).offset(summary.summarized_count).limit(fold_count).all()
+    
+    summary.summary = summarizer.fold(summary.summary, [msg.to_dict() for msg in older])
+    summary.summarized_count += len(older)
+    db.session.commit()
+    print(f"[SUMMARY] Folded {len(older)} messages into summary for {conversation_id}")
+
+@conversation_task('conversation_title')
+def generate_conversation_title(conversation_id):
+    """Replace the placeholder title with one drawn from the opening message"""
+    conversation = Conversation.query.get(conversation_id)
+    if conversation is None:
+        return  # deleted before the task ran
+    first = message_history(conversation).filter_by(role='user').order_by(Message.timestamp.asc()).first()
+    if first is None:
+        return
+    title = ai_service.generate_title(first.content)
+    if title == conversation.title:
+        return
+    
+    # A title isn't activity; keep updated_at so the listing order doesn't change
+    db.session.execute(
+        db.update(Conversation).where(Conversation.id == conversation_id)
+        .values(title=title, updated_at=Conversation.updated_at)
+    )
+    change_seq = record_changes(conversation.user_id, [('conversation', conversation_id, conversation_id)])
+    db.session.commit()
+    db.session.refresh(conversation)
+    publish_user_event(conversation.user_id, {
+        'type': 'conversation',
+        'cursor': change_seq,
+        'conversation': conversation_metadata(conversation)
+    })
+
+class ConversationNotFound(Exception):
+    pass
+
+def process_chat_turn(user_message, conversation_id=None, user_id='default_user'):
+    """
+    One chat turn in the current session, flushed but not committed
+    
+    Returns the turn's state for finish_chat_turns() and chat_turn_response()
+    once the caller commits. Raises ConversationNotFound for an unknown
+    conversation_id.
+    """
+    print(f"[API] Received message from {user_id}: {user_message[:50]}...")
+    
+    # Steps 1-2: Get or create user (cached after the first message) and conversation.
+    # Only a new conversation creates the user: an unknown or someone else's
+    # conversation_id must not leave a user row behind (on that conversation's shard).
+    if conversation_id:
+        owner_id = resolve_user_id(user_id)
+        conversation = Conversation.query.filter_by(
+            id=conversation_id, 
+            user_id=owner_id
+        ).first() if owner_id is not None else None
+        if not conversation:
+            raise ConversationNotFound(conversation_id)
+        print(f"[API] Using existing conversation: {conversation_id}")
+    else:
+        owner_id = resolve_user_id(user_id, create=True)
+        # Create new conversation
+        conversation = Conversation(
+            id=ShardMap.conversation_id_for(user_id),
+            user_id=owner_id,
+            title=f"Chat - {datetime.utcnow().strftime('%Y-%m-%d %H:%M')}"
+        )
+        db.session.add(conversation)
+        db.session.flush()  # Get the ID without committing
+        print(f"[API] Created new conversation: {conversation.id}")
+    
+    # Step 3: Build context from the rolling summary and the most recent turns
+    summary = ConversationSummary.query.get(conversation.id)
+    summarized_count = summary.summarized_count if summary else 0
+    
+    history_count = message_history(conversation).count()
+    recent = message_history(conversation).order_by(Message.timestamp.desc()).limit(
+        min(max(history_count - summarized_count, 0), settings.SUMMARY_TRIGGER_MESSAGES)
+    ).all()
+    
+    conversation_context = summarizer.build_context(
+        summary.summary if summary else None,
+        [msg.to_dict() for msg in reversed(recent)]
+    )
+    
+    # Step 4: Save user message to database
+    user_msg = Message(
+        conversation_id=conversation.id,
+        content=user_message,
+        role='user'
+    )
+    db.session.add(user_msg)
+    
+    # Step 5: Generate AI response
+    ai_response = ai_service.generate_response(user_message, conversation_context)
+    print(f"[API] Generated AI response: {ai_response[:50]}...")
+    
+    # Step 6: Save AI response to database
+    ai_msg = Message(
+        conversation_id=conversation.id,
+        content=ai_response,
+        role='assistant'
+    )
+    db.session.add(ai_msg)
+    
+    # Step 7: Update conversation timestamp
+    conversation.updated_at = datetime.utcnow()
+    
+    # Step 7b: Record the changes for delta-sync clients
+    db.session.flush()
+    change_seq = record_changes(owner_id, [
+        ('conversation', conversation.id, conversation.id),
+        ('message', user_msg.id, conversation.id),
+        ('message', ai_msg.id, conversation.id)
+    ])
+    
+    # Step 7c: Deferred work, committed with the messages and run after the response
+    if not conversation_id:
+        task_queue.enqueue(db.session, 'conversation_title', {'conversation_id': conversation.id})
+    # Fold older turns once the unsummarized tail crosses the threshold
+    if history_count + 2 - summarized_count > settings.SUMMARY_TRIGGER_MESSAGES:
+        task_queue.enqueue(db.session, 'conversation_summary', {'conversation_id': conversation.id},
+                           dedupe_key=f"summary:{conversation.id}")
+    
+    return {
+        'owner_id': owner_id,
+        'conversation': conversation,
+        'user_msg': user_msg,
+        'ai_msg': ai_msg,
+        'history_count': history_count,
+        'change_seq': change_seq
+    }
+
+def finish_chat_turns(turns):
+    """After the turns' transaction commits: start their tasks and push them to clients"""
+    task_queue.notify()
+    for turn in turns:
+        user_msg, ai_msg = turn['user_msg'], turn['ai_msg']
+        publish_user_event(turn['owner_id'], {
+            'type': 'messages',
+            'cursor': turn['change_seq'],
+            'conversation': conversation_metadata(turn['conversation']),
+            'messages': [user_msg.to_dict(), ai_msg.to_dict()]
+        })
+
+def chat_turn_response(turn):
+    user_msg, ai_msg, conversation = turn['user_msg'], turn['ai_msg'], turn['conversation']
+    return {
+        'success': True,
+        'conversation_id': conversation.id,
+        'user_message': {
+            'id': user_msg.id,
+            'content': user_msg.content,
+            'role': 'user',
+            'timestamp': user_msg.timestamp.isoformat()
+        },
+        'ai_response': {
+            'id': ai_msg.id,
+            'content': ai_msg.content,
+            'role': 'assistant',
+            'timestamp': ai_msg.timestamp.isoformat()
+        },
+        'conversation_title': conversation.title,
+        'message_count': turn['history_count'] + 2  # Previous messages + new user message + AI response
+    }
 
 # MILESTONE 4: PRIMARY CHAT API ENDPOINT
 @app.route('/api/chat', methods=['POST'])
+@user_shard_route
+@conversation_turn_route
 def chat():
     """
     Primary REST API endpoint for chat functionality
@@ -93,95 +586,20 @@ def chat():
         if 'message' not in data or not data['message'].strip():
             return jsonify({'error': 'Message is required and cannot be empty'}), 400
         
-        user_message = data['message'].strip()
-        conversation_id = data.get('conversation_id')
         user_id = data.get('user_id', 'default_user')
         
-        print(f"[API] Received message from {user_id}: {user_message[:50]}...")
-        
-        # Step 1: Get or create user
-        user = User.query.filter_by(username=user_id).first()
-        if not user:
-            user = User(username=user_id)
-            db.session.add(user)
-            db.session.flush()  # Get the ID without committing
-            print(f"[API] Created new user: {user_id}")
-        
-        # Step 2: Get or create conversation
-        if conversation_id:
-            conversation = Conversation.query.filter_by(
-                id=conversation_id, 
-                user_id=user.id
-            ).first()
-            if not conversation:
-                return jsonify({'error': 'Conversation not found'}), 404
-            print(f"[API] Using existing conversation: {conversation_id}")
-        else:
-            # Create new conversation
-            conversation = Conversation(
-                user_id=user.id,
-                title=f"Chat - {datetime.utcnow().strftime('%Y-%m-%d %H:%M')}"
-            )
-            db.session.add(conversation)
-            db.session.flush()  # Get the ID without committing
-            print(f"[API] Created new conversation: {conversation.id}")
-        
-        # Step 3: Get conversation history for context
-        history = Message.query.filter_by(
-            conversation_id=conversation.id
-        ).order_by(Message.timestamp.asc()).all()
-        
-        conversation_context = [msg.to_dict() for msg in history]
-        
-        # Step 4: Save user message to database
-        user_msg = Message(
-            conversation_id=conversation.id,
-            content=user_message,
-            role='user'
-        )
-        db.session.add(user_msg)
-        
-        # Step 5: Generate AI response
-        ai_response = ai_service.generate_response(user_message, conversation_context)
-        print(f"[API] Generated AI response: {ai_response[:50]}...")
-        
-        # Step 6: Save AI response to database
-        ai_msg = Message(
-            conversation_id=conversation.id,
-            content=ai_response,
-            role='assistant'
-        )
-        db.session.add(ai_msg)
-        
-        # Step 7: Update conversation timestamp
-        conversation.updated_at = datetime.utcnow()
+        try:
+            turn = process_chat_turn(data['message'].strip(), data.get('conversation_id'), user_id)
+        except ConversationNotFound:
+            return jsonify({'error': 'Conversation not found'}), 404
         
         # Step 8: Commit all changes to database
         db.session.commit()
-        
         print(f"[API] Successfully persisted messages to database")
+        finish_chat_turns([turn])
         
         # Step 9: Return response
-        response_data = {
-            'success': True,
-            'conversation_id': conversation.id,
-            'user_message': {
-                'id': user_msg.id,
-                'content': user_message,
-                'role': 'user',
-                'timestamp': user_msg.timestamp.isoformat()
-            },
-            'ai_response': {
-                'id': ai_msg.id,
-                'content': ai_response,
-                'role': 'assistant',
-                'timestamp': ai_msg.timestamp.isoformat()
-            },
-            'conversation_title': conversation.title,
-            'message_count': len(history) + 2  # Previous messages + new user message + AI response
-        }
-        
-        return jsonify(response_data), 200
+        return mark_recent_write(jsonify(chat_turn_response(turn)), user_id), 200
         
     except Exception as e:
         # Rollback database changes on error
@@ -192,67 +610,232 @@ def chat():
             'error': f'Internal server error: {str(e)}'
         }), 500
 
+# SQLite allows one writer and fails transactions that upgrade from read to
+# write while another is open, so batch workers there take turns per chunk
+sqlite_batch_lock = threading.Lock()
+
+def run_batch_group(group, emit):
+    """
+    Run one conversation's batch items in order on a worker thread
+    
+    Turns are committed every BATCH_COMMIT_SIZE items instead of one by one;
+    each item runs in a savepoint so a failing item doesn't undo the others.
+    """
+    first = group[0][1]
+    user_id = first.get('user_id') or 'default_user'
+    conversation_id = first.get('conversation_id')
+    with app.app_context():
+        if shards:
+            g.db_shard = (shards.engine_for_conversation(conversation_id) if conversation_id
+                          else shards.engine_for_user(user_id))
+        writer = sqlite_batch_lock if db.session.get_bind().dialect.name == 'sqlite' else nullcontext()
+        try:
+            for offset in range(0, len(group), settings.BATCH_COMMIT_SIZE):
+                chunk, pending = group[offset:offset + settings.BATCH_COMMIT_SIZE], []
+                lock = conversation_locks.hold(conversation_id, db.session) if conversation_id else nullcontext()
+                with lock, writer:
+                    for index, item in chunk:
+                        started = time.perf_counter()
+                        message = item.get('message')
+                        if not isinstance(message, str) or not message.strip():
+                            emit({'index': index, 'id': item.get('id'), 'status': 400,
+                                  'error': 'Message is required and cannot be empty'})
+                            continue
+                        try:
+                            with db.session.begin_nested():
+                                turn = process_chat_turn(message.strip(), conversation_id, user_id)
+                        except ConversationNotFound:
+                            emit({'index': index, 'id': item.get('id'), 'status': 404, 'error': 'Conversation not found'})
+                            continue
+                        except Exception as e:
+                            print(f"[BATCH ERROR] Item {index}: {str(e)}")
+                            emit({'index': index, 'id': item.get('id'), 'status': 500,
+                                  'error': f'Internal server error: {str(e)}'})
+                            continue
+                        # Later items continue the conversation the first one created
+                        conversation_id = turn['conversation'].id
+                        pending.append((index, item, turn, started))
+                    db.session.commit()
+                finish_chat_turns([turn for _, _, turn, _ in pending])
+                for index, item, turn, started in pending:
+                    emit({'index': index, 'id': item.get('id'), 'status': 200,
+                          'latency_ms': round((time.perf_counter() - started) * 1000, 1),
+                          **chat_turn_response(turn)})
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            db.session.remove()
+
+@app.route('/api/chat/batch', methods=['POST'])
+def chat_batch():
+    """
+    Run many chat turns at once and stream each result as it completes
+    
+    Accepts:
+    - items (required): list of {message, conversation_id?, conversation?, user_id?, id?}.
+      Items sharing a conversation_id, or a `conversation` label for a new
+      conversation the batch creates, run in order; different conversations
+      run concurrently on a worker pool
+    - user_id (optional): default for items without one
+    - workers (optional): pool size, at most BATCH_WORKERS
+    
+    Returns:
+    - NDJSON: one line per item in completion order, with its `index`, your
+      `id`, `status` and the /api/chat response fields or an `error`, then
+      a `summary` line with throughput and latency percentiles
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'items must be a non-empty list'}), 400
+    if len(items) > settings.BATCH_MAX_ITEMS:
+        return jsonify({'error': f'At most {settings.BATCH_MAX_ITEMS} items per batch'}), 400
+    if not all(isinstance(item, dict) for item in items):
+        return jsonify({'error': 'Every item must be an object'}), 400
+    
+    default_user = data.get('user_id', 'default_user')
+    items = [{**item, 'user_id': item.get('user_id') or default_user} for item in items]
+    try:
+        workers = int(data.get('workers') or settings.BATCH_WORKERS)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'workers must be an integer'}), 400
+    workers = min(max(workers, 1), settings.BATCH_WORKERS)
+    groups = group_items(items)
+    print(f"[BATCH] {len(items)} items in {len(groups)} conversations on {workers} workers")
+    
+    def generate():
+        for result in run_batch(groups, run_batch_group, workers=min(workers, len(groups))):
+            yield app.json.dumps(result) + '\n'
+    
+    return mark_recent_write(Response(generate(), mimetype='application/x-ndjson'), default_user)
+
 # Additional API endpoints for conversation management
 @app.route('/api/conversations', methods=['GET'])
+@user_shard_route
+@read_replica_route
 def get_conversations():
     """Get all conversations for a user"""
     user_id = request.args.get('user_id', 'default_user')
     
-    user = User.query.filter_by(username=user_id).first()
-    if not user:
+    owner_id = resolve_user_id(user_id)
+    if owner_id is None:
         return jsonify({'conversations': []})
     
-    conversations = Conversation.query.filter_by(user_id=user.id).order_by(
-        Conversation.updated_at.desc()
-    ).all()
+    # Fingerprint the listing with one aggregate query so a revalidation
+    # can be answered with 304 before the per-conversation work below. The
+    # user's change sequence covers edits that leave updated_at alone (titles)
+    change_seq = db.select(UserSyncState.last_seq).where(UserSyncState.user_id == owner_id).scalar_subquery()
+    conversation_count, last_updated, message_count, last_seq = db.session.query(
+        db.func.count(db.distinct(Conversation.id)),
+        db.func.max(Conversation.updated_at),
+        db.func.count(Message.id),
+        change_seq
+    ).select_from(Conversation).outerjoin(
+        Message, Message.conversation_id == Conversation.id
+    ).filter(Conversation.user_id == owner_id).one()
+    
+    etag = make_etag('conversations', owner_id, conversation_count, last_updated, message_count, last_seq)
+    if not_modified(request, etag):
+        return apply_etag(app.response_class(status=304), etag)
+    
+    # Counts and last messages come from correlated subqueries in the same
+    # statement; each is an index range on (conversation_id, timestamp, id)
+    message_count = db.select(db.func.count(Message.id)).where(
+        Message.conversation_id == Conversation.id
+    ).correlate(Conversation).scalar_subquery()
+    last_message_id = db.select(Message.id).where(
+        Message.conversation_id == Conversation.id
+    ).order_by(Message.timestamp.desc(), Message.id.desc()).limit(1).correlate(Conversation).scalar_subquery()
+    last_message = db.aliased(Message)
+    rows = db.session.query(
+        Conversation, message_count.label('message_count'), last_message.content, last_message.role
+    ).outerjoin(last_message, last_message.id == last_message_id).filter(
+        Conversation.user_id == owner_id
+    ).order_by(Conversation.updated_at.desc()).all()
     
     result = []
-    for conv in conversations:
-        # Get message count
-        message_count = Message.query.filter_by(conversation_id=conv.id).count()
-        
-        # Get last message
-        last_message = Message.query.filter_by(
-            conversation_id=conv.id
-        ).order_by(Message.timestamp.desc()).first()
-        
+    for conv, message_count, last_content, last_role in rows:
         result.append({
             'id': conv.id,
             'title': conv.title,
             'created_at': conv.created_at.isoformat(),
             'updated_at': conv.updated_at.isoformat(),
             'message_count': message_count,
-            'last_message': last_message.content[:100] + '...' if last_message and len(last_message.content) > 100 else (last_message.content if last_message else None),
-            'last_message_role': last_message.role if last_message else None
+            'last_message': last_content[:100] + '...' if last_content and len(last_content) > 100 else last_content,
+            'last_message_role': last_role
         })
     
-    return jsonify({
+    return apply_etag(jsonify({
         'user_id': user_id,
         'conversations': result,
         'total_conversations': len(result)
-    })
+    }), etag)
 
 @app.route('/api/conversations/<conversation_id>/messages', methods=['GET'])
+@user_shard_route
+@read_replica_route
 def get_conversation_messages(conversation_id):
-    """Get all messages in a conversation"""
+    """
+    Get messages in a conversation
+    
+    Without query parameters the full history is returned. With `limit`
+    the newest page is returned, and `before=<message_id>` pages further
+    back; each page is in chronological order.
+    """
     conversation = Conversation.query.get(conversation_id)
     if not conversation:
         return jsonify({'error': 'Conversation not found'}), 404
     
-    messages = Message.query.filter_by(
-        conversation_id=conversation_id
-    ).order_by(Message.timestamp.asc()).all()
+    limit = request.args.get('limit', type=int)
+    before_id = request.args.get('before')
     
-    result = [msg.to_dict() for msg in messages]
+    message_count = message_history(conversation).count()
+    etag = make_etag('messages', conversation.id, conversation.updated_at, conversation.title, message_count,
+                     limit, before_id)
+    if not_modified(request, etag):
+        return apply_etag(app.response_class(status=304), etag)
     
-    return jsonify({
+    if limit is None and not before_id:
+        messages = message_history(conversation).order_by(Message.timestamp.asc()).all()
+        
+        result = [msg.to_dict() for msg in messages]
+        
+        return apply_etag(jsonify({
+            'conversation_id': conversation_id,
+            'conversation_title': conversation.title,
+            'messages': result,
+            'total_messages': len(result)
+        }), etag)
+    
+    limit = min(max(limit or 50, 1), 500)
+    query = message_history(conversation)
+    
+    if before_id:
+        cursor = message_history(conversation).filter_by(id=before_id).first()
+        if not cursor:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        # Keyset pagination on (timestamp, id) so ties don't skip rows
+        query = query.filter(db.or_(
+            Message.timestamp < cursor.timestamp,
+            db.and_(Message.timestamp == cursor.timestamp, Message.id < cursor.id)
+        ))
+    
+    page = query.order_by(Message.timestamp.desc(), Message.id.desc()).limit(limit + 1).all()
+    has_more = len(page) > limit
+    page = list(reversed(page[:limit]))
+    
+    return apply_etag(jsonify({
         'conversation_id': conversation_id,
         'conversation_title': conversation.title,
-        'messages': result,
-        'total_messages': len(result)
-    })
+        'messages': [msg.to_dict() for msg in page],
+        'has_more': has_more,
+        'next_before': page[0].id if has_more and page else None,
+        'total_messages': message_count
+    }), etag)
 
 @app.route('/api/conversations/<conversation_id>', methods=['DELETE'])
+@user_shard_route
 def delete_conversation(conversation_id):
     """Delete a conversation and all its messages"""
     conversation = Conversation.query.get(conversation_id)
@@ -260,37 +843,232 @@ def delete_conversation(conversation_id):
         return jsonify({'error': 'Conversation not found'}), 404
     
     # Delete conversation (messages will be deleted automatically due to cascade)
+    owner_id = conversation.user_id
+    change_seq = record_changes(owner_id, [('conversation_deleted', conversation.id, conversation.id)])
     db.session.delete(conversation)
     db.session.commit()
     
-    return jsonify({
+    publish_user_event(owner_id, {
+        'type': 'conversation_deleted',
+        'cursor': change_seq,
+        'conversation_id': conversation_id
+    })
+    
+    return mark_recent_write(jsonify({
         'success': True,
         'message': 'Conversation deleted successfully',
         'conversation_id': conversation_id
+    }))
+
+@app.route('/api/sync', methods=['GET'])
+@user_shard_route
+@read_replica_route
+def sync_changes():
+    """
+    Delta sync across all of a user's conversations
+    
+    Returns the messages and conversation metadata changed after the
+    client's `since` cursor, plus the cursor to send next time. Old changes
+    are pruned (CHANGE_LOG_RETENTION_DAYS); a cursor older than the retained
+    log gets `resync: true` and the current cursor, and the client reloads
+    its conversations instead of applying a delta.
+    """
+    user_id = request.args.get('user_id', 'default_user')
+    since = request.args.get('since', 0, type=int)
+    limit = min(max(request.args.get('limit', 500, type=int), 1), 5000)
+    
+    owner_id = resolve_user_id(user_id)
+    if owner_id is None:
+        return jsonify({'user_id': user_id, 'cursor': since, 'has_more': False, 'resync': False,
+                        'conversations': [], 'deleted_conversations': [], 'messages': []})
+    
+    changes = ChangeLog.query.filter(
+        ChangeLog.user_id == owner_id,
+        ChangeLog.seq > since
+    ).order_by(ChangeLog.seq.asc()).limit(limit + 1).all()
+    
+    # Sequence numbers have no holes, so a gap after the cursor means those changes were pruned
+    if changes and changes[0].seq > since + 1:
+        state = UserSyncState.query.get(owner_id)
+        return jsonify({'user_id': user_id, 'cursor': state.last_seq, 'has_more': False, 'resync': True,
+                        'conversations': [], 'deleted_conversations': [], 'messages': []})
+    
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    
+    # Later changes to the same conversation supersede earlier ones
+    conversation_ids, deleted_ids, message_ids = {}, {}, []
+    for change in changes:
+        if change.kind == 'conversation':
+            conversation_ids[change.entity_id] = True
+            deleted_ids.pop(change.entity_id, None)
+        elif change.kind == 'conversation_deleted':
+            deleted_ids[change.entity_id] = True
+            conversation_ids.pop(change.entity_id, None)
+        elif change.kind == 'message':
+            message_ids.append(change.entity_id)
+    
+    conversations = Conversation.query.filter(
+        Conversation.id.in_(list(conversation_ids))
+    ).all() if conversation_ids else []
+    messages = Message.query.filter(
+        Message.id.in_(message_ids)
+    ).order_by(Message.timestamp.asc()).all() if message_ids else []
+    
+    return jsonify({
+        'user_id': user_id,
+        'cursor': changes[-1].seq if changes else since,
+        'has_more': has_more,
+        'resync': False,
+        'conversations': [conversation_metadata(conv) for conv in conversations],
+        'deleted_conversations': list(deleted_ids),
+        'messages': [msg.to_dict() for msg in messages if msg.conversation_id not in deleted_ids]
+    })
+
+@app.route('/api/events', methods=['GET'])
+@user_shard_route
+def stream_events():
+    """
+    Server-Sent Events stream of the user's new messages and conversation changes
+    
+    Each event id is the change cursor. On reconnect (Last-Event-ID or
+    `since`) a `resync` event tells the client to catch up via /api/sync.
+    """
+    user_id = request.args.get('user_id', 'default_user')
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', type=int)
+    
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    owner_id = resolve_user_id(user_id)
+    if owner_id is None:
+        # Nothing to push until the first message creates the user. An empty
+        # 200 stream makes EventSource reconnect after `retry`; an error would
+        # close it for good.
+        return Response("retry: 3000\n\n", mimetype='text/event-stream', headers=headers)
+    
+    # Subscribe before reading the counter so no change falls in between
+    subscription = broker.subscribe(f"user:{owner_id}")
+    state = UserSyncState.query.get(owner_id)
+    last_seq = state.last_seq if state else 0
+    db.session.remove()  # don't hold a connection for the life of the stream
+    
+    def format_event(event_type, data, event_id=None):
+        prefix = f"id: {event_id}\n" if event_id is not None else ''
+        return f"{prefix}event: {event_type}\ndata: {app.json.dumps(data)}\n\n"
+    
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            if since is not None and last_seq > since:
+                yield format_event('resync', {'since': since, 'cursor': last_seq}, last_seq)
+            while True:
+                event = subscription.get(timeout=settings.PUSH_HEARTBEAT_SECONDS)
+                if event is None:
+                    yield ": keepalive\n\n"
+                elif event['cursor'] > last_seq:
+                    yield format_event(event['type'], event, event['cursor'])
+        finally:
+            subscription.close()
+    
+    return Response(generate(), mimetype='text/event-stream', headers=headers)
+
+@app.route('/api/search', methods=['GET'])
+@user_shard_route
+@read_replica_route
+def search_messages():
+    """Full-text search over a user's messages, ranked with highlighted snippets"""
+    user_id = request.args.get('user_id', 'default_user')
+    query = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    
+    if not query:
+        return jsonify({'error': 'Query parameter q is required'}), 400
+    
+    owner_id = resolve_user_id(user_id)
+    if owner_id is None:
+        return jsonify({'user_id': user_id, 'query': query, 'results': [], 'has_more': False})
+    
+    # Fetch one extra row to know whether another page exists
+    results = MessageSearchService(db.engine).search(db.session, owner_id, query, limit + 1, offset)
+    
+    return jsonify({
+        'user_id': user_id,
+        'query': query,
+        'results': results[:limit],
+        'offset': offset,
+        'has_more': len(results) > limit
     })
 
 # Health check endpoint
 @app.route('/api/health', methods=['GET'])
+@read_replica_route
 def health_check():
     """Health check endpoint"""
     try:
-        # Test database connection
-        user_count = User.query.count()
+        # Test database connection (every shard, when sharded)
+        if shards:
+            def count_users(engine):
+                with engine.connect() as conn:
+                    return conn.execute(db.select(db.func.count()).select_from(User.__table__)).scalar_one()
+            user_count = sum(shards.scatter(count_users))
+        else:
+            user_count = User.query.count()
         
         return jsonify({
             'status': 'healthy',
             'timestamp': datetime.utcnow().isoformat(),
             'version': '1.0.0',
             'database_connected': True,
-            'total_users': user_count
+            'total_users': user_count,
+            'read_source': 'replica' if g.get('db_replica') is not None else 'primary',
+            'replicas': replicas.status(),
+            'shards': len(shards),
+            'user_id_cache': user_ids.stats(),
+            'background_tasks': task_queue.stats,
+            'conversation_locks': conversation_locks.stats(),
+            'product_index': {'ready': product_index_ready.is_set(), 'products': len(product_index)}
         })
     except Exception as e:
+        if isinstance(e, DBAPIError) and g.get('db_replica') is not None:
+            raise  # read_replica_route marks the replica down and retries on the primary
         return jsonify({
             'status': 'unhealthy',
             'error': str(e),
             'timestamp': datetime.utcnow().isoformat()
         }), 500
 
+def admin_route(view):
+    """Admin endpoints exist only when a profiling token is configured, and require it"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not profiler.token:
+            return jsonify({'success': False, 'error': 'Endpoint not found'}), 404
+        if not profiler.authorized(request.headers.get(PROFILE_HEADER)):
+            return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+@app.route('/api/admin/profiles', methods=['GET'])
+@admin_route
+def list_profiles():
+    """Captured request profiles, newest first"""
+    profiles = profiler.store.list()
+    return jsonify({'profiles': profiles, 'total': len(profiles), 'max_stored': profiler.store.max_profiles})
+
+@app.route('/api/admin/profiles/<int:profile_id>', methods=['GET'])
+@admin_route
+def get_profile(profile_id):
+    """One profile as an SVG flamegraph, or ?format=folded for flamegraph tools"""
+    fmt = request.args.get('format', 'svg')
+    if fmt not in ('svg', 'folded'):
+        return jsonify({'success': False, 'error': 'format must be svg or folded'}), 400
+    body = profiler.store.read(profile_id, fmt)
+    if body is None:
+        return jsonify({'success': False, 'error': 'Profile not found'}), 404
+    return Response(body, mimetype='image/svg+xml' if fmt == 'svg' else 'text/plain')
+
 # API documentation endpoint
 @app.route('/api/docs', methods=['GET'])
 def api_docs():
@@ -307,7 +1085,16 @@ def api_docs():
                     'conversation_id': 'string (optional) - Existing conversation ID',
                     'user_id': 'string (optional) - User identifier'
                 },
-                'response': 'JSON with conversation_id, user_message, ai_response'
+                'response': 'JSON with conversation_id, user_message, ai_response',
+                'notes': 'Turns on one conversation are processed in order; 409 with retry=true if earlier turns take too long'
+            },
+            'POST /api/chat/batch': {
+                'description': 'Run many chat turns; streams one NDJSON result per item, then a summary',
+                'parameters': {
+                    'items': 'array (required) - {message, conversation_id?, conversation?, user_id?, id?}',
+                    'user_id': 'string (optional) - Default user for items without one',
+                    'workers': 'integer (optional) - Concurrent conversations'
+                }
             },
             'GET /api/conversations': {
                 'description': 'Get all conversations for a user',
@@ -316,13 +1103,51 @@ def api_docs():
                 }
             },
             'GET /api/conversations/{id}/messages': {
-                'description': 'Get all messages in a conversation'
+                'description': 'Get messages in a conversation (all, or paginated newest-first pages)',
+                'parameters': {
+                    'limit': 'integer (optional) - Page size, enables pagination',
+                    'before': 'string (optional) - Message ID cursor from next_before'
+                }
             },
             'DELETE /api/conversations/{id}': {
                 'description': 'Delete a conversation'
             },
+            'GET /api/sync': {
+                'description': 'Messages and conversation changes since a cursor, across all conversations; '
+                               'resync is true when the cursor is older than the retained changes',
+                'parameters': {
+                    'user_id': 'string (optional) - User identifier',
+                    'since': 'integer (optional) - Cursor from the previous sync, 0 for everything',
+                    'limit': 'integer (optional) - Maximum changes per call'
+                }
+            },
+            'GET /api/search': {
+                'description': 'Full-text search over a user\'s messages with highlighted snippets',
+                'parameters': {
+                    'user_id': 'string (optional) - User identifier',
+                    'q': 'string (required) - Search terms',
+                    'limit': 'integer (optional) - Results per page (max 100)',
+                    'offset': 'integer (optional) - Results to skip'
+                }
+            },
+            'GET /api/events': {
+                'description': 'Server-Sent Events stream of new messages and conversation updates',
+                'parameters': {
+                    'user_id': 'string (optional) - User identifier',
+                    'since': 'integer (optional) - Cursor to resume from (or Last-Event-ID header)'
+                }
+            },
             'GET /api/health': {
                 'description': 'Health check endpoint'
+            },
+            'GET /api/admin/profiles': {
+                'description': 'Captured request profiles (requires the profiling token in X-Profile)'
+            },
+            'GET /api/admin/profiles/{id}': {
+                'description': 'One captured profile as a flamegraph',
+                'parameters': {
+                    'format': 'string (optional) - svg (default) or folded'
+                }
             }
         }
     }
@@ -336,9 +1161,13 @@ def not_found(error):
         'error': 'Endpoint not found',
         'available_endpoints': [
             'POST /api/chat',
+            'POST /api/chat/batch',
             'GET /api/conversations',
             'GET /api/conversations/{id}/messages',
             'DELETE /api/conversations/{id}',
+            'GET /api/sync',
+            'GET /api/events',
+            'GET /api/search',
             'GET /api/health',
             'GET /api/docs'
         ]
@@ -361,11 +1190,23 @@ def internal_error(error):
 
 # Initialize database tables when the app starts
 def init_database():
-    """Initialize database tables"""
+    """Bring every database up to the latest schema migration.
+
+    Only schema work happens here; the product index loads on the refresher
+    thread once the server is up (see run_product_index_refresher).
+    """
     with app.app_context():
         try:
-            db.create_all()
-            print("✅ Database tables created successfully!")
+            engines = shards.engines if shards else [db.engine]
+            for engine in engines:
+                migrate(engine, db.metadata)
+            print(f"✅ Database schema at version {latest_version()} on {len(engines)} database(s)!")
+            try:
+                for engine in engines:
+                    MessageSearchService(engine).ensure_index()
+                print("✅ Full-text search index ready!")
+            except Exception as e:
+                print(f"⚠️  Full-text search unavailable: {str(e)}")
             return True
         except Exception as e:
             print(f"❌ Database initialization failed: {str(e)}")
@@ -380,15 +1221,27 @@ if __name__ == '__main__':
         print("✅ Flask application ready!")
         print("\nAvailable endpoints:")
         print("- POST /api/chat (Primary chat endpoint)")
+        print("- POST /api/chat/batch")
         print("- GET /api/conversations")
         print("- GET /api/conversations/{id}/messages")
         print("- DELETE /api/conversations/{id}")
+        print("- GET /api/sync")
+        print("- GET /api/events")
+        print("- GET /api/search")
         print("- GET /api/health")
         print("- GET /api/docs")
         print(f"\n🚀 Server starting on http://localhost:5000")
         print("="*50)
         
+        # Load the product index, then pick up products added by CSV loads while the app is running
+        threading.Thread(target=run_product_index_refresher, name='product-index', daemon=True).start()
+        task_queue.start()
+        if any(engine.dialect.name == 'postgresql' for engine in task_engines()):
+            threading.Thread(target=run_partition_maintenance, name='partitions', daemon=True).start()
+        if settings.CHANGE_LOG_RETENTION_DAYS > 0:
+            threading.Thread(target=run_change_log_retention, name='change-log', daemon=True).start()
+        
         # Run the Flask application
-        app.run(debug=True, host='0.0.0.0', port=5000)
+        app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)
     else:
         print("❌ Failed to initialize database. Exiting...")
\ No newline at end of file
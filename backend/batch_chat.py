@@ -0,0 +1,100 @@
+# batch_chat.py - Run scripted prompts through POST /api/chat/batch
+#
+# Reads items from a JSONL file (one {"message", "conversation"?,
+# "conversation_id"?, "user_id"?, "id"?} object per line) or a CSV file with
+# those columns, sends them in batches, and writes every per-item result as
+# one JSON line while the server streams them back. Items sharing a
+# `conversation` label always travel in the same batch, so they continue the
+# conversation their first item creates. Prints aggregate throughput and
+# latency at the end.
+#
+#   python batch_chat.py prompts.jsonl --output results.jsonl
+#   python batch_chat.py prompts.csv --url http://localhost:5000 --batch-size 500 --workers 8
+
+import argparse
+import csv
+import json
+import sys
+import time
+
+import requests
+
+from services.batch_runner import group_items, latency_summary
+
+
+def read_items(path):
+    handle = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+    with handle:
+        if path.endswith('.csv'):
+            return [{key: value for key, value in row.items() if value not in (None, '')}
+                    for row in csv.DictReader(handle)]
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def batches(items, batch_size):
+    """Pack whole conversations into batches of about ``batch_size`` items"""
+    batch = []
+    for group in group_items(items):
+        if batch and len(batch) + len(group) > batch_size:
+            yield batch
+            batch = []
+        batch.extend(item for _, item in group)
+    if batch:
+        yield batch
+
+
+def run(url, items, batch_size, workers, user_id, output):
+    latencies, statuses, summaries = [], {}, []
+    started = time.perf_counter()
+    done = 0
+    for batch in batches(items, batch_size):
+        response = requests.post(f"{url}/api/chat/batch", stream=True, timeout=3600,
+                                 json={'items': batch, 'workers': workers, 'user_id': user_id})
+        if response.status_code != 200:
+            raise SystemExit(f"Batch rejected ({response.status_code}): {response.text}")
+        for line in response.iter_lines():
+            if not line:
+                continue
+            result = json.loads(line)
+            if result.get('type') == 'summary':
+                summaries.append(result)
+                continue
+            result['index'] += done
+            statuses[result['status']] = statuses.get(result['status'], 0) + 1
+            if result['status'] == 200:
+                latencies.append(result['latency_ms'])
+            output.write(json.dumps(result) + '\n')
+        done += len(batch)
+        elapsed = time.perf_counter() - started
+        print(f"  {done:>8,}/{len(items):,} items  {done / elapsed:,.1f} items/s", file=sys.stderr)
+
+    elapsed = time.perf_counter() - started
+    return {
+        'items': len(items),
+        'batches': len(summaries),
+        'statuses': statuses,
+        'elapsed_seconds': round(elapsed, 3),
+        'items_per_second': round(len(items) / elapsed, 1) if elapsed > 0 else None,
+        'latency_ms': latency_summary(latencies),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Send scripted chat prompts through the batch endpoint')
+    parser.add_argument('input', help="JSONL or CSV file of items, '-' for JSONL on stdin")
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--output', default='-', help="per-item results as JSONL ('-' for stdout)")
+    parser.add_argument('--batch-size', type=int, default=1000, help='items per request')
+    parser.add_argument('--workers', type=int, help='concurrent conversations per batch (server-capped)')
+    parser.add_argument('--user-id', default='batch_user', help='user for items without a user_id')
+    args = parser.parse_args()
+
+    items = read_items(args.input)
+    output = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    with output:
+        report = run(args.url.rstrip('/'), items, args.batch_size, args.workers, args.user_id, output)
+    latency = report['latency_ms']
+    print(f"Ran {report['items']:,} items in {report['batches']} batches: {report['statuses']}", file=sys.stderr)
+    print(f"{report['elapsed_seconds']:.1f}s, {report['items_per_second']:,.1f} items/s; latency ms "
+          f"p50 {latency.get('p50')} p95 {latency.get('p95')} p99 {latency.get('p99')} max {latency.get('max')}",
+          file=sys.stderr)
@@ -0,0 +1,148 @@
+# bench_async_db.py - Sync vs asyncio DatabaseService under 1,000 concurrent requests
+#
+# Seeds the FastAPI service's tables, then fires the same mix of history
+# reads and interaction writes as concurrent asyncio tasks, the way
+# chat_api.py's async handlers would see them, three ways:
+#
+#   sync        DatabaseService called straight from the coroutine (the old
+#               handlers): every round trip blocks the event loop
+#   to_thread   DatabaseService pushed onto the default thread pool
+#   async       AsyncDatabaseService reads on the asyncio engine and its
+#               pool; writes on the thread pool, as chat_api.py does them
+#               (they are part of the synchronous chat turn)
+#
+# Reports throughput, request latency percentiles and the longest event
+# loop stall, then checks both services return identical histories.
+# Run from the repository root so the backend package imports resolve:
+#
+#   python -m backend.bench_async_db --requests 1000
+#   python -m backend.bench_async_db --database-url postgresql://localhost/bench --requests 1000
+#
+# The Postgres run needs asyncpg and psycopg2; results so far are SQLite only.
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def seed(engine, Conversation, interactions, rng):
+    # conversation_id is unique in this schema: one interaction per conversation
+    rows = []
+    for n in range(interactions):
+        rows.append({
+            'conversation_id': f"bench-{n}",
+            'user_message': f"question {n}",
+            'ai_response': f"answer {n} " + 'x' * rng.randint(20, 400),
+            'interaction_type': 'response',
+        })
+    with engine.begin() as conn:
+        conn.execute(Conversation.__table__.insert(), rows)
+
+
+def workload(requests, interactions, read_ratio, rng):
+    ops = []
+    for n in range(requests):
+        if rng.random() < read_ratio:
+            ops.append(('read', f"bench-{rng.randrange(interactions)}"))
+        else:
+            ops.append(('write', {
+                'conversation_id': f"bench-write-{n}",
+                'user_message': f"new question {n}",
+                'ai_response': f"new answer {n}",
+                'interaction_type': 'response',
+                'database_results': [{'id': i, 'name': f"product {i}"} for i in range(rng.randint(0, 50))],
+            }))
+    return ops
+
+
+async def watch_loop(stop, interval=0.005):
+    """Longest time the event loop was unable to run this coroutine past its deadline"""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+async def run(mode, ops, sync_service, async_service):
+    # Every request arrives at once; latency runs from arrival, so time spent
+    # queued behind a blocked event loop counts
+    async def request(op, arrived):
+        kind, argument = op
+        if kind == 'write':
+            # conversation_id is unique, so every mode writes its own rows
+            argument = {**argument, 'conversation_id': f"{argument['conversation_id']}-{mode}"}
+        if mode == 'sync':
+            call = sync_service.get_conversation_history if kind == 'read' else sync_service.store_interaction
+            call(argument)
+        elif mode == 'to_thread':
+            call = sync_service.get_conversation_history if kind == 'read' else sync_service.store_interaction
+            await asyncio.to_thread(call, argument)
+        elif kind == 'read':
+            await async_service.get_conversation_history(argument)
+        else:
+            await asyncio.to_thread(sync_service.store_interaction, argument)
+        return time.perf_counter() - arrived
+
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(watch_loop(stop))
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(request(op, started) for op in ops))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    stall = await watcher
+    return elapsed, latencies, stall
+
+
+async def main(args):
+    os.environ['DATABASE_URL'] = args.database_url
+    # Imported after DATABASE_URL is set: the sync engine is created at import
+    from backend.config.models.conversation import Conversation
+    from backend.database.setup import engine, init_db
+    from backend.services.database_service import AsyncDatabaseService, DatabaseService
+
+    rng = random.Random(args.seed)
+    init_db()
+    with engine.begin() as conn:
+        conn.execute(Conversation.__table__.delete())
+    seed(engine, Conversation, args.interactions, rng)
+    ops = workload(args.requests, args.interactions, args.read_ratio, rng)
+
+    sync_service = DatabaseService()
+    async_service = AsyncDatabaseService(args.database_url)
+    print(f"{len(ops):,} concurrent requests ({args.read_ratio:.0%} history reads), "
+          f"{args.interactions:,} seeded interactions, pool {engine.pool.size()}")
+    print(f"{'mode':<10} {'wall s':>8} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max stall ms':>13}")
+    for mode in ('sync', 'to_thread', 'async'):
+        elapsed, latencies, stall = await run(mode, ops, sync_service, async_service)
+        print(f"{mode:<10} {elapsed:>8.2f} {len(ops) / elapsed:>9,.0f} "
+              f"{statistics.median(latencies) * 1000:>9.1f} {percentile(latencies, 0.95) * 1000:>9.1f} "
+              f"{percentile(latencies, 0.99) * 1000:>9.1f} {stall * 1000:>13.1f}")
+
+    checked = ([argument for kind, argument in ops if kind == 'read'][:50]
+               + [f"{argument['conversation_id']}-async" for kind, argument in ops if kind == 'write'][:5])
+    for conversation_id in checked:
+        assert (await async_service.get_conversation_history(conversation_id)
+                == sync_service.get_conversation_history(conversation_id)), conversation_id
+    await async_service.close()
+    print("async and sync histories match")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark sync vs asyncio DatabaseService under concurrency')
+    parser.add_argument('--database-url', default='sqlite:///bench_async_db.db')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--interactions', type=int, default=20000, help='rows seeded before the run')
+    parser.add_argument('--read-ratio', type=float, default=0.8)
+    parser.add_argument('--seed', type=int, default=42)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,103 @@
+# bench_broker_fanout.py - Broker fan-out latency with many subscribers
+#
+# A broker-only microbenchmark: N subscriptions stand in for connected SSE
+# clients and are drained by a pool of consumer threads, so it measures
+# publish-to-delivery latency through the broker alone. No HTTP connections
+# are opened. /api/events holds one server thread per open stream for its
+# whole life, so serving N real clients also takes N threads (or greenlets)
+# in the WSGI server, which this does not exercise. Use --relay to route
+# through the relay broker (start it with:
+# PUBSUB_AUTHKEY=... python -m services.pubsub --port 6380).
+
+import argparse
+import os
+import statistics
+import threading
+import time
+
+from services.pubsub import InProcessBroker, create_broker
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(clients, events, topics, consumer_threads, broker):
+    subscriptions = [broker.subscribe(f"user:{i % topics}") for i in range(clients)]
+    latencies = []
+    latencies_lock = threading.Lock()
+    expected = clients * events // topics
+    done = threading.Event()
+
+    def consume(chunk):
+        local = []
+        remaining = {id(s): events for s in chunk} if topics == 1 else None
+        pending = list(chunk)
+        while pending and not done.is_set():
+            still_pending = []
+            for subscription in pending:
+                event = subscription.get(timeout=0)
+                while event is not None:
+                    local.append(time.perf_counter() - event['sent_at'])
+                    if remaining is not None:
+                        remaining[id(subscription)] -= 1
+                    event = subscription.get(timeout=0)
+                if remaining is None or remaining[id(subscription)] > 0:
+                    still_pending.append(subscription)
+            pending = still_pending
+            time.sleep(0.0005)
+        with latencies_lock:
+            latencies.extend(local)
+
+    chunk_size = (clients + consumer_threads - 1) // consumer_threads
+    threads = [
+        threading.Thread(target=consume, args=(subscriptions[i:i + chunk_size],), daemon=True)
+        for i in range(0, clients, chunk_size)
+    ]
+    for thread in threads:
+        thread.start()
+
+    publish_times = []
+    for n in range(events):
+        started = time.perf_counter()
+        broker.publish(f"user:{n % topics}", {'type': 'messages', 'cursor': n, 'sent_at': started})
+        publish_times.append(time.perf_counter() - started)
+        time.sleep(0.01)
+
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        with latencies_lock:
+            if len(latencies) >= expected:
+                break
+        time.sleep(0.05)
+    done.set()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    for subscription in subscriptions:
+        subscription.close()
+
+    print(f"clients={clients} topics={topics} events={events} consumer_threads={consumer_threads}")
+    print(f"  publish call:      p50 {statistics.median(publish_times) * 1000:8.2f}ms  "
+          f"p99 {percentile(publish_times, 99) * 1000:8.2f}ms")
+    if latencies:
+        print(f"  delivery latency:  p50 {statistics.median(latencies) * 1000:8.2f}ms  "
+              f"p99 {percentile(latencies, 99) * 1000:8.2f}ms  max {max(latencies) * 1000:8.2f}ms")
+    print(f"  delivered {len(latencies):,} of {expected:,} expected events")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark broker fan-out latency (no HTTP)')
+    parser.add_argument('--clients', type=int, default=10000, help='subscriptions, one per simulated client')
+    parser.add_argument('--events', type=int, default=50)
+    parser.add_argument('--topics', type=int, default=1,
+                        help='1 = every client follows one user (worst-case fan-out)')
+    parser.add_argument('--consumer-threads', type=int, default=32)
+    parser.add_argument('--relay', help='relay://host:port to benchmark through the relay broker')
+    parser.add_argument('--authkey', default=os.getenv('PUBSUB_AUTHKEY', ''),
+                        help='shared with the relay (default: PUBSUB_AUTHKEY)')
+    args = parser.parse_args()
+
+    broker = create_broker(args.relay, args.authkey.encode()) if args.relay else InProcessBroker()
+    run(args.clients, args.events, args.topics, args.consumer_threads, broker)
@@ -0,0 +1,89 @@
+# bench_products.py - Product retrieval index build time and lookup latency
+#
+# Builds a ProductIndex over a synthetic catalog, then times single and
+# batched top-k lookups with and without filters, and an incremental add the
+# size of a typical CSV load. Chat answers budget about a millisecond for
+# the lookup; the p50/p99 columns are what to compare against it.
+#
+#   python bench_products.py --products 1000000
+
+import argparse
+import random
+import statistics
+import time
+import uuid
+
+from services.product_index import MAX_POSTINGS, ProductIndex
+
+CATEGORIES = ['Electronics', 'Accessories', 'Audio', 'Computers', 'Phones', 'Home', 'Gaming', 'Cameras']
+ADJECTIVES = ('wireless portable compact premium rugged slim fast smart ergonomic waterproof '
+              'noise-cancelling rechargeable magnetic foldable mechanical ultra lightweight').split()
+NOUNS = ('headphones earbuds speaker charger cable case keyboard mouse monitor adapter laptop tablet '
+         'phone camera tripod microphone router stand dock hub battery controller headset webcam').split()
+FEATURES = ('bluetooth usb-c hdmi wifi led 4k gaming travel office studio outdoor kids pro '
+            'fast-charging long-battery-life').split()
+
+
+def synthetic_products(count, rng):
+    for _ in range(count):
+        noun = rng.choice(NOUNS)
+        yield {
+            'id': str(uuid.uuid4()),
+            'name': f"{rng.choice(ADJECTIVES).title()} {rng.choice(FEATURES).title()} {noun.title()}",
+            'description': ' '.join(rng.sample(ADJECTIVES, 3) + rng.sample(FEATURES, 3) + [noun]),
+            'category': rng.choice(CATEGORIES),
+            'price': round(rng.lognormvariate(3.5, 0.8), 2),
+            'stock_quantity': rng.choice([0, 0, 3, 10, 50, 200]),
+        }
+
+
+def time_queries(index, queries, k, batch_size, **filters):
+    latencies = []
+    for i in range(0, len(queries), batch_size):
+        batch = queries[i:i + batch_size]
+        started = time.perf_counter()
+        index.search_batch(batch, k=k, **filters)
+        latencies.append((time.perf_counter() - started) / len(batch))
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.99)]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the in-memory product retrieval index')
+    parser.add_argument('--products', type=int, default=1_000_000)
+    parser.add_argument('--load-batch', type=int, default=50_000, help='rows per add(), as in sync_product_index')
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--k', type=int, default=3)
+    parser.add_argument('--max-postings', type=int, default=MAX_POSTINGS,
+                        help='best postings scanned per term before the full-list fallback')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    index = ProductIndex(max_postings=args.max_postings)
+    started = time.perf_counter()
+    batch = []
+    for product in synthetic_products(args.products, rng):
+        batch.append(product)
+        if len(batch) == args.load_batch:
+            index.add(batch)
+            batch = []
+    index.add(batch)
+    index.compact()
+    print(f"Built index over {len(index):,} products in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    index.add(synthetic_products(10_000, rng))
+    print(f"Incremental add of 10,000 products: {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    queries = [f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}" for _ in range(args.queries)]
+    rare = [f"{rng.choice(ADJECTIVES)} {rng.choice(FEATURES)} {rng.choice(NOUNS)}" for _ in range(args.queries)]
+    cases = [
+        ('2-term query', queries, 1, {}),
+        ('3-term query', rare, 1, {}),
+        ('2-term + filters', queries, 1, {'category': 'Audio', 'max_price': 50, 'in_stock': True}),
+        ('2-term, batches of 32', queries, 32, {}),
+    ]
+    for label, case_queries, batch_size, filters in cases:
+        p50, p99 = time_queries(index, case_queries, args.k, batch_size, **filters)
+        print(f"  {label:<24} p50 {p50 * 1000:6.2f}ms  p99 {p99 * 1000:6.2f}ms per query")
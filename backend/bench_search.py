@@ -0,0 +1,134 @@
+# bench_search.py - Full-text indexing throughput and query latency
+#
+# Builds a scratch database with the app's schema and search index, bulk
+# inserts synthetic messages (the FTS triggers index each row as it lands),
+# then times scoped searches. The full run is 10M messages; use --messages
+# for a quicker pass.
+#
+#   python bench_search.py --messages 10000000 --database-url sqlite:///bench_search.db
+
+import argparse
+import os
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from services.search_service import MessageSearchService
+
+VOCABULARY = (
+    "order shipping refund headphones wireless battery charger cable case screen laptop phone "
+    "warranty return exchange delivery tracking invoice payment card discount coupon price stock "
+    "size color bluetooth speaker keyboard mouse monitor adapter usb replacement broken damaged "
+    "late missing account password login subscription cancel upgrade support help thanks hello"
+).split()
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS "user" (id VARCHAR(36) PRIMARY KEY, username VARCHAR(80) UNIQUE NOT NULL, created_at TIMESTAMP)',
+    "CREATE TABLE IF NOT EXISTS conversation (id VARCHAR(36) PRIMARY KEY, user_id VARCHAR(36) NOT NULL, title VARCHAR(200), created_at TIMESTAMP, updated_at TIMESTAMP)",
+    "CREATE TABLE IF NOT EXISTS message (id VARCHAR(36) PRIMARY KEY, conversation_id VARCHAR(36) NOT NULL, content TEXT NOT NULL, role VARCHAR(20) NOT NULL, timestamp TIMESTAMP)",
+    "CREATE INDEX IF NOT EXISTS ix_conversation_user_id ON conversation (user_id)",
+]
+
+
+def zipf_words(rng, count):
+    # Rank-weighted choice gives a realistic skew towards common terms
+    weights = [1.0 / (rank + 1) for rank in range(len(VOCABULARY))]
+    return rng.choices(VOCABULARY, weights=weights, k=count)
+
+
+def populate(engine, messages, users, batch_size, seed):
+    rng = random.Random(seed)
+    user_ids = [str(uuid.uuid4()) for _ in range(users)]
+    conversations_per_user = 10
+    conversation_ids = []
+    start = datetime(2024, 1, 1)
+
+    with engine.begin() as conn:
+        conn.execute(text('INSERT INTO "user" (id, username, created_at) VALUES (:id, :username, :created_at)'),
+                     [{'id': uid, 'username': f"bench_{i}", 'created_at': start} for i, uid in enumerate(user_ids)])
+        rows = []
+        for uid in user_ids:
+            for n in range(conversations_per_user):
+                cid = str(uuid.uuid4())
+                conversation_ids.append((cid, uid))
+                rows.append({'id': cid, 'user_id': uid, 'title': f"Conversation {n}", 'created_at': start, 'updated_at': start})
+        conn.execute(text("INSERT INTO conversation (id, user_id, title, created_at, updated_at) "
+                          "VALUES (:id, :user_id, :title, :created_at, :updated_at)"), rows)
+
+    insert = text("INSERT INTO message (id, conversation_id, content, role, timestamp) "
+                  "VALUES (:id, :conversation_id, :content, :role, :timestamp)")
+    inserted = 0
+    started = time.perf_counter()
+    while inserted < messages:
+        batch = []
+        for i in range(min(batch_size, messages - inserted)):
+            cid, _ = conversation_ids[rng.randrange(len(conversation_ids))]
+            batch.append({
+                'id': str(uuid.uuid4()),
+                'conversation_id': cid,
+                'content': ' '.join(zipf_words(rng, rng.randint(5, 30))),
+                'role': 'user' if i % 2 == 0 else 'assistant',
+                'timestamp': start + timedelta(seconds=inserted + i)
+            })
+        with engine.begin() as conn:
+            conn.execute(insert, batch)
+        inserted += len(batch)
+        if inserted % (batch_size * 50) == 0:
+            rate = inserted / (time.perf_counter() - started)
+            print(f"  {inserted:>12,} messages indexed ({rate:,.0f}/s)")
+
+    elapsed = time.perf_counter() - started
+    print(f"Indexed {inserted:,} messages in {elapsed:.1f}s ({inserted / elapsed:,.0f} messages/s)")
+    return user_ids
+
+
+def run_queries(engine, search, user_ids, queries, seed):
+    rng = random.Random(seed + 1)
+    latencies = []
+    hits = 0
+    with Session(engine) as session:
+        for _ in range(queries):
+            terms = ' '.join(rng.sample(VOCABULARY, rng.randint(1, 2)))
+            page = rng.randint(0, 2)
+            started = time.perf_counter()
+            results = search.search(session, rng.choice(user_ids), terms, limit=20, offset=page * 20)
+            latencies.append(time.perf_counter() - started)
+            hits += len(results)
+
+    latencies.sort()
+    print(f"{queries} queries: p50 {statistics.median(latencies) * 1000:.2f}ms  "
+          f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.2f}ms  "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f}ms  "
+          f"avg hits/page {hits / queries:.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark full-text message search')
+    parser.add_argument('--messages', type=int, default=10_000_000)
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--batch-size', type=int, default=10_000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database-url', default='sqlite:///bench_search.db')
+    parser.add_argument('--keep', action='store_true', help='keep the scratch SQLite file')
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    if engine.dialect.name == 'sqlite':
+        with engine.begin() as conn:
+            for ddl in SCHEMA:
+                conn.execute(text(ddl))
+    search = MessageSearchService(engine)
+    search.ensure_index()
+
+    user_ids = populate(engine, args.messages, args.users, args.batch_size, args.seed)
+    run_queries(engine, search, user_ids, args.queries, args.seed)
+
+    if engine.dialect.name == 'sqlite' and not args.keep:
+        engine.dispose()
+        os.remove(engine.url.database)
@@ -0,0 +1,83 @@
+# bench_serialization.py - JSON encoding time and bytes on the wire for history payloads
+#
+# Compares the stdlib provider (with per-row isoformat, as before) against the
+# orjson provider, and reports identity/gzip/brotli sizes for each payload.
+
+import argparse
+import gzip
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from flask import Flask
+
+from services.compression import brotli
+from services.json_provider import IsoJSONProvider, OrjsonProvider, orjson
+
+
+def build_payload(message_count):
+    """Shape of GET /api/conversations/<id>/messages for a long conversation"""
+    conversation_id = str(uuid.uuid4())
+    start = datetime(2024, 1, 1)
+    messages = [
+        {
+            'id': str(uuid.uuid4()),
+            'conversation_id': conversation_id,
+            'content': f"Message {i}: could you tell me more about the wireless headphones and their battery life?",
+            'role': 'user' if i % 2 == 0 else 'assistant',
+            'timestamp': start + timedelta(seconds=i * 7)
+        }
+        for i in range(message_count)
+    ]
+    return {
+        'conversation_id': conversation_id,
+        'conversation_title': 'Benchmark conversation',
+        'messages': messages,
+        'total_messages': message_count
+    }
+
+
+def with_isoformat(payload):
+    """What Message.to_dict() used to do: stringify every timestamp up front"""
+    return {
+        **payload,
+        'messages': [{**m, 'timestamp': m['timestamp'].isoformat()} for m in payload['messages']]
+    }
+
+
+def time_it(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def run(sizes, repeat):
+    app = Flask(__name__)
+    std = IsoJSONProvider(app)
+    fast = OrjsonProvider(app) if orjson is not None else None
+
+    print(f"{'messages':>9} {'encoder':<22} {'encode ms':>10} {'identity':>12} {'gzip':>12} {'brotli':>12}")
+    for size in sizes:
+        payload = build_payload(size)
+        cases = [('std + isoformat', lambda: std.dumps(with_isoformat(payload), separators=(',', ':')).encode()),
+                 ('std (native dt)', lambda: std.dumps(payload, separators=(',', ':')).encode())]
+        if fast is not None:
+            cases.append(('orjson (native dt)', lambda: fast.dumps(payload).encode()))
+
+        for name, encode in cases:
+            seconds, body = time_it(encode, repeat)
+            gz = len(gzip.compress(body, compresslevel=5))
+            br = len(brotli.compress(body, quality=5)) if brotli is not None else None
+            print(f"{size:>9} {name:<22} {seconds * 1000:>10.1f} {len(body):>12,} {gz:>12,} "
+                  f"{br if br is None else format(br, ','):>12}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark API response serialization')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
@@ -0,0 +1,130 @@
+# bench_sharding.py - Write throughput as the shard count grows
+#
+# For each shard count, creates that many scratch SQLite shards with the
+# app's schema and search index, then runs worker processes that each play
+# chat turns for their users: one transaction per turn inserting the user and
+# assistant messages and touching the conversation, sent to the user's shard
+# through ShardMap. SQLite allows one writer per file, so a single shard
+# serializes every worker and more shards spread the writers out. Pass
+# Postgres URL templates with --url-template to measure separate databases.
+#
+#   python bench_sharding.py --shards 1,2,4,8 --workers 8 --turns 2000
+
+import argparse
+import multiprocessing
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy import text
+
+from models import db
+from services.migrations import migrate
+from services.search_service import MessageSearchService
+from services.shard_router import ShardMap
+
+INSERT_MESSAGE = text("INSERT INTO message (id, conversation_id, content, role, timestamp) "
+                      "VALUES (:id, :conversation_id, :content, :role, :timestamp)")
+TOUCH_CONVERSATION = text("UPDATE conversation SET updated_at = :now WHERE id = :id")
+
+
+def shard_engine_options(url):
+    return {'connect_args': {'timeout': 60}} if url.startswith('sqlite') else {}
+
+
+def prepare(urls, users_per_worker, workers):
+    """Create the schema on every shard and one user + conversation per simulated user"""
+    shards = ShardMap(urls, engine_options=shard_engine_options(urls[0]))
+    for engine in shards.engines:
+        migrate(engine, db.metadata)
+        MessageSearchService(engine).ensure_index()
+        if engine.dialect.name == 'sqlite':
+            with engine.begin() as conn:
+                conn.execute(text("PRAGMA journal_mode=WAL"))
+
+    assignments = []
+    now = datetime.utcnow()
+    for worker in range(workers):
+        conversations = []
+        for n in range(users_per_worker):
+            username = f"bench_{worker}_{n}"
+            user_id, conversation_id = str(uuid.uuid4()), ShardMap.conversation_id_for(username)
+            with shards.engine_for_user(username).begin() as conn:
+                conn.execute(text('INSERT INTO "user" (id, username, created_at) VALUES (:id, :username, :now)'),
+                             {'id': user_id, 'username': username, 'now': now})
+                conn.execute(text("INSERT INTO conversation (id, user_id, title, created_at, updated_at) "
+                                  "VALUES (:id, :user_id, 'Bench', :now, :now)"),
+                             {'id': conversation_id, 'user_id': user_id, 'now': now})
+            conversations.append(conversation_id)
+        assignments.append(conversations)
+    for engine in shards.engines:
+        engine.dispose()
+    return assignments
+
+
+def worker(urls, conversations, turns, seed, start_barrier, results):
+    shards = ShardMap(urls, engine_options=shard_engine_options(urls[0]))
+    rng = random.Random(seed)
+    latencies = []
+    start_barrier.wait()  # process start-up stays out of the measured window
+    began = time.perf_counter()
+    for _ in range(turns):
+        conversation_id = rng.choice(conversations)
+        now = datetime.utcnow()
+        started = time.perf_counter()
+        with shards.engine_for_conversation(conversation_id).begin() as conn:
+            conn.execute(INSERT_MESSAGE, [
+                {'id': str(uuid.uuid4()), 'conversation_id': conversation_id,
+                 'content': 'my wireless headphones stopped charging', 'role': 'user', 'timestamp': now},
+                {'id': str(uuid.uuid4()), 'conversation_id': conversation_id,
+                 'content': 'Sorry to hear that, let me look up your order.', 'role': 'assistant', 'timestamp': now},
+            ])
+            conn.execute(TOUCH_CONVERSATION, {'now': now, 'id': conversation_id})
+        latencies.append(time.perf_counter() - started)
+    results.put((began, time.perf_counter(), latencies))
+
+
+def run(shard_count, workers, turns, users_per_worker, url_template, directory):
+    urls = [url_template.format(dir=directory, n=f"{shard_count}_{i}") for i in range(shard_count)]
+    assignments = prepare(urls, users_per_worker, workers)
+
+    results = multiprocessing.Queue()
+    start_barrier = multiprocessing.Barrier(workers)
+    processes = [
+        multiprocessing.Process(target=worker, args=(urls, assignments[w], turns, w, start_barrier, results))
+        for w in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    elapsed = max(end for _, end, _ in reports) - min(began for began, _, _ in reports)
+    latencies = sorted(latency for _, _, worker_latencies in reports for latency in worker_latencies)
+    total = workers * turns
+    print(f"shards={shard_count:<3} {total / elapsed:>9,.0f} turns/s  "
+          f"({total * 2 / elapsed:>9,.0f} messages/s)  "
+          f"p50 {latencies[len(latencies) // 2] * 1000:7.2f}ms  "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:7.2f}ms")
+    return total / elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark write throughput across shard counts')
+    parser.add_argument('--shards', default='1,2,4,8', help='comma-separated shard counts to compare')
+    parser.add_argument('--workers', type=int, default=8, help='concurrent writer processes')
+    parser.add_argument('--turns', type=int, default=2000, help='chat turns written per worker')
+    parser.add_argument('--users-per-worker', type=int, default=50)
+    parser.add_argument('--url-template', default='sqlite:///{dir}/shard_{n}.db',
+                        help='shard URL with {dir} and {n} placeholders')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        baseline = None
+        for count in [int(n) for n in args.shards.split(',')]:
+            rate = run(count, args.workers, args.turns, args.users_per_worker, args.url_template, directory)
+            baseline = baseline or rate
+            print(f"          {rate / baseline:.2f}x the {args.shards.split(',')[0]}-shard rate")
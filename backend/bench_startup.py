@@ -0,0 +1,124 @@
+# bench_startup.py - Cold start: import time and time to the first healthy /health
+#
+# Starts each server in a fresh interpreter, the way a deploy or an
+# autoscaler restart would, and measures:
+#
+#   import      seconds to import the app module (framework, services and
+#               module-level initialization), timed inside a subprocess
+#   healthy     seconds from spawning the server process until its health
+#               endpoint first answers 200
+#
+# The first run of each app uses an empty database, so it includes creating
+# the schema; the later runs are restarts against the migrated database,
+# the common case. Both apps share the database file, as they do in
+# development. Run from anywhere:
+#
+#   python bench_startup.py --runs 5
+#   python bench_startup.py --app fastapi --database-url sqlite:////tmp/startup.db
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+BACKEND = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BACKEND)
+
+# Each app: the directory its imports resolve from, its module, how to serve
+# it on {port} (the Flask launcher mirrors app.py's __main__ without the
+# debug reloader) and its health path
+APPS = {
+    'flask': {
+        'cwd': BACKEND,
+        'module': 'app',
+        'serve': [sys.executable, '-c', (
+            "import threading, app\n"
+            "assert app.init_database()\n"
+            "threading.Thread(target=app.run_product_index_refresher, daemon=True).start()\n"
+            "app.task_queue.start()\n"
+            "app.app.run(host='127.0.0.1', port={port}, threaded=True)\n"
+        )],
+        'health': '/api/health',
+    },
+    'fastapi': {
+        'cwd': ROOT,
+        'module': 'backend.api.chat_api',
+        'serve': [sys.executable, '-m', 'uvicorn', 'backend.api.chat_api:app',
+                  '--host', '127.0.0.1', '--port', '{port}', '--log-level', 'warning'],
+        'health': '/health',
+    },
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def import_seconds(spec, env):
+    code = (f"import time; started = time.perf_counter(); import {spec['module']}; "
+            f"print(time.perf_counter() - started)")
+    output = subprocess.run([sys.executable, '-c', code], cwd=spec['cwd'], env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def healthy_seconds(spec, env, timeout):
+    port = free_port()
+    command = [part.replace('{port}', str(port)) for part in spec['serve']]
+    url = f"http://127.0.0.1:{port}{spec['health']}"
+    started = time.perf_counter()
+    server = subprocess.Popen(command, cwd=spec['cwd'], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise SystemExit(f"{' '.join(command)} exited with {server.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError):
+                pass
+            time.sleep(0.01)
+        raise SystemExit(f"{url} not healthy after {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(args):
+    env = dict(os.environ, DATABASE_URL=args.database_url, PYTHONDONTWRITEBYTECODE='1')
+    print(f"{args.runs} runs per app against {args.database_url} (run 1 creates the schema)")
+    print(f"{'app':<8} {'run':>4} {'import ms':>10} {'healthy ms':>11}")
+    for name in args.app:
+        spec = APPS[name]
+        imports, healthy = [], []
+        for run in range(1, args.runs + 1):
+            healthy.append(healthy_seconds(spec, env, args.timeout))
+            imports.append(import_seconds(spec, env))
+            print(f"{name:<8} {run:>4} {imports[-1] * 1000:>10.0f} {healthy[-1] * 1000:>11.0f}")
+        if args.runs > 1:
+            print(f"{name:<8} {'p50':>4} {statistics.median(imports[1:]) * 1000:>10.0f} "
+                  f"{statistics.median(healthy[1:]) * 1000:>11.0f}   (restarts)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure server import time and time to first healthy /health')
+    parser.add_argument('--app', choices=sorted(APPS), action='append',
+                        help='app to measure, repeatable (default: both)')
+    parser.add_argument('--database-url', help='default: a new SQLite file in a temporary directory')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--timeout', type=float, default=60.0, help='seconds to wait for /health')
+    args = parser.parse_args()
+    args.app = args.app or ['flask', 'fastapi']
+    with tempfile.TemporaryDirectory() as directory:
+        args.database_url = args.database_url or f"sqlite:///{os.path.join(directory, 'startup.db')}"
+        main(args)
@@ -1,16 +1,62 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, JSON
+from sqlalchemy import (Boolean, Column, DateTime, ForeignKey, Integer, JSON, LargeBinary, String, Text, cast,
+                        inspect, or_, text)
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import column_property, deferred, relationship
 from sqlalchemy.sql import func
 
 Base = declarative_base()
 
+class ResultBlob(Base):
+    """A compressed database_results payload, stored once per distinct content"""
+    __tablename__ = "result_blobs"
+
+    digest = Column(String(64), primary_key=True)  # sha256 of the encoded payload
+    data = Column(LargeBinary, nullable=False)
+    raw_size = Column(Integer, nullable=False)  # encoded bytes before compression
+    row_count = Column(Integer)  # rows in the original result when it was a list
+    stored_rows = Column(Integer)  # rows kept after truncation
+    truncated = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
 class Conversation(Base):
     __tablename__ = "conversations"
     
     id = Column(Integer, primary_key=True, index=True)
-    conversation_id = Column(String, unique=True, index=True)
+    conversation_id = Column(String, index=True)  # one row per interaction, many per conversation
     user_message = Column(Text)
     ai_response = Column(Text)
     interaction_type = Column(String)  # 'clarification', 'response', 'error'
-    database_results = Column(JSON)
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    # Small results stay inline, larger ones live in result_blobs; neither loads unless asked for
+    database_results = deferred(Column(JSON(none_as_null=True)))
+    results_digest = Column(String(64), ForeignKey("result_blobs.digest"), nullable=True)
+    # Computed in SQL so history can report results without loading them; rows
+    # written before none_as_null hold a JSON 'null' for "no results"
+    has_database_results = column_property(or_(
+        results_digest.isnot(None),
+        func.coalesce(cast(database_results.columns[0], Text), 'null') != 'null'
+    ))
+    results_blob = relationship(ResultBlob, lazy="raise")
+    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+
+# Columns added to existing tables after their first release. create_all only
+# creates missing tables, so upgrade_schema adds these to older databases
+ADDED_COLUMNS = [
+    ('conversations', 'results_digest', 'VARCHAR(64) REFERENCES result_blobs (digest)'),
+]
+
+# Indexes older versions created UNIQUE; conversation_id was unique, which
+# rejected every turn after a conversation's first
+RELAXED_INDEXES = [
+    ('conversations', 'ix_conversations_conversation_id', 'conversation_id'),
+]
+
+def upgrade_schema(connection):
+    """Bring tables an older version created up to the models; run after create_all"""
+    inspector = inspect(connection)
+    for table, column, ddl in ADDED_COLUMNS:
+        if column not in {existing['name'] for existing in inspector.get_columns(table)}:
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    for table, name, column in RELAXED_INDEXES:
+        if any(index['name'] == name and index['unique'] for index in inspector.get_indexes(table)):
+            connection.execute(text(f"DROP INDEX {name}"))
+            connection.execute(text(f"CREATE INDEX {name} ON {table} ({column})"))
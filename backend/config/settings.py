@@ -12,9 +12,82 @@ class Settings:
     # Groq API Settings
     GROQ_API_KEY = os.getenv("GROQ_API_KEY")
     GROQ_MODEL = os.getenv("GROQ_MODEL", "mixtral-8x7b-32768")
+    GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1")
+    
+    # LLM Client Settings
+    CHAT_SLO_SECONDS = float(os.getenv("CHAT_SLO_SECONDS", 8.0))
+    LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", 10))
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+    LLM_MIN_ATTEMPT_SECONDS = float(os.getenv("LLM_MIN_ATTEMPT_SECONDS", 0.5))
+    LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", 5))
+    LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", 30.0))
+    
+    # Conversation Summary Settings
+    SUMMARY_TRIGGER_MESSAGES = int(os.getenv("SUMMARY_TRIGGER_MESSAGES", 30))
+    SUMMARY_KEEP_RECENT = int(os.getenv("SUMMARY_KEEP_RECENT", 10))
+    SUMMARY_MAX_CHARS = int(os.getenv("SUMMARY_MAX_CHARS", 2000))
+    
+    # Batch Chat Settings
+    BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 10000))
+    BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", 8))  # conversations processed concurrently per batch
+    BATCH_COMMIT_SIZE = int(os.getenv("BATCH_COMMIT_SIZE", 50))  # turns per transaction
+    
+    # Response Encoding Settings
+    JSON_PROVIDER = os.getenv("JSON_PROVIDER", "orjson")  # 'orjson' or 'std'
+    COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", 1024))
+    COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", 5))
+    
+    # Push Channel Settings
+    PUBSUB_URL = os.getenv("PUBSUB_URL", "memory://")  # or relay://host:port
+    PUBSUB_AUTHKEY = os.getenv("PUBSUB_AUTHKEY", "")  # required with relay://; the relay refuses to start without it
+    PUSH_HEARTBEAT_SECONDS = float(os.getenv("PUSH_HEARTBEAT_SECONDS", 15.0))
+    CHANGE_LOG_RETENTION_DAYS = float(os.getenv("CHANGE_LOG_RETENTION_DAYS", 30.0))  # older sync changes pruned; 0 keeps all
+    CHANGE_LOG_PRUNE_SECONDS = float(os.getenv("CHANGE_LOG_PRUNE_SECONDS", 3600.0))
+    CHANGE_LOG_PRUNE_BATCH = int(os.getenv("CHANGE_LOG_PRUNE_BATCH", 5000))  # rows deleted per transaction
+    
+    # Background Task Settings
+    TASK_WORKERS = int(os.getenv("TASK_WORKERS", 4))
+    TASK_MAX_ATTEMPTS = int(os.getenv("TASK_MAX_ATTEMPTS", 5))
+    TASK_RETRY_BASE_SECONDS = float(os.getenv("TASK_RETRY_BASE_SECONDS", 2.0))  # doubles per failed attempt
+    TASK_LEASE_SECONDS = float(os.getenv("TASK_LEASE_SECONDS", 60.0))  # a claimed task reruns if not done by then
+    TASK_POLL_SECONDS = float(os.getenv("TASK_POLL_SECONDS", 1.0))
+    
+    # Product Retrieval Settings
+    PRODUCT_INDEX_REFRESH_SECONDS = float(os.getenv("PRODUCT_INDEX_REFRESH_SECONDS", 30.0))
+    PRODUCT_RESULTS = int(os.getenv("PRODUCT_RESULTS", 3))  # products quoted in a chat answer
     
     # Database Settings
     DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./conversational_ai.db")
+    CATALOG_DATABASE_URL = os.getenv("CATALOG_DATABASE_URL", "")  # LLM-planned queries; a role that can only read product
+    SHARD_DATABASE_URLS = os.getenv("SHARD_DATABASE_URLS", "")  # comma-separated, order is significant
+    REPLICA_DATABASE_URLS = os.getenv("REPLICA_DATABASE_URLS", "")  # comma-separated
+    REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", 30.0))
+    READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", 5.0))
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))  # connections per engine (FastAPI service)
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))  # extra connections opened under burst load
+    CONVERSATION_LOCK_STRIPES = int(os.getenv("CONVERSATION_LOCK_STRIPES", 1024))  # in-process locks turns hash onto
+    CONVERSATION_LOCK_TIMEOUT_SECONDS = float(os.getenv("CONVERSATION_LOCK_TIMEOUT_SECONDS", 30.0))  # then 409, retry
+    USER_ID_CACHE_SIZE = int(os.getenv("USER_ID_CACHE_SIZE", 100000))  # username -> user id entries
+    RESULTS_INLINE_MAX_BYTES = int(os.getenv("RESULTS_INLINE_MAX_BYTES", 2048))  # larger database_results go out of line
+    RESULTS_MAX_BYTES = int(os.getenv("RESULTS_MAX_BYTES", 1048576))  # encoded cap before truncation
+    
+    # Message Partitioning Settings (Postgres)
+    PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", 3))  # monthly partitions created in advance
+    MESSAGE_RETENTION_MONTHS = int(os.getenv("MESSAGE_RETENTION_MONTHS", 0))  # older months are detached; 0 keeps all
+    PARTITION_DROP_EXPIRED = os.getenv("PARTITION_DROP_EXPIRED", "false").lower() == "true"
+    PARTITION_MAINTENANCE_SECONDS = float(os.getenv("PARTITION_MAINTENANCE_SECONDS", 21600.0))
+    
+    # Profiling Settings
+    PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")  # X-Profile header value that profiles a request; also guards /api/admin/profiles
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0.0))  # fraction of requests profiled without the header
+    PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5.0))
+    PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+    PROFILE_MAX_STORED = int(os.getenv("PROFILE_MAX_STORED", 50))
+    
+    # Query Budget Settings
+    QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", 15))  # statements per request before it is logged
+    QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", 5))  # same statement this often looks like N+1
+    QUERY_COUNT_HEADERS = os.getenv("QUERY_COUNT_HEADERS", "").lower()  # 'true'/'false'; unset follows debug mode
     
     # Logging
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
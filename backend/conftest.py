@@ -0,0 +1,30 @@
+# conftest.py - The Flask app under test, bound to a scratch database
+#
+# app.py reads the database settings when it is first imported, so tests
+# that need it take the ``flask_app`` fixture instead of importing it at
+# module level; whichever test asks first decides where it points. Set
+# TEST_DATABASE_URL (say, a Postgres database) to run them somewhere else.
+
+import importlib
+import os
+import sys
+
+import pytest
+
+# Scripts run against a live server (python test_api.py), not test modules
+collect_ignore = ['test_api.py']
+
+
+@pytest.fixture(scope='session')
+def flask_app(tmp_path_factory):
+    """The ``app`` module, imported against TEST_DATABASE_URL or a new SQLite file"""
+    url = os.getenv('TEST_DATABASE_URL') or f"sqlite:///{tmp_path_factory.mktemp('app') / 'app.db'}"
+    if 'app' not in sys.modules:
+        from config.settings import settings
+        settings.DATABASE_URL = url
+        settings.SHARD_DATABASE_URLS = ''
+        settings.REPLICA_DATABASE_URLS = ''
+    module = importlib.import_module('app')
+    # Imported earlier by something else, it would be bound to the real database
+    assert module.app.config['SQLALCHEMY_DATABASE_URI'] == url, 'app was imported before the flask_app fixture'
+    return module
@@ -5,20 +5,49 @@ CREATE TABLE IF NOT EXISTS conversations (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
--- Create messages table
+-- Create messages table, range-partitioned by month on timestamp: history
+-- queries bounded by time only read the months they need, and retention
+-- detaches or drops whole months instead of deleting rows. Unique keys must
+-- include the partition key, hence the (id, timestamp) primary key.
+-- Later months are created ahead of time by the maintenance job:
+--   python -m services.partitions --database-url postgresql://... --table messages
 CREATE TABLE IF NOT EXISTS messages (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     conversation_id INTEGER REFERENCES conversations(id) ON DELETE CASCADE,
     message_text TEXT NOT NULL,
     sender VARCHAR(10) NOT NULL CHECK (sender IN ('user', 'ai')),
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+-- Catches rows outside every monthly range instead of failing the insert
+CREATE TABLE IF NOT EXISTS messages_default PARTITION OF messages DEFAULT;
 
--- Create indexes for better performance
-CREATE INDEX IF NOT EXISTS idx_messages_conversation_id ON messages(conversation_id);
+-- This month and the next three, named like services/partitions.py names them
+DO $$
+DECLARE
+    month DATE := date_trunc('month', CURRENT_DATE);
+BEGIN
+    FOR i IN 0..3 LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF messages FOR VALUES FROM (%L) TO (%L)',
+            'messages_p' || to_char(month + make_interval(months => i), 'YYYY_MM'),
+            (month + make_interval(months => i))::date,
+            (month + make_interval(months => i + 1))::date
+        );
+    END LOOP;
+END $$;
+
+-- Create indexes for better performance (created on every partition)
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_id ON messages(conversation_id, timestamp);
 CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages(timestamp);
 CREATE INDEX IF NOT EXISTS idx_conversations_updated_at ON conversations(updated_at);
 
+-- Full-text search: generated tsvector kept in sync on every write, GIN-indexed
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS message_tsv tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', message_text)) STORED;
+CREATE INDEX IF NOT EXISTS idx_messages_message_tsv ON messages USING GIN (message_tsv);
+
 -- Sample data (optional)
 INSERT INTO conversations (id) VALUES (1) ON CONFLICT DO NOTHING;
 INSERT INTO messages (conversation_id, message_text, sender) VALUES 
@@ -0,0 +1,56 @@
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.config.models.conversation import Base, upgrade_schema
+from backend.config.settings import settings
+
+# Async drivers for the URLs the sync engine is configured with
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'postgresql+psycopg2': 'postgresql+asyncpg',
+}
+
+
+def async_database_url(url: str) -> str:
+    """The same database behind an asyncio driver: aiosqlite for SQLite, asyncpg for Postgres"""
+    scheme, sep, rest = url.partition('://')
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+
+def pool_options(url: str) -> dict:
+    if url.startswith('sqlite'):
+        # One file, one writer: a few connections serve any number of readers without lock churn
+        return {'pool_size': min(settings.DB_POOL_SIZE, 5), 'max_overflow': 0, 'connect_args': {'timeout': 30}}
+    return {'pool_size': settings.DB_POOL_SIZE, 'max_overflow': settings.DB_MAX_OVERFLOW, 'pool_pre_ping': True}
+
+
+engine = create_engine(settings.DATABASE_URL, **pool_options(settings.DATABASE_URL))
+SessionLocal = sessionmaker(bind=engine, autoflush=False)
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def init_db():
+    with engine.begin() as conn:
+        Base.metadata.create_all(conn)
+        upgrade_schema(conn)
+
+
+def create_async_sessionmaker(url: str = settings.DATABASE_URL):
+    """An async engine and session factory for ``url``; sessions keep loaded rows usable after commit"""
+    async_engine = create_async_engine(async_database_url(url), **pool_options(url))
+    return async_engine, async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
+
+async def init_async_db(async_engine):
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(upgrade_schema)
@@ -0,0 +1,90 @@
+# fake_llm_server.py - Local stand-in for the Groq chat completions API
+#
+# Injects latency and errors so ResilientLLMClient can be exercised without
+# network access. Point GROQ_BASE_URL at http://localhost:8001/v1 to use it.
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeLLMConfig:
+    """Mutable fault-injection knobs shared by all handler threads"""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests_served = 0
+
+
+def make_handler(config):
+    class FakeLLMHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            config.requests_served += 1
+
+            time.sleep(config.latency + random.uniform(0, config.jitter))
+
+            if random.random() < config.error_rate:
+                self._send(config.error_status, {'error': {'message': 'injected failure'}})
+                return
+
+            last_message = (payload.get('messages') or [{}])[-1].get('content', '')
+            self._send(200, {
+                'id': 'fake-completion',
+                'model': payload.get('model'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': f"[fake-llm] {last_message}"},
+                    'finish_reason': 'stop'
+                }]
+            })
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            try:
+                self.wfile.write(data)
+            except BrokenPipeError:
+                pass  # client gave up on its deadline
+
+        def log_message(self, format, *args):
+            pass
+
+    return FakeLLMHandler
+
+
+def start_fake_llm_server(config, host='127.0.0.1', port=0):
+    """Start the server on a daemon thread and return (server, base_url)"""
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fake LLM server with latency and error injection')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency', type=float, default=0.0, help='base latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests that fail')
+    parser.add_argument('--error-status', type=int, default=503)
+    args = parser.parse_args()
+
+    config = FakeLLMConfig(args.latency, args.jitter, args.error_rate, args.error_status)
+    server, base_url = start_fake_llm_server(config, host='0.0.0.0', port=args.port)
+    print(f"Fake LLM server listening on {base_url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
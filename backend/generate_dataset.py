@@ -0,0 +1,220 @@
+# generate_dataset.py - Deterministic synthetic users, conversations and messages at benchmark scale
+#
+# Every user is generated from its own RNG seeded by (--seed, user number),
+# so the same seed always produces the same rows regardless of --workers or
+# how users are split into chunks, and every benchmark can run on the same
+# data. Distributions follow what chat traffic looks like:
+#
+#   - conversations per user and turns per conversation are Zipfian: most
+#     users have a couple of short chats, a few have hundreds of turns
+#   - timestamps are bursty: sessions are separated by heavy-tailed (Pareto)
+#     gaps, while turns inside a session arrive seconds apart
+#   - message words follow a Zipfian vocabulary, as in bench_search.py
+#
+# Worker processes generate disjoint user ranges and bulk insert them, one
+# transaction per chunk. A comma-separated --database-url spreads users over
+# shards with ShardMap, exactly as the app routes them.
+#
+#   python generate_dataset.py --database-url sqlite:///bench.db --users 100000 --workers 8
+#   python generate_dataset.py --database-url postgresql://localhost/bench --users 1000000
+
+import argparse
+import bisect
+import multiprocessing
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from sqlalchemy import text
+
+from models import Conversation, Message, User, db
+from services.migrations import migrate
+from services.partitions import PartitionMaintainer, partition_ddl, planned_partitions
+from services.search_service import MessageSearchService
+from services.shard_router import ShardMap, user_key
+from services.simple_ai_service import SimpleAIService
+
+VOCABULARY = (
+    "order shipping refund headphones wireless battery charger cable case screen laptop phone "
+    "warranty return exchange delivery tracking invoice payment card discount coupon price stock "
+    "size color bluetooth speaker keyboard mouse monitor adapter usb replacement broken damaged "
+    "late missing account password login subscription cancel upgrade support help thanks hello"
+).split()
+WORD_WEIGHTS = list(accumulate(1.0 / (rank + 1) for rank in range(len(VOCABULARY))))
+USER_OPENERS = ['Hi, ', 'Hello, ', '', '', 'Quick question: ', 'Can you help? ']
+ASSISTANT_OPENERS = ['Sure, ', 'Thanks for reaching out. ', 'I can help with that. ', '']
+
+
+class ZipfSampler:
+    """Draws 1..maximum with P(k) proportional to 1 / k**exponent"""
+
+    def __init__(self, exponent, maximum):
+        self.cumulative = list(accumulate(1.0 / k ** exponent for k in range(1, maximum + 1)))
+
+    def sample(self, rng):
+        return bisect.bisect_left(self.cumulative, rng.random() * self.cumulative[-1]) + 1
+
+
+class DatasetConfig:
+    def __init__(self, seed=42, start=datetime(2024, 1, 1), days=365, conversation_exponent=1.8,
+                 max_conversations=200, turn_exponent=1.7, max_turns=500, session_gap_hours=6.0):
+        self.seed = seed
+        self.start = start
+        self.days = days
+        self.conversations = ZipfSampler(conversation_exponent, max_conversations)
+        self.turns = ZipfSampler(turn_exponent, max_turns)
+        self.session_gap_hours = session_gap_hours
+
+
+def _uuid(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _sentence(rng, openers):
+    words = rng.choices(VOCABULARY, cum_weights=WORD_WEIGHTS, k=max(2, int(rng.lognormvariate(2.3, 0.5))))
+    return rng.choice(openers) + ' '.join(words).capitalize() + rng.choice(['.', '?', '.', '!'])
+
+
+def generate_user(config, number, titler=SimpleAIService()):
+    """Rows for one user: (user, conversations, messages), a pure function of (seed, number)"""
+    rng = random.Random(f"{config.seed}:{number}")
+    username = f"synthetic_{number}"
+    end = config.start + timedelta(days=config.days)
+    created_at = config.start + timedelta(seconds=rng.uniform(0, config.days * 86400 * 0.8))
+    user = {'id': _uuid(rng), 'username': username, 'created_at': created_at}
+
+    conversations, messages = [], []
+    clock = created_at
+    key_prefix = f"{user_key(username):08x}"
+    for _ in range(config.conversations.sample(rng)):
+        # Heavy-tailed gaps between sessions: mostly hours, occasionally weeks
+        clock += timedelta(hours=config.session_gap_hours * (rng.paretovariate(1.2) - 1))
+        if clock >= end:
+            break
+        conversation_id = str(uuid.UUID(key_prefix + uuid.UUID(int=rng.getrandbits(128)).hex[8:]))
+        started_at = clock
+        first_message = None
+        for _ in range(config.turns.sample(rng)):
+            clock += timedelta(seconds=rng.expovariate(1 / 40.0))  # user reads and types
+            content = _sentence(rng, USER_OPENERS)
+            first_message = first_message or content
+            messages.append({'id': _uuid(rng), 'conversation_id': conversation_id, 'content': content,
+                             'role': 'user', 'timestamp': clock})
+            clock += timedelta(seconds=rng.uniform(0.5, 4.0))  # assistant latency
+            messages.append({'id': _uuid(rng), 'conversation_id': conversation_id,
+                             'content': _sentence(rng, ASSISTANT_OPENERS), 'role': 'assistant', 'timestamp': clock})
+        conversations.append({'id': conversation_id, 'user_id': user['id'],
+                              'title': titler.generate_title(first_message),
+                              'created_at': started_at, 'updated_at': clock})
+    return user, conversations, messages
+
+
+def engine_options(url):
+    return {'connect_args': {'timeout': 120}} if url.startswith('sqlite') else {}
+
+
+def write_chunk(args):
+    """Generate and insert users [first, last); runs in a worker process"""
+    urls, config, first, last, batch_size = args
+    shards = ShardMap(urls, engine_options=engine_options(urls[0]))
+    rows = {}
+    for number in range(first, last):
+        user, conversations, messages = generate_user(config, number)
+        shard_rows = rows.setdefault(shards.shard_for_user(user['username']), ([], [], []))
+        shard_rows[0].append(user)
+        shard_rows[1].extend(conversations)
+        shard_rows[2].extend(messages)
+
+    counts = [0, 0, 0]
+    for shard, (users, conversations, messages) in rows.items():
+        with shards.engines[shard].begin() as conn:
+            for index, (table, batch_rows) in enumerate(
+                    ((User.__table__, users), (Conversation.__table__, conversations), (Message.__table__, messages))):
+                for i in range(0, len(batch_rows), batch_size):
+                    conn.execute(table.insert(), batch_rows[i:i + batch_size])
+                counts[index] += len(batch_rows)
+    for engine in shards.engines:
+        engine.dispose()
+    return counts
+
+
+def dataset_partitions(config):
+    """(name, start, end) of the monthly message partitions the simulated period writes to"""
+    end = config.start + timedelta(days=config.days)
+    # A conversation started just before the end can run on into the next month
+    return planned_partitions('message', config.start.date(), end.date(), months_ahead=1)
+
+
+def prepare(urls, search_index, config):
+    shards = ShardMap(urls, engine_options=engine_options(urls[0]))
+    for engine in shards.engines:
+        migrate(engine, db.metadata)
+        if PartitionMaintainer(engine).is_partitioned():
+            # The app only keeps partitions around the current month; without these
+            # every generated message would land in the default partition
+            with engine.begin() as conn:
+                for name, start, end in dataset_partitions(config):
+                    conn.execute(text(partition_ddl('message', name, start, end)))
+        if search_index:
+            MessageSearchService(engine).ensure_index()
+        if engine.dialect.name == 'sqlite':
+            with engine.begin() as conn:
+                conn.execute(text("PRAGMA journal_mode=WAL"))
+        engine.dispose()
+
+
+def generate(urls, users, config, workers=4, chunk_users=2000, batch_size=5000, first_user=0):
+    """Write users [first_user, first_user + users) to ``urls``; returns (users, conversations, messages)"""
+    chunks = [(urls, config, first, min(first + chunk_users, first_user + users), batch_size)
+              for first in range(first_user, first_user + users, chunk_users)]
+    totals = [0, 0, 0]
+    started = time.perf_counter()
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(workers) as pool:
+        for done, counts in enumerate(pool.imap_unordered(write_chunk, chunks), start=1):
+            totals = [total + count for total, count in zip(totals, counts)]
+            if done % max(1, len(chunks) // 20) == 0 or done == len(chunks):
+                elapsed = time.perf_counter() - started
+                print(f"  {done}/{len(chunks)} chunks  {totals[0]:>10,} users  {totals[1]:>11,} conversations  "
+                      f"{totals[2]:>13,} messages  ({sum(totals) / elapsed:,.0f} rows/s)")
+    return tuple(totals)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a deterministic synthetic chat dataset')
+    parser.add_argument('--database-url', required=True, help='target database; comma-separate shard URLs')
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--first-user', type=int, default=0, help='resume or extend from this user number')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--chunk-users', type=int, default=2000, help='users per worker transaction')
+    parser.add_argument('--batch-size', type=int, default=5000, help='rows per INSERT batch')
+    parser.add_argument('--start', type=datetime.fromisoformat, default=datetime(2024, 1, 1))
+    parser.add_argument('--days', type=int, default=365, help='length of the simulated period')
+    parser.add_argument('--conversation-exponent', type=float, default=1.8,
+                        help='Zipf exponent of conversations per user (higher = fewer heavy users)')
+    parser.add_argument('--max-conversations', type=int, default=200)
+    parser.add_argument('--turn-exponent', type=float, default=1.7,
+                        help='Zipf exponent of turns per conversation')
+    parser.add_argument('--max-turns', type=int, default=500)
+    parser.add_argument('--search-index', action='store_true',
+                        help='create the full-text index first so rows are indexed as they load')
+    args = parser.parse_args()
+
+    urls = [url.strip() for url in args.database_url.split(',') if url.strip()]
+    config = DatasetConfig(seed=args.seed, start=args.start, days=args.days,
+                           conversation_exponent=args.conversation_exponent,
+                           max_conversations=args.max_conversations,
+                           turn_exponent=args.turn_exponent, max_turns=args.max_turns)
+    prepare(urls, args.search_index, config)
+    print(f"Generating {args.users:,} users (seed {args.seed}) into {len(urls)} database(s) "
+          f"with {args.workers} workers")
+    started = time.perf_counter()
+    users, conversations, messages = generate(urls, args.users, config, workers=args.workers,
+                                              chunk_users=args.chunk_users, batch_size=args.batch_size,
+                                              first_user=args.first_user)
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {users:,} users, {conversations:,} conversations and {messages:,} messages "
+          f"in {elapsed:.1f}s ({(users + conversations + messages) / elapsed:,.0f} rows/s)")
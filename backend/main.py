@@ -1,20 +1,18 @@
-import uvicorn
-import os
-from backend.api.chat_api import app
-from backend.database.setup import create_tables
-from backend.config.settings import settings
-from flask_cors import CORS
+# main.py - Start the FastAPI service
+#
+# Run from the repository root: python -m backend.main
+#
+# Nothing heavy is imported at module level: uvicorn imports the app from
+# its import string, and the app builds its LLM services on the first chat
+# request, so a restart reaches /health as early as possible.
 
-if __name__ == "__main__":
-    # Create database tables
-    create_tables()
-    from flask import Flask, request, jsonify
-    app.run(
-        host='0.0.0.0',
-        port=int(os.getenv('PORT', 5000)),
-        debug=os.getenv('FLASK_ENV') == 'development'
 
-    )
+def main():
+    import uvicorn
+
+    from backend.config.settings import settings
+
+    # Tables are created by the app's lifespan, once, in the server process
     uvicorn.run(
         "backend.api.chat_api:app",
         host=settings.API_HOST,
@@ -22,17 +20,6 @@ if __name__ == "__main__":
         reload=settings.DEBUG
     )
 
-app = Flask(__name__)
 
-# Configure CORS
-CORS(app, origins=[
-    "http://localhost:3000",  # React dev server
-    "http://localhost:3001",  # Alternative React port
-    os.getenv("FRONTEND_URL", "http://localhost:3000")
-])
-
-# Your existing routes here...
-
-
-    # Run the application
-    
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# models.py - Flask app database models
+#
+# Kept apart from app.py so scripts that only need the tables (migrations,
+# dataset generation, shard tools) can import them without building the app
+# and binding it to DATABASE_URL. app.py calls db.init_app.
+
+import uuid
+from datetime import datetime
+
+from flask_sqlalchemy import SQLAlchemy
+
+from services.replica_router import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# Database Models (using SQLAlchemy ORM)
+class User(db.Model):
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    username = db.Column(db.String(80), unique=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    conversations = db.relationship('Conversation', backref='user', lazy=True)
+
+class Conversation(db.Model):
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False)
+    title = db.Column(db.String(200), default="New Conversation")
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    messages = db.relationship('Message', backref='conversation', lazy=True, cascade='all, delete-orphan')
+
+class Message(db.Model):
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    conversation_id = db.Column(db.String(36), db.ForeignKey('conversation.id'), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    role = db.Column(db.String(20), nullable=False)  # 'user' or 'assistant'
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'conversation_id': self.conversation_id,
+            'content': self.content,
+            'role': self.role,
+            'timestamp': self.timestamp  # serialized as ISO 8601 by the JSON provider
+        }
+
+class ConversationSummary(db.Model):
+    """Rolling summary of the oldest messages in a conversation"""
+    conversation_id = db.Column(db.String(36), db.ForeignKey('conversation.id', ondelete='CASCADE'), primary_key=True)
+    summary = db.Column(db.Text, nullable=False, default='')
+    summarized_count = db.Column(db.Integer, nullable=False, default=0)  # leading messages folded in
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class UserSyncState(db.Model):
+    """Per-user change sequence counter backing the delta-sync endpoint"""
+    user_id = db.Column(db.String(36), db.ForeignKey('user.id'), primary_key=True)
+    last_seq = db.Column(db.BigInteger, nullable=False, default=0)
+
+class ChangeLog(db.Model):
+    """One row per message/conversation change, ordered by the user's sequence"""
+    user_id = db.Column(db.String(36), db.ForeignKey('user.id'), primary_key=True)
+    seq = db.Column(db.BigInteger, primary_key=True)
+    kind = db.Column(db.String(30), nullable=False)  # 'message', 'conversation', 'conversation_deleted'
+    entity_id = db.Column(db.String(36), nullable=False)
+    conversation_id = db.Column(db.String(36), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class Product(db.Model):
+    """Catalog item; the table load_data.py fills from CSV"""
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    name = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text)
+    price = db.Column(db.Numeric(10, 2))
+    category = db.Column(db.String(100))
+    stock_quantity = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
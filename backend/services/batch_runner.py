@@ -0,0 +1,95 @@
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Tuple
+
+Group = List[Tuple[int, dict]]
+
+
+def group_items(items: List[dict]) -> List[Group]:
+    """Split batch items into per-conversation groups of (index, item), keeping each group's order.
+
+    Items naming the same ``conversation_id``, or the same ``conversation``
+    label for a conversation the batch creates, form one group; any other
+    item is a group of its own.
+    """
+    groups: Dict[tuple, Group] = {}
+    for index, item in enumerate(items):
+        if item.get('conversation_id'):
+            key = ('id', item['conversation_id'])
+        elif item.get('conversation') is not None:
+            key = ('label', item.get('user_id'), str(item['conversation']))
+        else:
+            key = ('item', index)
+        groups.setdefault(key, []).append((index, item))
+    return list(groups.values())
+
+
+def latency_summary(latencies_ms: List[float]) -> dict:
+    if not latencies_ms:
+        return {'count': 0}
+    ordered = sorted(latencies_ms)
+
+    def percentile(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 1)
+
+    return {'count': len(ordered), 'mean': round(sum(ordered) / len(ordered), 1), 'p50': percentile(0.5),
+            'p95': percentile(0.95), 'p99': percentile(0.99), 'max': round(ordered[-1], 1)}
+
+
+def run_batch(groups: List[Group], run_group: Callable[[Group, Callable[[dict], None]], None],
+              workers: int = 4) -> Iterator[dict]:
+    """Run ``run_group(group, emit)`` for every group on a thread pool and yield results as they arrive.
+
+    ``run_group`` processes its items in order and calls ``emit`` once per
+    item with a dict holding at least ``index`` and ``status`` (and
+    ``latency_ms`` when it succeeded). Items a group never reported, because
+    it raised, are yielded as 500s. The last result is a ``summary`` with
+    throughput and latency percentiles for the whole batch.
+    """
+    results = queue.Queue()
+    total = sum(len(group) for group in groups)
+
+    def run(group):
+        reported = set()
+
+        def emit(result):
+            reported.add(result['index'])
+            results.put(result)
+
+        try:
+            run_group(group, emit)
+            error = 'Item was not processed'
+        except Exception as e:
+            error = f'Internal server error: {str(e)}'
+        for index, item in group:
+            if index not in reported:
+                results.put({'index': index, 'id': item.get('id'), 'status': 500, 'error': error})
+
+    started = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='batch')
+    try:
+        for group in groups:
+            executor.submit(run, group)
+        latencies, succeeded = [], 0
+        for _ in range(total):
+            result = results.get()
+            if result['status'] == 200:
+                succeeded += 1
+                latencies.append(result['latency_ms'])
+            yield result
+    finally:
+        # A client that stops reading doesn't stop the batch; its turns still commit
+        executor.shutdown(wait=False)
+    elapsed = time.perf_counter() - started
+    yield {
+        'type': 'summary',
+        'items': total,
+        'succeeded': succeeded,
+        'failed': total - succeeded,
+        'conversations': len(groups),
+        'workers': workers,
+        'elapsed_seconds': round(elapsed, 3),
+        'items_per_second': round(total / elapsed, 1) if elapsed > 0 else None,
+        'latency_ms': latency_summary(latencies)
+    }
@@ -0,0 +1,146 @@
+import threading
+import time
+import zlib
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional
+
+from sqlalchemy import text
+
+# Advisory lock class id for conversation turns (the two-key form keeps them
+# apart from MIGRATION_LOCK_ID and anything else using single-key locks)
+CONVERSATION_LOCK_NAMESPACE = 7_036_002
+
+
+class ConversationBusy(Exception):
+    """A turn waited longer than the timeout for the conversation's previous turns"""
+
+
+class _Waiter:
+    __slots__ = ('conversation_id', 'event')
+
+    def __init__(self, conversation_id):
+        self.conversation_id = conversation_id
+        self.event = threading.Event()
+
+
+class _Stripe:
+    __slots__ = ('guard', 'holder', 'waiters')
+
+    def __init__(self):
+        self.guard = threading.Lock()
+        self.holder = None  # conversation id whose turn holds the stripe
+        self.waiters = deque()
+
+
+def advisory_key(conversation_id: str) -> int:
+    """Signed 32-bit key for pg_advisory_xact_lock(namespace, key)"""
+    key = zlib.crc32(conversation_id.encode())
+    return key - 2 ** 32 if key >= 2 ** 31 else key
+
+
+class ConversationLocks:
+    """Runs the turns of one conversation one at a time, in arrival order.
+
+    In-process, conversations hash onto ``stripes`` FIFO locks, so memory
+    stays fixed however many conversations exist and unrelated conversations
+    only meet when they share a stripe. Waiters are handed the stripe in the
+    order they queued, so a conversation's turns see each other's messages
+    in the order they were sent. Across processes, a Postgres session also
+    takes a transaction-scoped advisory lock on the conversation, released
+    when the turn commits or rolls back.
+
+    ``stats()`` reports how often turns had to wait and for how long, and
+    how many waits were stripe collisions between different conversations
+    (raise ``stripes`` if that number grows).
+    """
+
+    def __init__(self, stripes: int = 1024, timeout: float = 30.0):
+        self.timeout = timeout
+        self._stripes = [_Stripe() for _ in range(stripes)]
+        self._stats_lock = threading.Lock()
+        self._stats = {'acquired': 0, 'contended': 0, 'stripe_collisions': 0, 'timeouts': 0,
+                       'advisory_contended': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0}
+
+    def _stripe(self, conversation_id: str) -> _Stripe:
+        return self._stripes[zlib.crc32(conversation_id.encode()) % len(self._stripes)]
+
+    def _record(self, waited: Optional[float] = None, collision: bool = False, **counts):
+        with self._stats_lock:
+            for key, count in counts.items():
+                self._stats[key] += count
+            if waited is not None:
+                self._stats['contended'] += 1
+                self._stats['stripe_collisions'] += collision
+                self._stats['wait_seconds'] += waited
+                self._stats['max_wait_seconds'] = max(self._stats['max_wait_seconds'], waited)
+
+    def _acquire(self, stripe: _Stripe, conversation_id: str, timeout: float):
+        with stripe.guard:
+            if stripe.holder is None and not stripe.waiters:
+                stripe.holder = conversation_id
+                self._record(acquired=1)
+                return
+            collision = stripe.holder != conversation_id and all(
+                waiter.conversation_id != conversation_id for waiter in stripe.waiters)
+            waiter = _Waiter(conversation_id)
+            stripe.waiters.append(waiter)
+
+        started = time.perf_counter()
+        if not waiter.event.wait(timeout):
+            with stripe.guard:
+                # The stripe may have been handed over just as the wait ran out
+                if not waiter.event.is_set():
+                    stripe.waiters.remove(waiter)
+                    self._record(timeouts=1)
+                    raise ConversationBusy(f"Conversation {conversation_id} is busy")
+        self._record(time.perf_counter() - started, collision, acquired=1)
+
+    def _release(self, stripe: _Stripe):
+        with stripe.guard:
+            if stripe.waiters:
+                waiter = stripe.waiters.popleft()
+                stripe.holder = waiter.conversation_id
+                waiter.event.set()
+            else:
+                stripe.holder = None
+
+    def _advisory_lock(self, session, conversation_id: str, timeout: float):
+        params = {'namespace': CONVERSATION_LOCK_NAMESPACE, 'key': advisory_key(conversation_id)}
+        if session.execute(text("SELECT pg_try_advisory_xact_lock(:namespace, :key)"), params).scalar():
+            return
+        self._record(advisory_contended=1)
+        started = time.perf_counter()
+        session.execute(text(f"SET LOCAL lock_timeout = {int(timeout * 1000)}"))
+        try:
+            session.execute(text("SELECT pg_advisory_xact_lock(:namespace, :key)"), params)
+        except Exception:
+            self._record(timeouts=1)
+            raise ConversationBusy(f"Conversation {conversation_id} is busy")
+        session.execute(text("SET LOCAL lock_timeout TO DEFAULT"))
+        self._record(time.perf_counter() - started)
+
+    @contextmanager
+    def hold(self, conversation_id: str, session=None, timeout: Optional[float] = None):
+        """Hold the conversation for one turn; with a Postgres ``session`` also lock it database-wide.
+
+        Raises ConversationBusy after ``timeout`` seconds (default: the
+        instance's) of waiting for earlier turns.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        stripe = self._stripe(conversation_id)
+        self._acquire(stripe, conversation_id, timeout)
+        try:
+            if session is not None and session.get_bind().dialect.name == 'postgresql':
+                self._advisory_lock(session, conversation_id, timeout)
+            yield
+        finally:
+            self._release(stripe)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['wait_seconds'] = round(stats['wait_seconds'], 3)
+        stats['max_wait_seconds'] = round(stats['max_wait_seconds'], 3)
+        stats['stripes'] = len(self._stripes)
+        return stats
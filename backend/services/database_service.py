@@ -1,50 +1,190 @@
 from typing import List, Dict, Any, Optional
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from backend.models.conversation import Conversation
-from backend.database.setup import get_db
+from backend.config.models.conversation import Conversation, ResultBlob
+from backend.config.settings import settings
+from backend.database.setup import create_async_sessionmaker, get_db
+from backend.services import result_store
 import json
 
+def _blob(packed: result_store.PackedResults) -> ResultBlob:
+    return ResultBlob(
+        digest=packed.digest,
+        data=packed.data,
+        raw_size=packed.raw_size,
+        row_count=packed.row_count,
+        stored_rows=packed.stored_rows,
+        truncated=packed.truncated
+    )
+
+def _interaction(interaction_data: Dict[str, Any], packed: result_store.PackedResults) -> Conversation:
+    return Conversation(
+        conversation_id=interaction_data["conversation_id"],
+        user_message=interaction_data["user_message"],
+        ai_response=interaction_data["ai_response"],
+        interaction_type=interaction_data["interaction_type"],
+        database_results=packed.inline,
+        results_digest=packed.digest
+    )
+
+def _history_query(conversation_id: str, limit: int):
+    return select(Conversation).where(
+        Conversation.conversation_id == conversation_id
+    ).order_by(Conversation.timestamp.desc()).limit(limit)
+
+def _history(interactions) -> List[Dict]:
+    return [
+        {
+            "id": interaction.id,
+            "user_message": interaction.user_message,
+            "ai_response": interaction.ai_response,
+            "interaction_type": interaction.interaction_type,
+            "has_database_results": interaction.has_database_results,
+            "timestamp": interaction.timestamp.isoformat()
+        }
+        for interaction in reversed(interactions)
+    ]
+
+def _results_query(interaction_id: int):
+    return select(
+        Conversation.database_results, ResultBlob.data, ResultBlob.truncated, ResultBlob.row_count
+    ).outerjoin(ResultBlob, Conversation.results_digest == ResultBlob.digest).where(
+        Conversation.id == interaction_id
+    )
+
+def _results(row) -> Optional[Dict[str, Any]]:
+    if row is None:
+        return None
+    if row.data is None:
+        inline = row.database_results
+        return {
+            "results": inline,
+            "truncated": False,
+            "row_count": len(inline) if isinstance(inline, list) else None
+        }
+    return {
+        "results": result_store.decode(row.data),
+        "truncated": row.truncated,
+        "row_count": row.row_count
+    }
+
 class DatabaseService:
-    def __init__(self):
-        pass
-    
-    def store_interaction(self, interaction_data: Dict[str, Any]):
-        """Store conversation interaction in database"""
+    def __init__(self, inline_max_bytes: int = settings.RESULTS_INLINE_MAX_BYTES,
+                 max_bytes: int = settings.RESULTS_MAX_BYTES):
+        self.inline_max_bytes = inline_max_bytes
+        self.max_bytes = max_bytes
+
+    def _store_blob(self, db: Session, packed: result_store.PackedResults):
+        """Insert the blob unless identical content is already stored"""
+        if db.get(ResultBlob, packed.digest) is not None:
+            return
+        try:
+            with db.begin_nested():
+                db.add(_blob(packed))
+        except IntegrityError:
+            pass  # a concurrent writer stored the same content first
+
+    def store_interaction(self, interaction_data: Dict[str, Any], task_queue=None):
+        """Store conversation interaction in database.
+
+        The interaction row is always written before this returns, so the
+        next turn and history reads see it. With ``task_queue``, results too
+        large to keep inline are compressed and stored afterwards by its
+        ``store_interaction_results`` task; until then the interaction
+        reports no database results.
+        """
+        results = interaction_data.get("database_results")
+        deferred = task_queue is not None and results is not None and \
+            not result_store.fits_inline(results, self.inline_max_bytes)
         db = next(get_db())
         try:
-            db_interaction = Conversation(
-                conversation_id=interaction_data["conversation_id"],
-                user_message=interaction_data["user_message"],
-                ai_response=interaction_data["ai_response"],
-                interaction_type=interaction_data["interaction_type"],
-                database_results=interaction_data.get("database_results")
-            )
-            db.add(db_interaction)
+            if deferred:
+                db_interaction = _interaction(interaction_data, result_store.PackedResults())
+                db.add(db_interaction)
+                db.flush()
+                task_queue.enqueue(db, 'store_interaction_results',
+                                   {'interaction_id': db_interaction.id, 'database_results': results})
+            else:
+                packed = result_store.pack(results, self.inline_max_bytes, self.max_bytes)
+                if packed.out_of_line:
+                    self._store_blob(db, packed)
+                db_interaction = _interaction(interaction_data, packed)
+                db.add(db_interaction)
             db.commit()
             db.refresh(db_interaction)
-            return db_interaction
         except Exception as e:
             db.rollback()
             raise e
         finally:
             db.close()
-    
+        if deferred:
+            task_queue.notify()
+        return db_interaction
+
+    def store_interaction_results(self, payload: Dict[str, Any]):
+        """Task handler: store an interaction's out-of-line results and link them to it"""
+        db = next(get_db())
+        try:
+            packed = result_store.pack(payload["database_results"], self.inline_max_bytes, self.max_bytes)
+            if packed.out_of_line:
+                self._store_blob(db, packed)
+            db.execute(update(Conversation).where(Conversation.id == payload["interaction_id"]).values(
+                database_results=packed.inline, results_digest=packed.digest))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            raise e
+        finally:
+            db.close()
+
     def get_conversation_history(self, conversation_id: str, limit: int = 10) -> List[Dict]:
         """Get conversation history for a specific conversation"""
         db = next(get_db())
         try:
-            interactions = db.query(Conversation).filter(
-                Conversation.conversation_id == conversation_id
-            ).order_by(Conversation.timestamp.desc()).limit(limit).all()
-            
-            return [
-                {
-                    "user_message": interaction.user_message,
-                    "ai_response": interaction.ai_response,
-                    "interaction_type": interaction.interaction_type,
-                    "timestamp": interaction.timestamp.isoformat()
-                }
-                for interaction in reversed(interactions)
-            ]
+            return _history(db.scalars(_history_query(conversation_id, limit)).all())
+        finally:
+            db.close()
+
+    def get_database_results(self, interaction_id: int) -> Optional[Dict[str, Any]]:
+        """Load an interaction's database_results on request.
+
+        Returns ``{"results", "truncated", "row_count"}``, or None when the
+        interaction doesn't exist. History reads never load these columns.
+        """
+        db = next(get_db())
+        try:
+            return _results(db.execute(_results_query(interaction_id)).first())
         finally:
-            db.close()
\ No newline at end of file
+            db.close()
+
+class AsyncDatabaseService:
+    """The read side of DatabaseService for ``async def`` handlers.
+
+    Same tables, same results layout, but on SQLAlchemy's asyncio engine
+    (aiosqlite for SQLite, asyncpg for Postgres), so a request waiting on the
+    database yields the event loop instead of blocking every other request.
+    Connections come from the engine's pool (DB_POOL_SIZE + DB_MAX_OVERFLOW).
+    Writes stay on DatabaseService: they happen inside the synchronous chat
+    turn, which runs on the thread pool.
+    """
+
+    def __init__(self, database_url: str = settings.DATABASE_URL,
+                 inline_max_bytes: int = settings.RESULTS_INLINE_MAX_BYTES,
+                 max_bytes: int = settings.RESULTS_MAX_BYTES):
+        self.engine, self.sessions = create_async_sessionmaker(database_url)
+        self.inline_max_bytes = inline_max_bytes
+        self.max_bytes = max_bytes
+
+    async def get_conversation_history(self, conversation_id: str, limit: int = 10) -> List[Dict]:
+        """Get conversation history for a specific conversation"""
+        async with self.sessions() as db:
+            return _history((await db.scalars(_history_query(conversation_id, limit))).all())
+
+    async def get_database_results(self, interaction_id: int) -> Optional[Dict[str, Any]]:
+        """Load an interaction's database_results on request (see DatabaseService)"""
+        async with self.sessions() as db:
+            return _results((await db.execute(_results_query(interaction_id))).first())
+
+    async def close(self):
+        await self.engine.dispose()
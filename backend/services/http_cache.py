@@ -0,0 +1,25 @@
+import hashlib
+from datetime import datetime
+
+
+def make_etag(*parts) -> str:
+    """Strong validator built from values that change whenever the payload does"""
+    raw = "|".join(p.isoformat() if isinstance(p, datetime) else str(p) for p in parts)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def not_modified(request, etag: str) -> bool:
+    """True when the client's If-None-Match already names this representation
+
+    Compressed responses carry the same validator with a coding suffix
+    (see ``services.compression``); those match too.
+    """
+    if_none_match = request.if_none_match
+    return any(if_none_match.contains(etag + suffix) for suffix in ('', '-gz', '-br'))
+
+
+def apply_etag(response, etag: str):
+    """Attach the validator and force revalidation on every use"""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
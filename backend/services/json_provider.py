@@ -0,0 +1,64 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+
+class IsoJSONProvider(DefaultJSONProvider):
+    """Stdlib provider that writes datetimes as ISO 8601 instead of HTTP dates"""
+
+    compact = True
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, (datetime, date)):
+            return o.isoformat()
+        if isinstance(o, Decimal):
+            return float(o)
+        return DefaultJSONProvider.default(o)
+
+
+class OrjsonProvider(IsoJSONProvider):
+    """orjson-backed provider; serializes datetimes natively in C.
+
+    Output matches ``IsoJSONProvider`` for the types the API returns, so the
+    two can be swapped with ``settings.JSON_PROVIDER``.
+    """
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        # Hand bytes straight to the response, skipping the str round trip
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=option),
+            mimetype=self.mimetype
+        )
+
+
+def get_json_provider_class(name: str):
+    """Resolve ``settings.JSON_PROVIDER`` to a provider class"""
+    if name == 'orjson':
+        if orjson is None:
+            print("[JSON] orjson not installed, using stdlib json provider")
+            return IsoJSONProvider
+        return OrjsonProvider
+    if name == 'std':
+        return IsoJSONProvider
+    raise ValueError(f"Unknown JSON provider: {name}")
+
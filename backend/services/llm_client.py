@@ -0,0 +1,193 @@
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class LLMClientError(Exception):
+    """Raised when the upstream LLM cannot produce a completion"""
+
+
+class CircuitOpenError(LLMClientError):
+    """Raised when the circuit breaker rejects a call without trying upstream"""
+
+
+class DeadlineExceededError(LLMClientError):
+    """Raised when there is not enough time left in the request budget"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def allow_request(self) -> bool:
+        """Return True if a call may go upstream right now"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+                self._probe_in_flight = False
+
+
+class ResilientLLMClient:
+    """Pooled client for an OpenAI-compatible chat completions API.
+
+    Every call runs against a deadline derived from the endpoint SLO. Failed
+    attempts are retried with full-jitter backoff while budget remains, and a
+    circuit breaker short-circuits calls while the upstream is unhealthy. When
+    the breaker is open or the deadline is too close, the fallback responder
+    (normally ``SimpleAIService.generate_response``) answers instead.
+    """
+
+    def __init__(self, api_key: Optional[str], base_url: str, model: str,
+                 slo_seconds: float = 8.0, pool_size: int = 10, max_retries: int = 2,
+                 min_attempt_seconds: float = 0.5, backoff_base: float = 0.1,
+                 backoff_cap: float = 2.0, breaker: Optional[CircuitBreaker] = None,
+                 fallback: Optional[Callable[..., str]] = None):
+        self.api_key = api_key
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.model = model
+        self.slo_seconds = slo_seconds
+        self.max_retries = max_retries
+        self.min_attempt_seconds = min_attempt_seconds
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.breaker = breaker or CircuitBreaker()
+        self.fallback = fallback
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+        self.stats = {"llm": 0, "fallback": 0, "retries": 0, "failures": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def deadline_for(self, slo_seconds: Optional[float] = None) -> float:
+        """Absolute monotonic deadline for a request with the given SLO"""
+        return time.monotonic() + (slo_seconds if slo_seconds is not None else self.slo_seconds)
+
+    def chat_completion(self, messages: List[Dict[str, str]], deadline: float,
+                        **params: Any) -> str:
+        """Call the upstream API, retrying until success or the deadline.
+
+        Raises ``CircuitOpenError``, ``DeadlineExceededError`` or
+        ``LLMClientError``; never falls back on its own.
+        """
+        payload = {"model": self.model, "messages": messages, **params}
+        last_error: Optional[Exception] = None
+
+        for attempt in range(self.max_retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining < self.min_attempt_seconds:
+                raise DeadlineExceededError(
+                    f"{remaining:.3f}s left in budget after {attempt} attempt(s)"
+                ) from last_error
+            if not self.breaker.allow_request():
+                raise CircuitOpenError("LLM circuit breaker is open") from last_error
+
+            try:
+                response = self.session.post(self.url, json=payload, timeout=remaining)
+                if response.status_code in RETRYABLE_STATUS_CODES:
+                    raise LLMClientError(f"upstream returned {response.status_code}")
+                response.raise_for_status()
+                content = response.json()["choices"][0]["message"]["content"]
+                self.breaker.record_success()
+                return content
+            except requests.HTTPError as e:
+                # Non-retryable 4xx: the request itself is wrong, retrying won't help
+                self.breaker.record_success()
+                raise LLMClientError(str(e)) from e
+            except (requests.RequestException, LLMClientError, KeyError, ValueError) as e:
+                self.breaker.record_failure()
+                self._count("failures")
+                last_error = e
+
+            if attempt < self.max_retries:
+                self._count("retries")
+                delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+                time.sleep(max(0.0, min(delay, deadline - time.monotonic() - self.min_attempt_seconds)))
+
+        raise LLMClientError(f"LLM call failed after {self.max_retries + 1} attempt(s)") from last_error
+
+    def complete(self, messages: List[Dict[str, str]], user_message: str,
+                 conversation_history: Optional[List[Dict]] = None,
+                 slo_seconds: Optional[float] = None, **params: Any) -> Dict[str, Any]:
+        """Return ``{"content", "source"}``, using the fallback when the LLM is unavailable"""
+        try:
+            content = self.chat_completion(messages, self.deadline_for(slo_seconds), **params)
+            self._count("llm")
+            return {"content": content, "source": "llm"}
+        except LLMClientError as e:
+            if self.fallback is None:
+                raise
+            print(f"[LLM] Falling back to rule-based responder: {e}")
+            self._count("fallback")
+            return {"content": self.fallback(user_message, conversation_history), "source": "fallback"}
+
+    def generate_response(self, user_message: str, conversation_history: Optional[List[Dict]] = None,
+                          slo_seconds: Optional[float] = None) -> str:
+        """Drop-in replacement for ``SimpleAIService.generate_response``"""
+        messages = [
+            {"role": item["role"], "content": item["content"]}
+            for item in (conversation_history or [])
+            if "role" in item and "content" in item
+        ]
+        messages.append({"role": "user", "content": user_message})
+        return self.complete(messages, user_message, conversation_history, slo_seconds)["content"]
+
+    def close(self):
+        self.session.close()
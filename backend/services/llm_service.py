@@ -0,0 +1,147 @@
+import json
+import re
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from .llm_client import LLMClientError
+from .query_templates import QueryTemplateCache, UnsafeQueryError, read_only_engine
+
+CATALOG_SCHEMA = """product(id TEXT, name TEXT, description TEXT, price DECIMAL(10,2), category TEXT, stock_quantity INTEGER)"""
+
+PLANNER_PROMPT = f"""You turn shopping questions into one read-only SQL query over this schema:
+{CATALOG_SCHEMA}
+Reply with JSON only: {{"intent": "<price_lookup|stock_check|product_search|general>", "sql": "<query or null>"}}.
+Copy product names, categories and numbers from the question into the SQL exactly as written.
+Use null when the question needs no data. Never modify data."""
+
+ANSWER_PROMPT = """You are a helpful shopping assistant. Answer using only the catalog rows below.
+If there are no rows, say you couldn't find a match and ask a clarifying question.
+Catalog rows (JSON): {rows}"""
+
+_JSON_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+
+class LLMIntegrationService:
+    """Answers chat messages from the product catalog with LLM-planned SQL.
+
+    Planning is the expensive step: the LLM reads the question and writes a
+    query. Planned queries are cached as templates keyed by the question's
+    intent and shape, so a repeat shape ("price of the X?") with a different
+    product or number runs the cached prepared statement with new values and
+    only the answer-phrasing call goes to the LLM.
+    """
+
+    def __init__(self, groq_api_key: Optional[str], database_service, llm_client,
+                 database_url: Optional[str] = None, template_cache: Optional[QueryTemplateCache] = None,
+                 max_rows: int = 20, task_queue=None, catalog_database_url: Optional[str] = None):
+        if database_url is None:
+            from ..config.settings import settings
+            database_url = settings.DATABASE_URL
+            catalog_database_url = catalog_database_url or settings.CATALOG_DATABASE_URL
+
+        self.groq_api_key = groq_api_key
+        self.database_service = database_service
+        self.llm_client = llm_client
+        self.templates = template_cache or QueryTemplateCache(allowed_tables=['product'])
+        # Planned SQL runs where the database, not just validate(), keeps it to reading the catalog
+        self.catalog_engine = read_only_engine(catalog_database_url or database_url, self.templates.allowed_tables)
+        self.max_rows = max_rows
+        self.task_queue = task_queue  # defers writing large database_results past the reply
+        self.stats = {'template_hits': 0, 'planned': 0, 'plan_failures': 0}
+        self._stats_lock = threading.Lock()
+        # Reading the catalog waits for the first question, not for startup
+        self._entities_loaded = False
+        self._entities_lock = threading.Lock()
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _load_entities(self):
+        """Product names and categories become slots in question shapes.
+
+        Loaded once, under the lock, so concurrent first questions wait for the
+        slots instead of shaping without them; a failed read is retried next time.
+        """
+        with self._entities_lock:
+            if self._entities_loaded:
+                return
+            try:
+                with self.catalog_engine.connect() as conn:
+                    rows = conn.execute(text("SELECT name, category FROM product")).all()
+            except Exception as e:
+                print(f"[TEMPLATES] Catalog entities unavailable: {e}")
+                return
+            self.templates.add_entities('product', (row.name for row in rows))
+            self.templates.add_entities('category', {row.category for row in rows if row.category})
+            self._entities_loaded = True
+
+    def _plan(self, message: str) -> Dict[str, Any]:
+        content = self.llm_client.chat_completion(
+            [{"role": "system", "content": PLANNER_PROMPT}, {"role": "user", "content": message}],
+            self.llm_client.deadline_for(),
+            temperature=0
+        )
+        match = _JSON_RE.search(content)
+        if not match:
+            raise ValueError("planner reply has no JSON object")
+        return json.loads(match.group(0))
+
+    def _fetch(self, message: str) -> Optional[List[Dict[str, Any]]]:
+        """Catalog rows for the message, from a cached template or a freshly planned query"""
+        if not self._entities_loaded:
+            self._load_entities()
+        shape = self.templates.shape(message)
+        with self.catalog_engine.connect() as conn:
+            cached = self.templates.lookup(shape)
+            if cached is not None:
+                template, params = cached
+                self._count('template_hits')
+                return [dict(row) for row in conn.execute(template.statement, params).mappings().fetchmany(self.max_rows)]
+
+            try:
+                plan = self._plan(message)
+            except (LLMClientError, ValueError) as e:
+                self._count('plan_failures')
+                print(f"[TEMPLATES] Planning failed: {e}")
+                return None
+            if not plan.get('sql'):
+                return None
+            try:
+                template, params, _ = self.templates.prepare(conn, shape, plan['sql'])
+            except (UnsafeQueryError, SQLAlchemyError) as e:
+                self._count('plan_failures')
+                print(f"[TEMPLATES] Rejected planned SQL: {e}")
+                return None
+            self._count('planned')
+            return [dict(row) for row in conn.execute(template.statement, params).mappings().fetchmany(self.max_rows)]
+
+    def query_database_and_respond(self, message: str, conversation_id: str) -> Dict[str, Any]:
+        rows = self._fetch(message)
+        history = self.database_service.get_conversation_history(conversation_id)
+
+        messages = [{"role": "system", "content": ANSWER_PROMPT.format(rows=json.dumps(rows or [], default=str))}]
+        for turn in history:
+            messages.append({"role": "user", "content": turn["user_message"]})
+            messages.append({"role": "assistant", "content": turn["ai_response"]})
+        messages.append({"role": "user", "content": message})
+        reply = self.llm_client.complete(messages, message)
+
+        interaction_type = 'response' if rows else 'clarification'
+        interaction = {
+            "conversation_id": conversation_id,
+            "user_message": message,
+            "ai_response": reply["content"],
+            "interaction_type": interaction_type,
+            "database_results": rows
+        }
+        self.database_service.store_interaction(interaction, task_queue=self.task_queue)
+        return {
+            "response": reply["content"],
+            "type": interaction_type,
+            "timestamp": datetime.utcnow().isoformat()
+        }
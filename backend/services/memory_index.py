@@ -0,0 +1,206 @@
+import math
+import threading
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+from .lru_cache import LRUCache
+from .product_index import tokenize
+
+DIMENSIONS = 256
+
+# Words that say nothing about what a turn was about
+STOPWORDS = frozenset(
+    "a an and are as at be but by can could do for from have hello hi how i if in is it me my "
+    "no not of on or please so that the thanks thank there this to was we what when where which "
+    "who why will with would you your".split()
+)
+
+
+def embed(text: str, dimensions: int = DIMENSIONS) -> np.ndarray:
+    """Unit-length hashed bag-of-words vector (signed feature hashing, log tf, plus adjacent-word pairs)"""
+    tokens = [token for token in tokenize(text) if token not in STOPWORDS]
+    features = Counter(tokens)
+    features.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    vector = np.zeros(dimensions, np.float32)
+    for feature, count in features.items():
+        h = zlib.crc32(feature.encode('utf-8'))
+        vector[h % dimensions] += (1.0 if h & 0x80000000 else -1.0) * (1.0 + math.log(count))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class _UserMemory:
+    """One user's turns: a ring of float16 vectors with the ids needed to fetch each turn"""
+
+    def __init__(self, dimensions: int, max_turns: int):
+        self.max_turns = max_turns
+        self.vectors = np.zeros((min(64, max_turns), dimensions), np.float16)
+        self.turns: List[Optional[dict]] = []
+        self.next = 0  # ring slot the next turn goes into once full
+        self.seq = 0  # the user's change sequence number this memory is current to
+        self.lock = threading.Lock()
+
+    def append(self, vector: np.ndarray, turn: dict):
+        with self.lock:
+            if len(self.turns) < self.max_turns:
+                slot = len(self.turns)
+                if slot == len(self.vectors):
+                    grown = np.zeros((min(2 * slot, self.max_turns), self.vectors.shape[1]), np.float16)
+                    grown[:slot] = self.vectors
+                    self.vectors = grown
+                self.turns.append(turn)
+            else:
+                # Full: the oldest turn gives way
+                slot = self.next
+                self.next = (slot + 1) % self.max_turns
+                self.turns[slot] = turn
+            self.vectors[slot] = vector
+
+
+class MemoryIndex:
+    """Per-user long-term memory of past chat turns for retrieval.
+
+    Each turn (a user message and the reply to it) is kept as a compact
+    float16 feature-hashed vector plus the message ids and timestamps needed
+    to fetch it, never the text. ``search`` scores every stored turn of the
+    user against the new message with one matrix-vector product, so recall
+    costs the same whether the relevant turn was sent a minute or months ago
+    and never loads the conversation. Each user keeps at most ``max_turns``
+    (the oldest are overwritten) and at most ``max_users`` users stay in
+    memory; a user not in memory is ``load``-ed from the database.
+
+    Other processes write turns too. Each memory remembers the user's change
+    sequence number it is current to, and ``advance`` drops it when a change
+    arrives out of order (one this process never saw), so the next recall
+    reloads it.
+    """
+
+    def __init__(self, dimensions: int = DIMENSIONS, max_turns: int = 5000, max_users: int = 10000,
+                 min_score: float = 0.15):
+        self.dimensions = dimensions
+        self.max_turns = max_turns
+        self.min_score = min_score
+        self._users = LRUCache(max_entries=max_users)
+
+    def loaded(self, user_id: str) -> bool:
+        return self._users.get(user_id) is not None
+
+    def _vector(self, turn: dict) -> np.ndarray:
+        return embed(f"{turn['user_content']} {turn.get('assistant_content') or ''}", self.dimensions)
+
+    def load(self, user_id: str, turns: Iterable[dict], seq: int = 0):
+        """Replace the user's memory with ``turns``, oldest first (see ``add`` for their keys).
+
+        ``seq`` is the user's change sequence number read before the turns.
+        """
+        memory = _UserMemory(self.dimensions, self.max_turns)
+        memory.seq = seq
+        for turn in turns:
+            memory.append(self._vector(turn), self._reference(turn))
+        self._users.put(user_id, memory)
+
+    @staticmethod
+    def _reference(turn: dict) -> dict:
+        return {key: turn.get(key) for key in ('conversation_id', 'user_message_id', 'assistant_message_id',
+                                               'started_at', 'ended_at')}
+
+    def add(self, user_id: str, turn: dict) -> bool:
+        """Append a turn to a loaded user's memory.
+
+        ``turn`` has conversation_id, user_message_id, assistant_message_id,
+        started_at, ended_at, user_content and assistant_content; only the
+        ids, timestamps and the vector are kept. Users not in memory are
+        skipped, their next ``load`` reads the turn from the database.
+        """
+        memory = self._users.get(user_id)
+        if memory is None:
+            return False
+        memory.append(self._vector(turn), self._reference(turn))
+        return True
+
+    def advance(self, user_id: str, last_seq: int, count: int) -> bool:
+        """Move a loaded user's memory past ``count`` changes ending at ``last_seq``.
+
+        True when they directly follow what the memory has seen. Otherwise
+        another process changed the user in between, the memory is dropped
+        and False is returned; don't ``add`` to it then.
+        """
+        memory = self._users.get(user_id)
+        if memory is None:
+            return False
+        with memory.lock:
+            if memory.seq == last_seq - count:
+                memory.seq = last_seq
+                return True
+        self._users.pop(user_id)
+        return False
+
+    def forget_conversation(self, user_id: str, conversation_id: str):
+        memory = self._users.get(user_id)
+        if memory is None:
+            return
+        with memory.lock:
+            for slot, turn in enumerate(memory.turns):
+                if turn is not None and turn['conversation_id'] == conversation_id:
+                    memory.turns[slot] = None
+                    memory.vectors[slot] = 0
+
+    def search(self, user_id: str, text: str, k: int = 3, exclude: Optional[Set[str]] = None) -> List[Dict]:
+        """The user's ``k`` turns most similar to ``text``, best first, each with its ``score``.
+
+        Turns whose user message id is in ``exclude`` (e.g. those already in
+        the recent context) and turns scoring under ``min_score`` are skipped.
+        """
+        memory = self._users.get(user_id)
+        if memory is None or k <= 0:
+            return []
+        query = embed(text, self.dimensions)
+        if not query.any():
+            return []
+        with memory.lock:
+            count = len(memory.turns)
+            vectors, turns = memory.vectors[:count], list(memory.turns)
+            scores = vectors.astype(np.float32) @ query
+        exclude = exclude or set()
+        candidates = min(count, k + len(exclude))
+        if candidates == 0:
+            return []
+        best = np.argpartition(-scores, candidates - 1)[:candidates]
+        hits = []
+        for slot in best[np.argsort(-scores[best])]:
+            turn = turns[slot]
+            if scores[slot] < self.min_score or len(hits) == k:
+                break
+            if turn is None or turn['user_message_id'] in exclude:
+                continue
+            hits.append({**turn, 'score': round(float(scores[slot]), 4)})
+        return hits
+
+    def stats(self) -> dict:
+        stats = self._users.stats()
+        return {'users': stats['entries'], 'max_users': stats['max_entries'],
+                'hits': stats['hits'], 'misses': stats['misses']}
+
+
+def pair_turns(messages: Iterable[dict]) -> List[dict]:
+    """Turns from messages in timestamp order: each user message with the reply that follows it"""
+    turns, pending = [], {}
+    for message in messages:
+        conversation_id = message['conversation_id']
+        if message['role'] == 'user':
+            pending[conversation_id] = message
+        elif conversation_id in pending:
+            question = pending.pop(conversation_id)
+            turns.append({
+                'conversation_id': conversation_id,
+                'user_message_id': question['id'],
+                'assistant_message_id': message['id'],
+                'started_at': question['timestamp'],
+                'ended_at': message['timestamp'],
+                'user_content': question['content'],
+                'assistant_content': message['content'],
+            })
+    return turns
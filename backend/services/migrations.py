@@ -0,0 +1,202 @@
+import argparse
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from sqlalchemy import (Column, DateTime, Integer, MetaData, String, Table, create_engine,
+                        inspect, select, text)
+
+from .partitions import partition_table
+from .task_queue import task_metadata
+
+# Bookkeeping lives in its own metadata so create_all on the app's models never touches it
+migration_metadata = MetaData()
+schema_migrations = Table(
+    'schema_migrations', migration_metadata,
+    Column('version', Integer, primary_key=True),
+    Column('description', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+# Arbitrary constant shared by every process that migrates the same Postgres database
+MIGRATION_LOCK_ID = 7_036_001
+
+
+class Migration:
+    """One schema step, applied at most once per database.
+
+    ``run(conn, metadata)`` does its work inside a transaction, then the
+    ``(name, table, columns)`` entries in ``indexes`` are created.
+    On Postgres indexes are built with ``CREATE INDEX CONCURRENTLY`` outside
+    any transaction, so a live database keeps taking writes while they build.
+    """
+
+    def __init__(self, version: int, description: str, run: Optional[Callable] = None,
+                 indexes: Optional[List[tuple]] = None):
+        self.version = version
+        self.description = description
+        self.run = run
+        self.indexes = indexes or []
+
+
+def create_tables(conn, metadata):
+    metadata.create_all(conn)
+
+
+def create_task_table(conn, metadata):
+    task_metadata.create_all(conn)
+
+
+MESSAGE_PARTITIONED_DDL = """
+    id VARCHAR(36) NOT NULL,
+    conversation_id VARCHAR(36) NOT NULL REFERENCES conversation (id),
+    content TEXT NOT NULL,
+    role VARCHAR(20) NOT NULL,
+    timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    PRIMARY KEY (id, timestamp)
+"""
+
+
+def partition_messages(conn, metadata):
+    """Postgres only: messages become monthly range partitions on timestamp (see services/partitions.py)"""
+    if conn.dialect.name != 'postgresql':
+        return
+    conn.execute(text("UPDATE message SET timestamp = now() AT TIME ZONE 'UTC' WHERE timestamp IS NULL"))
+    partition_table(conn, 'message', 'timestamp', MESSAGE_PARTITIONED_DDL)
+    # Partitioned indexes can't be built concurrently; the new table isn't visible to anyone yet
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_message_conversation_timestamp ON message (conversation_id, timestamp, id)"
+    ))
+
+
+MIGRATIONS = [
+    Migration(1, 'Create application tables', run=create_tables),
+    Migration(2, 'Hot-path indexes for history and conversation listing', indexes=[
+        # Per-conversation history, counts, newest-first pages and the (timestamp, id) keyset cursor
+        ('ix_message_conversation_timestamp', 'message', ['conversation_id', 'timestamp', 'id']),
+        # A user's conversations ordered by last activity
+        ('ix_conversation_user_updated', 'conversation', ['user_id', 'updated_at']),
+    ]),
+    Migration(3, 'Product catalog table', run=create_tables, indexes=[
+        # Incremental product index sync reads rows newer than its watermark
+        ('ix_product_created_at', 'product', ['created_at']),
+    ]),
+    # New and empty, so its (status, run_after) index is built with the table
+    Migration(4, 'Background task queue table', run=create_task_table),
+    # The primary key becomes (id, timestamp): a partitioned table's unique keys include its partition key
+    Migration(5, 'Partition messages by month', run=partition_messages),
+    Migration(6, 'Change log retention index', indexes=[
+        # The retention job deletes the oldest sync changes first
+        ('ix_change_log_created_at', 'change_log', ['created_at']),
+    ]),
+]
+
+
+def current_version(engine) -> int:
+    if not inspect(engine).has_table('schema_migrations'):
+        return 0
+    with engine.connect() as conn:
+        return conn.execute(select(schema_migrations.c.version).order_by(
+            schema_migrations.c.version.desc()).limit(1)).scalar() or 0
+
+
+def latest_version() -> int:
+    return MIGRATIONS[-1].version
+
+
+def _quote(engine, name):
+    return engine.dialect.identifier_preparer.quote(name)
+
+
+def _create_indexes_online(engine, migration):
+    """CREATE INDEX CONCURRENTLY cannot run in a transaction; a failed build leaves an INVALID index to drop first"""
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        for name, table, columns in migration.indexes:
+            invalid = conn.execute(text(
+                "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = :name AND NOT i.indisvalid"
+            ), {'name': name}).first()
+            if invalid:
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {_quote(engine, name)}"))
+            column_list = ', '.join(_quote(engine, column) for column in columns)
+            conn.execute(text(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {_quote(engine, name)} "
+                f"ON {_quote(engine, table)} ({column_list})"
+            ))
+
+
+def _create_indexes(conn, migration):
+    for name, table, columns in migration.indexes:
+        column_list = ', '.join(_quote(conn.engine, column) for column in columns)
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS {_quote(conn.engine, name)} ON {_quote(conn.engine, table)} ({column_list})"
+        ))
+
+
+def migrate(engine, metadata, target: Optional[int] = None) -> List[int]:
+    """Apply pending migrations up to ``target`` (default: latest); returns the versions applied"""
+    target = latest_version() if target is None else target
+    if current_version(engine) >= target:
+        # The common restart: no bookkeeping DDL and no wait on the deploy lock
+        return []
+    migration_metadata.create_all(engine)
+    online = engine.dialect.name == 'postgresql'
+
+    lock_conn = None
+    if online:
+        # Serialize concurrent deploys; the session-level lock survives the autocommit index builds
+        lock_conn = engine.connect().execution_options(isolation_level='AUTOCOMMIT')
+        lock_conn.execute(text("SELECT pg_advisory_lock(:id)"), {'id': MIGRATION_LOCK_ID})
+    try:
+        applied = []
+        version = current_version(engine)
+        for migration in MIGRATIONS:
+            if migration.version <= version or migration.version > target:
+                continue
+            with engine.begin() as conn:
+                if migration.run:
+                    migration.run(conn, metadata)
+                if not online:
+                    _create_indexes(conn, migration)
+            if online and migration.indexes:
+                _create_indexes_online(engine, migration)
+            # Every step is idempotent, so a crash before this point just repeats the migration
+            with engine.begin() as conn:
+                conn.execute(schema_migrations.insert().values(
+                    version=migration.version, description=migration.description, applied_at=datetime.utcnow()
+                ))
+            applied.append(migration.version)
+            print(f"[MIGRATE] Applied {migration.version}: {migration.description}")
+        return applied
+    finally:
+        if lock_conn is not None:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {'id': MIGRATION_LOCK_ID})
+            lock_conn.close()
+
+
+def status(engine):
+    version = current_version(engine)
+    for migration in MIGRATIONS:
+        marker = 'applied' if migration.version <= version else 'pending'
+        print(f"{migration.version:>4}  {marker:<8} {migration.description}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Apply or inspect versioned schema migrations')
+    parser.add_argument('command', choices=['upgrade', 'status'])
+    parser.add_argument('--database-url', help='defaults to the app database (every shard when sharded)')
+    parser.add_argument('--target', type=int, help='stop after this version')
+    args = parser.parse_args()
+
+    from app import db, app, shards  # app models define the tables migration 1 creates
+
+    if args.database_url:
+        engines = [create_engine(args.database_url)]
+    else:
+        with app.app_context():
+            engines = shards.engines if shards else [db.engine]
+    for engine in engines:
+        print(f"{engine.url.render_as_string(hide_password=True)}: version {current_version(engine)}")
+        if args.command == 'upgrade':
+            migrate(engine, db.metadata, target=args.target)
+        else:
+            status(engine)
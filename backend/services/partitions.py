@@ -0,0 +1,196 @@
+import argparse
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import create_engine, text
+
+# Messages can't predate their conversation, but conversations and messages
+# are stamped by different app servers; the floor leaves room for clock skew
+HISTORY_CLOCK_SKEW = timedelta(hours=1)
+
+
+def month_start(day) -> date:
+    return date(day.year, day.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month.year:04d}_{month.month:02d}"
+
+
+def partition_month(table: str, name: str) -> Optional[date]:
+    """The month a ``partition_name`` covers, or None for other children (e.g. the default partition)"""
+    match = re.fullmatch(rf"{re.escape(table)}_p(\d{{4}})_(\d{{2}})", name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def planned_partitions(table: str, first_month: date, today: date, months_ahead: int) -> List[Tuple[str, date, date]]:
+    """(name, start, end) for every month from ``first_month`` through ``months_ahead`` past today"""
+    month, last = month_start(first_month), add_months(month_start(today), months_ahead)
+    planned = []
+    while month <= last:
+        planned.append((partition_name(table, month), month, add_months(month, 1)))
+        month = add_months(month, 1)
+    return planned
+
+
+def expired_partitions(table: str, names, today: date, retention_months: int) -> List[str]:
+    """Monthly partitions that end on or before the retention cutoff, oldest first"""
+    cutoff = add_months(month_start(today), -retention_months)
+    months = sorted((month, name) for name in names
+                    if (month := partition_month(table, name)) is not None)
+    return [name for month, name in months if add_months(month, 1) <= cutoff]
+
+
+def partition_ddl(table: str, name: str, start: date, end: date) -> str:
+    return (f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" '
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')")
+
+
+class PartitionMaintainer:
+    """Keeps the monthly partitions of a Postgres range-partitioned table.
+
+    ``run()`` creates the partitions for the next ``months_ahead`` months so
+    inserts never fall through to the default partition, and expires months
+    older than ``retention_months`` (0 keeps everything) by detaching them;
+    detached months stay behind as plain tables to archive, unless ``drop``
+    removes them outright. Either way retention is a catalog change instead
+    of a DELETE that bloats the table and its indexes.
+    Tables that aren't partitioned, and other databases, are left alone.
+    """
+
+    def __init__(self, engine, table: str = 'message', months_ahead: int = 3,
+                 retention_months: int = 0, drop: bool = False, lock_timeout_ms: int = 5000):
+        self.engine = engine
+        self.table = table
+        self.months_ahead = months_ahead
+        self.retention_months = retention_months
+        self.drop = drop
+        self.lock_timeout_ms = lock_timeout_ms
+
+    def is_partitioned(self) -> bool:
+        if self.engine.dialect.name != 'postgresql':
+            return False
+        with self.engine.connect() as conn:
+            return conn.execute(text(
+                "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+                "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"
+            ), {'table': self.table}).first() is not None
+
+    def partitions(self) -> List[str]:
+        with self.engine.connect() as conn:
+            return list(conn.execute(text(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+                "WHERE p.relname = :table AND pg_table_is_visible(p.oid)"
+            ), {'table': self.table}).scalars())
+
+    def _lock_timeout(self, conn):
+        # Attaching and detaching lock the parent; give up rather than queue traffic behind it
+        conn.execute(text(f"SET LOCAL lock_timeout = {int(self.lock_timeout_ms)}"))
+
+    def ensure(self, today: date) -> List[str]:
+        existing = set(self.partitions())
+        created = []
+        for name, start, end in planned_partitions(self.table, today, today, self.months_ahead):
+            if name in existing:
+                continue
+            try:
+                with self.engine.begin() as conn:
+                    self._lock_timeout(conn)
+                    conn.execute(text(partition_ddl(self.table, name, start, end)))
+                created.append(name)
+            except Exception as e:
+                # Usually rows for that month already sitting in the default partition
+                print(f"[PARTITIONS ERROR] Creating {name}: {str(e)}")
+        return created
+
+    def expire(self, today: date) -> List[str]:
+        if self.retention_months <= 0:
+            return []
+        expired = []
+        for name in expired_partitions(self.table, self.partitions(), today, self.retention_months):
+            try:
+                with self.engine.begin() as conn:
+                    self._lock_timeout(conn)
+                    conn.execute(text(f'ALTER TABLE "{self.table}" DETACH PARTITION "{name}"'))
+                    if self.drop:
+                        conn.execute(text(f'DROP TABLE "{name}"'))
+                expired.append(name)
+            except Exception as e:
+                print(f"[PARTITIONS ERROR] Expiring {name}: {str(e)}")
+        return expired
+
+    def run(self, today: Optional[date] = None) -> Dict[str, List[str]]:
+        """One maintenance pass; returns the partitions created and expired"""
+        if not self.is_partitioned():
+            return {'created': [], 'expired': []}
+        today = today or datetime.utcnow().date()
+        return {'created': self.ensure(today), 'expired': self.expire(today)}
+
+
+def partition_table(conn, table: str, column: str, columns_ddl: str, months_ahead: int = 3) -> bool:
+    """Rebuild ``table`` as a monthly range-partitioned table holding the same rows.
+
+    Runs inside the caller's transaction and holds an exclusive lock while it
+    copies, so convert a large live table in a maintenance window. Indexes are
+    dropped with the old table; returns False if it was already partitioned.
+    """
+    partitioned = conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"
+    ), {'table': table}).first()
+    if partitioned:
+        return False
+    # Built under a new name so its constraints don't collide with the old table's
+    new = f"{table}_partitioned"
+    first = conn.execute(text(f'SELECT min("{column}") FROM "{table}"')).scalar()
+    today = datetime.utcnow().date()
+    conn.execute(text(f'CREATE TABLE "{new}" ({columns_ddl}) PARTITION BY RANGE ("{column}")'))
+    conn.execute(text(f'CREATE TABLE "{table}_default" PARTITION OF "{new}" DEFAULT'))
+    for name, start, end in planned_partitions(table, min(first.date(), today) if first else today,
+                                               today, months_ahead):
+        conn.execute(text(partition_ddl(new, name, start, end)))
+    columns = [row[0] for row in conn.execute(text(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_name = :table AND is_generated = 'NEVER' ORDER BY ordinal_position"
+    ), {'table': new})]
+    column_list = ', '.join(f'"{name}"' for name in columns)
+    conn.execute(text(f'INSERT INTO "{new}" ({column_list}) SELECT {column_list} FROM "{table}"'))
+    conn.execute(text(f'DROP TABLE "{table}"'))
+    conn.execute(text(f'ALTER TABLE "{new}" RENAME TO "{table}"'))
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Create upcoming monthly partitions and expire old ones')
+    parser.add_argument('--database-url', help='defaults to the app database (every shard when sharded)')
+    parser.add_argument('--table', default='message', help="'messages' for the database/init.sql schema")
+    parser.add_argument('--months-ahead', type=int, help='defaults to PARTITION_MONTHS_AHEAD')
+    parser.add_argument('--retention-months', type=int, help='defaults to MESSAGE_RETENTION_MONTHS; 0 keeps all')
+    parser.add_argument('--drop', action='store_true', help='drop expired months instead of only detaching them')
+    args = parser.parse_args()
+
+    from app import app, db, settings, shards
+
+    if args.database_url:
+        engines = [create_engine(args.database_url)]
+    else:
+        with app.app_context():
+            engines = shards.engines if shards else [db.engine]
+    for engine in engines:
+        maintainer = PartitionMaintainer(
+            engine, table=args.table,
+            months_ahead=settings.PARTITION_MONTHS_AHEAD if args.months_ahead is None else args.months_ahead,
+            retention_months=(settings.MESSAGE_RETENTION_MONTHS if args.retention_months is None
+                              else args.retention_months),
+            drop=args.drop or settings.PARTITION_DROP_EXPIRED
+        )
+        result = maintainer.run()
+        print(f"{engine.url.render_as_string(hide_password=True)}: created {result['created'] or 'none'}, "
+              f"expired {result['expired'] or 'none'}")
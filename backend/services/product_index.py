@@ -0,0 +1,363 @@
+import math
+import re
+import threading
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+HASH_BUCKETS = 1 << 20
+MAX_SEGMENTS = 8
+MAX_POSTINGS = 2048  # best postings per term scanned before falling back to the full list
+NAME_WEIGHT = 2  # name terms count twice against description/category terms
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens with a naive plural strip ("cables" -> "cable")"""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def term_bucket(token: str) -> int:
+    # crc32 is stable across processes, unlike hash()
+    return zlib.crc32(token.encode('utf-8')) & (HASH_BUCKETS - 1)
+
+
+class _Segment:
+    """Immutable postings for a batch of rows: per hashed term, the rows and their weights.
+
+    Each term's postings are in impact order (highest weight first), so the
+    best matches for a term are a prefix of its list.
+    """
+
+    def __init__(self, rows: np.ndarray, buckets: np.ndarray, tf: np.ndarray, weights: np.ndarray):
+        order = np.lexsort((-weights, buckets))
+        buckets = buckets[order]
+        self.rows = rows[order]
+        self.tf = tf[order]
+        self.weights = weights[order]
+        self.terms, starts = np.unique(buckets, return_index=True)
+        self.offsets = np.append(starts, len(buckets))
+
+    def postings(self, bucket: int, limit: Optional[int] = None) -> Optional[Tuple[np.ndarray, np.ndarray, bool]]:
+        """(rows, weights, truncated) for a term's best ``limit`` postings, or None if absent"""
+        i = np.searchsorted(self.terms, bucket)
+        if i < len(self.terms) and self.terms[i] == bucket:
+            start, end = self.offsets[i], self.offsets[i + 1]
+            truncated = limit is not None and end - start > limit
+            if truncated:
+                end = start + limit
+            return self.rows[start:end], self.weights[start:end], truncated
+        return None
+
+    def buckets(self) -> np.ndarray:
+        return np.repeat(self.terms, np.diff(self.offsets))
+
+
+class _Snapshot:
+    """Everything a query reads; writers build a new one and swap it in"""
+
+    def __init__(self, segments, ids, names, categories, price, stock, category_code, alive, df, idf, live_count):
+        self.segments = segments
+        self.ids = ids
+        self.names = names
+        self.categories = categories
+        self.price = price
+        self.stock = stock
+        self.category_code = category_code
+        self.alive = alive
+        self.df = df
+        self.idf = idf
+        self.live_count = live_count
+
+
+def _weights(rows, buckets, tf, idf, row_count):
+    """L2-normalized tf-idf weight per posting"""
+    raw = tf * idf[buckets]
+    norms = np.sqrt(np.bincount(rows, weights=raw * raw, minlength=row_count))
+    return (raw / np.maximum(norms[rows], 1e-12)).astype(np.float32)
+
+
+class ProductIndex:
+    """In-memory TF-IDF retrieval over product name, description and category.
+
+    Terms are hashed into a fixed number of buckets, so adding products never
+    rebuilds a vocabulary: each ``add`` builds a new postings segment and
+    marks replaced rows dead. Once there are more than ``max_segments``
+    segments they are merged into one with the IDF and norms recomputed.
+    Queries read an immutable snapshot, so they never block on a writer.
+
+    Scores are cosine similarities between the query's and each product's
+    tf-idf vectors, accumulated term by term into a dense per-thread buffer.
+    Each term contributes at most its ``max_postings`` best postings; when
+    category, price and stock filters then leave fewer than k results the
+    query is rescored over the full lists.
+    """
+
+    def __init__(self, max_segments: int = MAX_SEGMENTS, max_postings: int = MAX_POSTINGS):
+        self.max_segments = max_segments
+        self.max_postings = max_postings
+        self._buffers = threading.local()
+        self._row_of: Dict[str, int] = {}
+        self._category_codes: Dict[str, int] = {}
+        self._write_lock = threading.Lock()
+        self._snapshot = _Snapshot(
+            segments=(), ids=[], names=[], categories=[],
+            price=np.zeros(0, np.float32), stock=np.zeros(0, np.int32),
+            category_code=np.zeros(0, np.int32), alive=np.zeros(0, bool),
+            df=np.zeros(HASH_BUCKETS, np.int32), idf=self._idf(np.zeros(HASH_BUCKETS, np.int32), 0),
+            live_count=0
+        )
+
+    def __len__(self):
+        return self._snapshot.live_count
+
+    def __contains__(self, product_id):
+        return product_id in self._row_of
+
+    @property
+    def categories(self) -> List[str]:
+        return list(self._snapshot.categories)
+
+    def _idf(self, df, live_count):
+        return (np.log((1.0 + live_count) / (1.0 + df)) + 1.0).astype(np.float32)
+
+    def add(self, products: Iterable[dict]) -> int:
+        """Index (or re-index) products given as dicts with the product table's columns"""
+        products = list({product['id']: product for product in products}.values())  # last copy of an id wins
+        if not products:
+            return 0
+        with self._write_lock:
+            old = self._snapshot
+            ids, names, categories = list(old.ids), list(old.names), list(old.categories)
+            alive = old.alive.copy()
+            base = len(ids)
+
+            rows, buckets, tf = [], [], []
+            prices = np.empty(len(products), np.float32)
+            stocks = np.empty(len(products), np.int32)
+            codes = np.empty(len(products), np.int32)
+            replaced = 0
+            for offset, product in enumerate(products):
+                row = base + offset
+                previous = self._row_of.get(product['id'])
+                if previous is not None:
+                    alive[previous] = False
+                    replaced += 1
+                self._row_of[product['id']] = row
+                ids.append(product['id'])
+                names.append(product.get('name') or '')
+
+                category = (product.get('category') or '').strip()
+                code = self._category_codes.get(category.lower())
+                if code is None:
+                    code = self._category_codes[category.lower()] = len(categories)
+                    categories.append(category)
+                codes[offset] = code
+                prices[offset] = float(product.get('price') or 0)
+                stocks[offset] = int(product.get('stock_quantity') or 0)
+
+                counts = Counter()
+                for token in tokenize(product.get('name') or ''):
+                    counts[term_bucket(token)] += NAME_WEIGHT
+                for token in tokenize(f"{product.get('description') or ''} {category}"):
+                    counts[term_bucket(token)] += 1
+                for bucket, count in counts.items():
+                    rows.append(row)
+                    buckets.append(bucket)
+                    tf.append(1.0 + math.log(count))
+
+            rows = np.asarray(rows, np.int32)
+            buckets = np.asarray(buckets, np.int64)
+            tf = np.asarray(tf, np.float32)
+            row_count = base + len(products)
+            df = old.df + np.bincount(buckets, minlength=HASH_BUCKETS).astype(np.int32)
+            live_count = old.live_count + len(products) - replaced
+
+            idf = self._idf(df, live_count)
+            segments = old.segments + (_Segment(rows, buckets, tf, _weights(rows, buckets, tf, idf, row_count)),)
+            alive = np.concatenate([alive, np.ones(len(products), bool)])
+            snapshot = _Snapshot(
+                segments=segments, ids=ids, names=names, categories=categories,
+                price=np.concatenate([old.price, prices]),
+                stock=np.concatenate([old.stock, stocks]),
+                category_code=np.concatenate([old.category_code, codes]),
+                alive=alive, df=df, idf=idf, live_count=live_count
+            )
+            if len(segments) > self.max_segments:
+                snapshot = self._compact(snapshot)
+            self._snapshot = snapshot
+            return len(products)
+
+    def _compact(self, snapshot: _Snapshot) -> _Snapshot:
+        """Merge all segments into one, dropping dead rows' postings and refreshing idf and norms"""
+        rows = np.concatenate([s.rows for s in snapshot.segments])
+        buckets = np.concatenate([s.buckets() for s in snapshot.segments])
+        tf = np.concatenate([s.tf for s in snapshot.segments])
+        keep = snapshot.alive[rows]
+        rows, buckets, tf = rows[keep], buckets[keep], tf[keep]
+        row_count = len(snapshot.ids)
+        df = np.bincount(buckets, minlength=HASH_BUCKETS).astype(np.int32)
+        idf = self._idf(df, snapshot.live_count)
+        snapshot.segments = (_Segment(rows, buckets, tf, _weights(rows, buckets, tf, idf, row_count)),)
+        snapshot.df = df
+        snapshot.idf = idf
+        return snapshot
+
+    def compact(self):
+        with self._write_lock:
+            old = self._snapshot
+            if len(old.segments) > 1:
+                self._snapshot = self._compact(_Snapshot(**vars(old)))
+
+    def search(self, query: str, k: int = 5, **filters) -> List[dict]:
+        return self.search_batch([query], k=k, **filters)[0]
+
+    def _buffers_for(self, row_count):
+        """Per-thread score accumulator and dedupe marker, zeroed between queries"""
+        scores = getattr(self._buffers, 'scores', None)
+        if scores is None or len(scores) < row_count:
+            self._buffers.scores = np.zeros(max(row_count, 1024) * 5 // 4, np.float32)
+            self._buffers.marker = np.zeros(len(self._buffers.scores), np.int32)
+        return self._buffers.scores, self._buffers.marker
+
+    def _score(self, snapshot, query_weights, limit):
+        """Candidate rows and their cosine scores; also whether any term's list was cut short"""
+        row_parts, truncated = [], False
+        accumulator, marker = self._buffers_for(len(snapshot.ids))
+        for bucket, weight in query_weights.items():
+            for segment in snapshot.segments:
+                postings = segment.postings(bucket, limit)
+                if postings is not None:
+                    rows, weights, cut = postings
+                    accumulator[rows] += weights * weight  # rows are unique within one term's postings
+                    row_parts.append(rows)
+                    truncated |= cut
+        if not row_parts:
+            return np.zeros(0, np.int32), np.zeros(0, np.float32), False
+
+        rows = row_parts[0] if len(row_parts) == 1 else np.concatenate(row_parts)
+        scores = accumulator[rows]
+        accumulator[rows] = 0
+        if len(row_parts) > 1:
+            # Keep one copy of rows matched by several terms: the last write to marker wins
+            positions = np.arange(len(rows), dtype=np.int32)
+            marker[rows] = positions
+            kept = marker[rows] == positions
+            rows, scores = rows[kept], scores[kept]
+        return rows, scores, truncated
+
+    def search_batch(self, queries: List[str], k: int = 5, category: Optional[str] = None,
+                     min_price: Optional[float] = None, max_price: Optional[float] = None,
+                     in_stock: bool = False) -> List[List[dict]]:
+        """Top-k products per query by cosine similarity, after filters"""
+        snapshot = self._snapshot
+        category_code = None
+        if category is not None:
+            category_code = self._category_codes.get(category.strip().lower(), -1)
+
+        results = []
+        for query in queries:
+            counts = Counter(term_bucket(token) for token in tokenize(query))
+            if not counts or not snapshot.segments:
+                results.append([])
+                continue
+            query_weights = {bucket: count * float(snapshot.idf[bucket]) for bucket, count in counts.items()}
+            query_norm = math.sqrt(sum(w * w for w in query_weights.values()))
+            query_weights = {bucket: w / query_norm for bucket, w in query_weights.items()}
+
+            limit = self.max_postings
+            while True:
+                rows, scores, truncated = self._score(snapshot, query_weights, limit)
+                mask = self._filter_mask(snapshot, rows, category_code, min_price, max_price, in_stock)
+                rows, scores = rows[mask], scores[mask]
+                if len(rows) >= k or not truncated:
+                    break
+                limit = None  # filters rejected too many of the best postings; score everything
+
+            if len(rows) > k:
+                top = np.argpartition(-scores, k - 1)[:k]
+                rows, scores = rows[top], scores[top]
+            order = np.argsort(-scores, kind='stable')
+            results.append(self._describe(snapshot, rows[order], scores[order]))
+        return results
+
+    def browse(self, k: int = 5, category: Optional[str] = None, min_price: Optional[float] = None,
+               max_price: Optional[float] = None, in_stock: bool = False) -> List[dict]:
+        """Cheapest products matching the filters alone, for requests without searchable terms"""
+        snapshot = self._snapshot
+        category_code = None
+        if category is not None:
+            category_code = self._category_codes.get(category.strip().lower(), -1)
+        rows = np.arange(len(snapshot.ids))
+        rows = rows[self._filter_mask(snapshot, rows, category_code, min_price, max_price, in_stock)]
+        if len(rows) > k:
+            rows = rows[np.argpartition(snapshot.price[rows], k - 1)[:k]]
+        rows = rows[np.argsort(snapshot.price[rows], kind='stable')]
+        return self._describe(snapshot, rows, np.zeros(len(rows)))
+
+    @staticmethod
+    def _filter_mask(snapshot, rows, category_code, min_price, max_price, in_stock):
+        mask = snapshot.alive[rows]
+        if category_code is not None:
+            mask &= snapshot.category_code[rows] == category_code
+        if min_price is not None:
+            mask &= snapshot.price[rows] >= min_price
+        if max_price is not None:
+            mask &= snapshot.price[rows] <= max_price
+        if in_stock:
+            mask &= snapshot.stock[rows] > 0
+        return mask
+
+    @staticmethod
+    def _describe(snapshot, rows, scores):
+        return [
+            {
+                'id': snapshot.ids[row],
+                'name': snapshot.names[row],
+                'category': snapshot.categories[snapshot.category_code[row]],
+                'price': round(float(snapshot.price[row]), 2),
+                'stock_quantity': int(snapshot.stock[row]),
+                'score': round(float(score), 4)
+            }
+            for row, score in zip(rows.tolist(), scores.tolist())
+        ]
+
+
+_UNDER_RE = re.compile(r"(?:under|below|less than|cheaper than|max(?:imum)?|up to)\s*\$?\s*(\d+(?:\.\d+)?)")
+_OVER_RE = re.compile(r"(?:over|above|more than|at least|min(?:imum)?)\s*\$?\s*(\d+(?:\.\d+)?)")
+_BETWEEN_RE = re.compile(r"between\s*\$?\s*(\d+(?:\.\d+)?)\s*(?:and|-|to)\s*\$?\s*(\d+(?:\.\d+)?)")
+_STOCK_RE = re.compile(r"\bin[ -]stock\b|\bavailable\b")
+
+
+def parse_product_query(text: str, categories: List[str]) -> Tuple[str, dict]:
+    """Split a chat message into search text and filters ("cables under $20 in stock")"""
+    lowered = text.lower()
+    filters = {}
+    between = _BETWEEN_RE.search(lowered)
+    if between:
+        filters['min_price'], filters['max_price'] = sorted((float(between.group(1)), float(between.group(2))))
+        lowered = lowered.replace(between.group(0), ' ')
+    else:
+        under, over = _UNDER_RE.search(lowered), _OVER_RE.search(lowered)
+        if under:
+            filters['max_price'] = float(under.group(1))
+            lowered = lowered.replace(under.group(0), ' ')
+        if over:
+            filters['min_price'] = float(over.group(1))
+            lowered = lowered.replace(over.group(0), ' ')
+    if _STOCK_RE.search(lowered):
+        filters['in_stock'] = True
+        lowered = _STOCK_RE.sub(' ', lowered)
+    for category in categories:
+        if category and re.search(rf"\b{re.escape(category.lower())}\b", lowered):
+            filters['category'] = category
+            break
+    return lowered, filters
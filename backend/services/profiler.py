@@ -0,0 +1,324 @@
+import contextvars
+import functools
+import hmac
+import html
+import json
+import os
+import random
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional
+
+PROFILE_HEADER = 'X-Profile'  # carries the profiling token to profile one request
+PROFILE_ID_HEADER = 'X-Profile-Id'
+
+# The sampler of the request being handled, for code it hands to other threads (see ``profiled``)
+_current_sampler = contextvars.ContextVar('profile_sampler', default=None)
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples the Python stacks of a set of threads on a timer, without tracing hooks.
+
+    A daemon thread reads ``sys._current_frames()`` every ``interval``
+    seconds, so the profiled code runs unmodified and the cost is one stack
+    walk per thread per sample. Threads can ``attach`` and ``detach`` while
+    it runs. Stacks are kept in folded form ("outer;inner" -> count), the
+    input format of flamegraph tools.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_ids = {thread_id}
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+
+    def attach(self, thread_id: int):
+        with self._lock:
+            self.thread_ids.add(thread_id)
+
+    def detach(self, thread_id: int):
+        with self._lock:
+            self.thread_ids.discard(thread_id)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                thread_ids = tuple(self.thread_ids)
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(labels))] += 1
+                self.samples += 1
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self) -> float:
+        """Stop sampling; returns the wall time covered in seconds"""
+        self._stop.set()
+        self._thread.join()
+        return time.perf_counter() - self.started
+
+
+def profiled(fn):
+    """Wrap ``fn`` so the thread that runs it is sampled with the current request.
+
+    For work an async handler hands to a thread pool: the wrapper carries
+    the request's sampler (a context variable, copied into the pool call)
+    and attaches the worker thread for as long as ``fn`` runs. Without an
+    active profile it just calls ``fn``.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        sampler = _current_sampler.get()
+        if sampler is None:
+            return fn(*args, **kwargs)
+        thread_id = threading.get_ident()
+        sampler.attach(thread_id)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            sampler.detach(thread_id)
+    return wrapper
+
+
+def render_flamegraph(stacks: Dict[str, int], title: str = '', width: int = 1200,
+                      row_height: int = 16, min_fraction: float = 0.001) -> str:
+    """Self-contained SVG flamegraph (root at the bottom) from folded stacks"""
+    root = {'children': {}, 'count': 0}
+    for stack, count in stacks.items():
+        root['count'] += count
+        node = root
+        for label in stack.split(';'):
+            node = node['children'].setdefault(label, {'children': {}, 'count': 0})
+            node['count'] += count
+
+    total = root['count'] or 1
+    boxes, depth_max = [], 0
+
+    def layout(node, x, depth):
+        nonlocal depth_max
+        for label, child in sorted(node['children'].items()):
+            if child['count'] / total >= min_fraction:
+                boxes.append((label, child['count'], x, depth))
+                depth_max = max(depth_max, depth)
+                layout(child, x, depth + 1)
+            x += child['count']
+
+    layout(root, 0, 0)
+    top = 24
+    height = top + (depth_max + 1) * row_height + 8
+    scale = width / total
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'font-family="monospace" font-size="11">',
+        f'<text x="4" y="16">{html.escape(title)} ({total} samples)</text>',
+    ]
+    for label, count, x, depth in boxes:
+        box_width = count * scale
+        y = height - 8 - (depth + 1) * row_height
+        hue = zlib.crc32(label.encode()) % 60
+        tooltip = html.escape(f"{label}: {count} samples ({100 * count / total:.1f}%)")
+        parts.append(
+            f'<g><title>{tooltip}</title><rect x="{x * scale:.1f}" y="{y}" width="{box_width:.1f}" '
+            f'height="{row_height - 1}" fill="hsl({hue},85%,60%)"/>'
+        )
+        if box_width > 40:
+            text = html.escape(label[:int(box_width / 7)])
+            parts.append(f'<text x="{x * scale + 3:.1f}" y="{y + row_height - 4}">{text}</text>')
+        parts.append('</g>')
+    parts.append('</svg>')
+    return '\n'.join(parts)
+
+
+class ProfileStore:
+    """Bounded on-disk ring buffer of captured profiles.
+
+    Each profile is three files sharing a sequence number: metadata JSON,
+    folded stacks and an SVG flamegraph. Once more than ``max_profiles``
+    are stored, the oldest are deleted.
+    """
+
+    def __init__(self, directory: str, max_profiles: int = 50):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+        self._next_seq = None  # found on first save, so a disabled profiler never touches the disk
+
+    def _sequences(self) -> List[int]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(int(name[:-5]) for name in os.listdir(self.directory)
+                      if name.endswith('.json') and name[:-5].isdigit())
+
+    def _path(self, seq: int, suffix: str) -> str:
+        return os.path.join(self.directory, f"{seq:08d}{suffix}")
+
+    def save(self, metadata: dict, stacks: Dict[str, int]) -> int:
+        with self._lock:
+            if self._next_seq is None:
+                os.makedirs(self.directory, exist_ok=True)
+                existing = self._sequences()
+                self._next_seq = existing[-1] + 1 if existing else 1
+            seq = self._next_seq
+            self._next_seq += 1
+        metadata = dict(metadata, id=seq)
+        with open(self._path(seq, '.folded'), 'w') as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in stacks.items())
+        with open(self._path(seq, '.svg'), 'w') as f:
+            f.write(render_flamegraph(stacks, title=f"{metadata.get('method', '')} {metadata.get('path', '')}"))
+        # Metadata last: a profile is listed only once all its files exist
+        with open(self._path(seq, '.json'), 'w') as f:
+            json.dump(metadata, f)
+        self._evict()
+        return seq
+
+    def _evict(self):
+        with self._lock:
+            sequences = self._sequences()
+            for seq in sequences[:max(0, len(sequences) - self.max_profiles)]:
+                for suffix in ('.json', '.folded', '.svg'):
+                    try:
+                        os.remove(self._path(seq, suffix))
+                    except FileNotFoundError:
+                        pass
+
+    def list(self) -> List[dict]:
+        """Metadata of stored profiles, newest first"""
+        profiles = []
+        for seq in reversed(self._sequences()):
+            try:
+                with open(self._path(seq, '.json')) as f:
+                    profiles.append(json.load(f))
+            except (FileNotFoundError, ValueError):
+                continue  # evicted while listing
+        return profiles
+
+    def read(self, seq: int, fmt: str = 'svg') -> Optional[str]:
+        suffix = {'svg': '.svg', 'folded': '.folded', 'json': '.json'}[fmt]
+        try:
+            with open(self._path(seq, suffix)) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+class RequestProfiler:
+    """Decides which requests to profile and captures them into a ``ProfileStore``.
+
+    A request is profiled when it carries ``X-Profile: <token>`` matching
+    ``token``, or by random sampling at ``sample_rate``. With no token and
+    a zero rate the profiler is disabled and frameworks should not install
+    their hooks at all.
+    """
+
+    def __init__(self, store: ProfileStore, token: str = '', sample_rate: float = 0.0,
+                 interval: float = 0.005):
+        self.store = store
+        self.token = token
+        self.sample_rate = sample_rate
+        self.interval = interval
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token) or self.sample_rate > 0
+
+    def authorized(self, token: Optional[str]) -> bool:
+        return bool(self.token) and token is not None and hmac.compare_digest(token, self.token)
+
+    def should_profile(self, header_value: Optional[str]) -> Optional[str]:
+        """The trigger ('header' or 'sampled') if this request should be profiled, else None"""
+        if header_value is not None and self.authorized(header_value):
+            return 'header'
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return 'sampled'
+        return None
+
+    def start(self) -> StackSampler:
+        return StackSampler(threading.get_ident(), self.interval).start()
+
+    def finish(self, sampler: StackSampler, **metadata) -> int:
+        elapsed = sampler.stop()
+        return self.store.save(dict(
+            metadata,
+            captured_at=time.time(),
+            duration_ms=round(elapsed * 1000, 2),
+            samples=sampler.samples,
+            interval_ms=self.interval * 1000
+        ), sampler.stacks)
+
+
+def init_profiling(app, profiler: RequestProfiler, skip_prefix: str = '/api/admin/'):
+    """Profile opted-in Flask requests; installs nothing when the profiler is disabled"""
+    if not profiler.enabled:
+        return
+    from flask import g, request
+
+    @app.before_request
+    def start_profile():
+        if request.path.startswith(skip_prefix):
+            return
+        trigger = profiler.should_profile(request.headers.get(PROFILE_HEADER))
+        if trigger:
+            g.profile_sampler = profiler.start()
+            g.profile_trigger = trigger
+
+    @app.after_request
+    def finish_profile(response):
+        sampler = g.pop('profile_sampler', None)
+        if sampler is not None:
+            profile_id = profiler.finish(sampler, method=request.method, path=request.path,
+                                         status=response.status_code, trigger=g.pop('profile_trigger'))
+            response.headers[PROFILE_ID_HEADER] = str(profile_id)
+        return response
+
+
+def init_fastapi_profiling(app, profiler: RequestProfiler, skip_prefix: str = '/api/admin/'):
+    """FastAPI counterpart of ``init_profiling``.
+
+    The event loop thread is sampled, which covers sync work done directly
+    in ``async def`` handlers (other requests interleaved on the loop show
+    up too). Blocking work that a handler moves to the thread pool is only
+    sampled when it is wrapped with ``profiled``, which attaches the worker
+    thread to this request's sampler.
+    """
+    if not profiler.enabled:
+        return
+
+    @app.middleware('http')
+    async def profile_request(request, call_next):
+        if request.url.path.startswith(skip_prefix):
+            return await call_next(request)
+        trigger = profiler.should_profile(request.headers.get(PROFILE_HEADER))
+        if not trigger:
+            return await call_next(request)
+        sampler = profiler.start()
+        token = _current_sampler.set(sampler)
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+        finally:
+            _current_sampler.reset(token)
+            profile_id = profiler.finish(sampler, method=request.method, path=request.url.path,
+                                         status=status, trigger=trigger)
+        response.headers[PROFILE_ID_HEADER] = str(profile_id)
+        return response
@@ -0,0 +1,185 @@
+import json
+import queue
+import threading
+from datetime import date
+from multiprocessing.connection import Client, Listener
+from typing import Any, Dict, Optional
+
+
+class Subscription:
+    """A subscriber's bounded mailbox; slow consumers drop their oldest events"""
+
+    def __init__(self, broker, topic: str, maxsize: int):
+        self.broker = broker
+        self.topic = topic
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def deliver(self, event: Dict[str, Any]):
+        while True:
+            try:
+                self.queue.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """Topic fan-out to subscribers in this process"""
+
+    def __init__(self, mailbox_size: int = 256):
+        self.mailbox_size = mailbox_size
+        self._topics = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic: str) -> Subscription:
+        subscription = Subscription(self, topic, self.mailbox_size)
+        with self._lock:
+            self._topics.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._topics.get(subscription.topic)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._topics[subscription.topic]
+
+    def publish(self, topic: str, event: Dict[str, Any]) -> int:
+        return self.deliver_local(topic, event)
+
+    def deliver_local(self, topic: str, event: Dict[str, Any]) -> int:
+        with self._lock:
+            subscribers = tuple(self._topics.get(topic, ()))
+        for subscription in subscribers:
+            subscription.deliver(event)
+        return len(subscribers)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(s) for s in self._topics.values())
+
+
+def _json_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def encode_frame(topic: str, event: Dict[str, Any]) -> bytes:
+    return json.dumps([topic, event], default=_json_default, separators=(',', ':')).encode()
+
+
+def decode_frame(frame: bytes):
+    topic, event = json.loads(frame)
+    return topic, event
+
+
+def _require_authkey(authkey: bytes):
+    if not authkey:
+        raise ValueError("The relay broker needs an explicit PUBSUB_AUTHKEY shared by the relay and every worker")
+
+
+class RelayBroker(InProcessBroker):
+    """Broker for multi-worker deployments.
+
+    Publishes go to a relay process (``run_relay``) that forwards every event
+    to all connected workers, and each worker fans out to its own local
+    subscribers. Stands in for Redis pub/sub or similar in local setups.
+    Frames are JSON, never pickles, so a peer can't make a worker run code;
+    datetimes arrive as ISO 8601 strings.
+    """
+
+    def __init__(self, address, authkey: bytes, mailbox_size: int = 256):
+        _require_authkey(authkey)
+        super().__init__(mailbox_size)
+        self._conn = Client(address, authkey=authkey)
+        self._send_lock = threading.Lock()
+        threading.Thread(target=self._receive_loop, daemon=True, name='relay-broker').start()
+
+    def publish(self, topic: str, event: Dict[str, Any]) -> int:
+        frame = encode_frame(topic, event)
+        with self._send_lock:
+            self._conn.send_bytes(frame)
+        return 0
+
+    def _receive_loop(self):
+        try:
+            while True:
+                frame = self._conn.recv_bytes()
+                try:
+                    topic, event = decode_frame(frame)
+                except ValueError as e:
+                    print(f"[PUBSUB] Dropped malformed relay frame: {e}")
+                    continue
+                self.deliver_local(topic, event)
+        except (EOFError, OSError):
+            print("[PUBSUB] Lost connection to relay broker")
+
+
+def run_relay(address, authkey: bytes):
+    """Accept worker connections and forward each published frame to all of them, undecoded"""
+    _require_authkey(authkey)
+    listener = Listener(address, authkey=authkey)
+    connections = []
+    lock = threading.Lock()
+
+    def serve(conn):
+        try:
+            while True:
+                frame = conn.recv_bytes()
+                # One lock for sends too: Connection objects are not thread-safe
+                with lock:
+                    for target in connections:
+                        try:
+                            target.send_bytes(frame)
+                        except OSError:
+                            pass
+        except (EOFError, OSError):
+            pass
+        finally:
+            with lock:
+                if conn in connections:
+                    connections.remove(conn)
+
+    print(f"Relay broker listening on {listener.address}")
+    while True:
+        conn = listener.accept()
+        with lock:
+            connections.append(conn)
+        threading.Thread(target=serve, args=(conn,), daemon=True).start()
+
+
+def create_broker(url: str, authkey: bytes, mailbox_size: int = 256):
+    """``memory://`` for a single worker, ``relay://host:port`` for several"""
+    if url.startswith('relay://'):
+        host, port = url[len('relay://'):].rsplit(':', 1)
+        return RelayBroker((host, int(port)), authkey, mailbox_size)
+    if url == 'memory://':
+        return InProcessBroker(mailbox_size)
+    raise ValueError(f"Unknown broker URL: {url}")
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description='Local pub/sub relay for multi-worker push events')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6380)
+    args = parser.parse_args()
+    run_relay((args.host, args.port), os.getenv('PUBSUB_AUTHKEY', '').encode())
@@ -0,0 +1,155 @@
+import contextvars
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+QUERY_COUNT_HEADER = 'X-DB-Queries'
+QUERY_TIME_HEADER = 'X-DB-Time-Ms'
+
+# Most statements each chat API scenario may run: enforced in-process by
+# test_query_counts.py and checked against a live debug server by test_api.py
+QUERY_BUDGETS = {
+    'health': 2,
+    'chat_new_conversation': 14,
+    'chat_continue': 14,
+    'conversation_messages': 3,
+    'chat_missing_message': 0,
+    'chat_invalid_conversation': 2,
+    'list_conversations': 2,  # independent of how many conversations the user has
+}
+
+_current = contextvars.ContextVar('query_tally', default=None)
+_installed = False
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class QueryTally:
+    """Statements and DB time for one request or test block.
+
+    Statements are tallied by their SQL text, which holds bind parameters
+    rather than values, so a query run once per row of an earlier result
+    (N+1) shows up as one statement with a high count. Tallies nest: a
+    statement counts toward the innermost tally and every enclosing one, so a
+    test's tally still sees the queries of the requests it makes.
+    """
+
+    def __init__(self, parent: Optional['QueryTally'] = None):
+        self.parent = parent
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    @property
+    def milliseconds(self) -> float:
+        return self.seconds * 1000
+
+    def most_repeated(self):
+        """(statement, times) for the statement run most often, or None"""
+        if not self.statements:
+            return None
+        return self.statements.most_common(1)[0]
+
+    def report(self, limit: int = 5) -> str:
+        lines = [f"{self.count} queries in {self.milliseconds:.1f}ms"]
+        for statement, times in self.statements.most_common(limit):
+            lines.append(f"  {times:>4}x {statement[:200]}")
+        return '\n'.join(lines)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    tally = _current.get()
+    if tally is None:
+        return
+    started = getattr(context, '_query_started', None)
+    elapsed = time.perf_counter() - started if started is not None else 0.0
+    statement = _WHITESPACE_RE.sub(' ', statement).strip()
+    while tally is not None:
+        tally.seconds += elapsed
+        tally.count += 1
+        tally.statements[statement] += 1
+        tally = tally.parent
+
+
+def install():
+    """Listen on every engine (primary, replicas and shards alike); idempotent.
+
+    Outside a tally the listeners return after one context variable read.
+    """
+    global _installed
+    if not _installed:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _installed = True
+
+
+@contextmanager
+def count_queries():
+    """Tally the statements run inside the block (on this thread or task)"""
+    install()
+    tally = QueryTally(parent=_current.get())
+    token = _current.set(tally)
+    try:
+        yield tally
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def max_queries(limit: int, label: str = ''):
+    """Test helper: fail if the block runs more than ``limit`` statements.
+
+        with max_queries(3, 'GET /api/conversations'):
+            client.get('/api/conversations?user_id=alice')
+    """
+    with count_queries() as tally:
+        yield tally
+    if tally.count > limit:
+        raise AssertionError(f"{label or 'block'} ran {tally.report()}\n(budget {limit})")
+
+
+def init_query_counting(app, budget: int, repeat_threshold: int, headers: Optional[bool] = None):
+    """Count queries per Flask request.
+
+    Requests over ``budget`` statements, or repeating one statement at
+    least ``repeat_threshold`` times (the N+1 signature), are logged.
+    ``headers`` adds the count and DB time to responses; it defaults to
+    the app's debug mode.
+    """
+    from flask import g, request
+
+    install()
+
+    @app.before_request
+    def start_query_count():
+        tally = QueryTally(parent=_current.get())
+        g.query_tally = tally
+        g.query_tally_token = _current.set(tally)
+
+    @app.after_request
+    def finish_query_count(response):
+        tally = g.get('query_tally')
+        if tally is None:
+            return response
+        if headers if headers is not None else app.debug:
+            response.headers[QUERY_COUNT_HEADER] = str(tally.count)
+            response.headers[QUERY_TIME_HEADER] = f"{tally.milliseconds:.2f}"
+        repeated = tally.most_repeated()
+        if tally.count > budget or (repeated and repeated[1] >= repeat_threshold):
+            print(f"[QUERY BUDGET] {request.method} {request.path} ran {tally.report(limit=3)} (budget {budget})")
+        return response
+
+    @app.teardown_request
+    def reset_query_count(exc):
+        token = g.pop('query_tally_token', None)
+        if token is not None:
+            _current.reset(token)
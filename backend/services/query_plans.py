@@ -0,0 +1,96 @@
+import json
+import re
+import threading
+from typing import Dict, List
+
+from sqlalchemy import event
+
+_SQLITE_SCAN_RE = re.compile(r"^SCAN (\w+)")
+
+
+def _sqlite_full_scans(dbapi_connection, statement, parameters) -> List[str]:
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        details = [row[-1] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+    scans = []
+    for detail in details:
+        match = _SQLITE_SCAN_RE.match(detail)
+        # Virtual tables (FTS) and CONSTANT ROW are not table scans
+        if match and 'VIRTUAL TABLE' not in detail and match.group(1) != 'CONSTANT':
+            scans.append(detail)
+    return scans
+
+
+def _postgres_full_scans(dbapi_connection, statement, parameters) -> List[str]:
+    cursor = dbapi_connection.cursor()
+    try:
+        # With seq scans priced out, any that remain have no usable index
+        cursor.execute("SET enable_seqscan = off")
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+        plan = cursor.fetchone()[0]
+        cursor.execute("RESET enable_seqscan")
+    finally:
+        cursor.close()
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+
+    scans = []
+    def walk(node):
+        if node.get('Node Type') == 'Seq Scan':
+            scans.append(f"Seq Scan on {node.get('Relation Name')}")
+        for child in node.get('Plans', []):
+            walk(child)
+    walk(plan[0]['Plan'])
+    return scans
+
+
+class QueryPlanRecorder:
+    """Explains every SELECT run on an engine and records the ones that scan a whole table.
+
+    Use as a context manager around code that exercises the hot paths:
+
+        with QueryPlanRecorder(engine) as plans:
+            client.get('/api/conversations?user_id=alice')
+        assert not plans.full_scans, plans.report()
+    """
+
+    def __init__(self, engine, allow_tables=()):
+        self.engine = engine
+        self.allow_tables = set(allow_tables)
+        self.full_scans: List[Dict] = []
+        self.explained = 0
+        self._local = threading.local()
+        if engine.dialect.name == 'sqlite':
+            self._explain = _sqlite_full_scans
+        elif engine.dialect.name == 'postgresql':
+            self._explain = _postgres_full_scans
+        else:
+            raise NotImplementedError(f"Query plan checks are not supported on {engine.dialect.name}")
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if executemany or getattr(self._local, 'busy', False):
+            return
+        if not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            return
+        self._local.busy = True
+        try:
+            scans = self._explain(conn.connection.dbapi_connection, statement, parameters)
+        finally:
+            self._local.busy = False
+        self.explained += 1
+        scans = [s for s in scans if not any(table in s.split() for table in self.allow_tables)]
+        if scans:
+            self.full_scans.append({'statement': ' '.join(statement.split()), 'scans': scans})
+
+    def report(self) -> str:
+        return '\n'.join(f"{', '.join(entry['scans'])}\n    {entry['statement']}" for entry in self.full_scans)
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+        return False
@@ -0,0 +1,309 @@
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import sqlglot
+from sqlalchemy import create_engine, event, text
+from sqlglot import exp
+
+from .lru_cache import LRUCache
+
+INTENT_KEYWORDS = [
+    ('price_lookup', ('price', 'cost', 'how much', 'cheap', 'expensive', 'under', 'below')),
+    ('stock_check', ('stock', 'available', 'availability', 'left', 'inventory')),
+    ('product_search', ('find', 'show', 'list', 'search', 'looking for', 'do you have', 'recommend')),
+]
+
+# A double-quoted phrase, a number (optionally a $ amount), or a word
+_QUESTION_TOKEN_RE = re.compile(r"\"([^\"]+)\"|\$?(\d+(?:\.\d+)?)\b|([a-z0-9]+(?:[-'][a-z0-9]+)*)")
+_WORD_RE = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+
+# String literals ('it''s'), then numbers that aren't part of an identifier
+_SQL_LITERAL_RE = re.compile(r"'((?:[^']|'')*)'|(?<![\w.:])(\d+(?:\.\d+)?)(?![\w.])")
+
+# Functions planned SQL may call; anything else (pg_read_file, load_extension, ...) is rejected.
+# LIKE and GLOB are here because SQLite implements those operators as functions
+SAFE_FUNCTIONS = frozenset(
+    "abs avg case cast coalesce count glob ifnull instr length like lower ltrim max min nullif round rtrim "
+    "substr substring sum total trim upper".split()
+)
+# Anything that writes, locks or leaves the query
+_WRITE_NODES = (exp.Insert, exp.Update, exp.Delete, exp.Merge, exp.Create, exp.Drop, exp.Alter,
+                exp.Command, exp.Lock, exp.Into)
+_SQLGLOT_DIALECTS = {'postgresql': 'postgres'}
+
+
+class UnsafeQueryError(ValueError):
+    """Generated SQL that is not a single read-only query over the allowed tables"""
+
+
+def detect_intent(question: str) -> str:
+    lowered = question.lower()
+    for intent, keywords in INTENT_KEYWORDS:
+        if any(keyword in lowered for keyword in keywords):
+            return intent
+    return 'general'
+
+
+class QuestionShape:
+    """A question with its literal values lifted out into typed slots.
+
+    "price of the USB Cable under $20" -> "price of the {product} under {num}"
+    with slots [('product', 'USB Cable'), ('num', '20')]. Entity slots carry
+    the catalog's spelling of the name, numbers their digits.
+    """
+
+    def __init__(self, intent: str, shape: str, slots: List[Tuple[str, str]]):
+        self.intent = intent
+        self.shape = shape
+        self.slots = slots
+
+    @property
+    def key(self):
+        return (self.intent, self.shape)
+
+
+class QueryTemplate:
+    """Validated, parameterized SQL for one question shape, reused as a prepared statement.
+
+    ``bindings`` maps each bind parameter to either a question slot (with the
+    prefix/suffix the LLM wrapped around it, e.g. LIKE's ``%``) or to a
+    constant copied from the original SQL.
+    """
+
+    def __init__(self, key, sql: str, bindings: Dict[str, dict]):
+        self.key = key
+        self.sql = sql
+        self.statement = text(sql)  # identical SQL text lets the driver reuse its prepared statement
+        self.bindings = bindings
+        self.uses = 0
+
+    def params_for(self, slots: List[Tuple[str, str]]) -> dict:
+        params = {}
+        for name, binding in self.bindings.items():
+            if 'slot' in binding:
+                value = slots[binding['slot']][1]
+                if binding['numeric']:
+                    params[name] = _as_number(value)
+                    continue
+                if binding['case'] == 'lower':
+                    value = value.lower()
+                elif binding['case'] == 'upper':
+                    value = value.upper()
+                params[name] = binding['prefix'] + value + binding['suffix']
+            else:
+                params[name] = binding['constant']
+        return params
+
+
+def _as_number(value: str):
+    number = float(value)
+    return int(number) if number.is_integer() and '.' not in value else number
+
+
+def parameterize_sql(sql: str) -> Tuple[str, List]:
+    """Replace every literal with a bind parameter; returns the template and the literal values in order"""
+    literals = []
+
+    def substitute(match):
+        if match.group(2) is not None:
+            literals.append(_as_number(match.group(2)))
+        else:
+            literals.append(match.group(1).replace("''", "'"))
+        return f":p{len(literals) - 1}"
+
+    return _SQL_LITERAL_RE.sub(substitute, sql), literals
+
+
+def bind_literals(literals: List, slots: List[Tuple[str, str]]) -> Optional[Dict[str, dict]]:
+    """Tie each literal to the slot it came from; None if any slot went unused (the shape isn't safe to reuse)"""
+    bindings, used = {}, set()
+    for index, literal in enumerate(literals):
+        name = f"p{index}"
+        binding = {'constant': literal}
+        for slot_index, (kind, value) in enumerate(slots):
+            if isinstance(literal, (int, float)):
+                if kind == 'num' and float(value) == float(literal):
+                    binding = {'slot': slot_index, 'numeric': True}
+                    break
+            else:
+                position = literal.lower().find(value.lower())
+                if value and position >= 0:
+                    matched = literal[position:position + len(value)]
+                    case = 'lower' if matched == value.lower() != value else \
+                        'upper' if matched == value.upper() != value else 'as_is'
+                    binding = {'slot': slot_index, 'prefix': literal[:position],
+                               'suffix': literal[position + len(value):], 'numeric': False, 'case': case}
+                    break
+        if 'slot' in binding:
+            used.add(binding['slot'])
+        bindings[name] = binding
+    if used != set(range(len(slots))):
+        return None
+    return bindings
+
+
+class QueryTemplateCache:
+    """Caches LLM-planned SQL by (intent, question shape).
+
+    On a miss the caller plans SQL with the LLM and calls ``prepare``, which
+    validates it once, lifts its literals into bind parameters tied to the
+    question's slots, and keeps the prepared statement. A later question
+    with the same intent and shape (say, a different product or price)
+    gets the statement back from ``lookup`` with its own values bound,
+    skipping the planning call and validation.
+    """
+
+    def __init__(self, allowed_tables: Iterable[str], entities: Optional[Dict[str, Iterable[str]]] = None,
+                 max_entries: int = 1000, max_entity_words: int = 6):
+        self.allowed_tables = {table.lower() for table in allowed_tables}
+        self.max_entity_words = max_entity_words
+        self._templates = LRUCache(max_entries=max_entries)
+        self._entities: Dict[str, Tuple[str, str]] = {}  # lowercase phrase -> (kind, catalog spelling)
+        self._entities_lock = threading.Lock()
+        for kind, names in (entities or {}).items():
+            self.add_entities(kind, names)
+
+    def add_entities(self, kind: str, names: Iterable[str]):
+        """Register phrases (product names, categories) that become ``{kind}`` slots in question shapes"""
+        with self._entities_lock:
+            for name in names:
+                words = _WORD_RE.findall((name or '').lower())
+                if words and len(words) <= self.max_entity_words:
+                    self._entities.setdefault(' '.join(words), (kind, name.strip()))
+
+    def shape(self, question: str) -> QuestionShape:
+        tokens = []
+        for match in _QUESTION_TOKEN_RE.finditer(question.lower()):
+            if match.group(1) is not None:
+                tokens.append(('text', match.group(1).strip()))
+            elif match.group(2) is not None:
+                tokens.append(('num', match.group(2)))
+            else:
+                tokens.append((None, match.group(3)))
+
+        shape, slots, i = [], [], 0
+        while i < len(tokens):
+            kind, value = tokens[i]
+            if kind is None:
+                # Longest registered entity phrase starting at this word wins
+                for length in range(min(self.max_entity_words, len(tokens) - i), 0, -1):
+                    window = tokens[i:i + length]
+                    if any(k is not None for k, _ in window):
+                        continue
+                    entity = self._entities.get(' '.join(v for _, v in window))
+                    if entity:
+                        kind, value = entity
+                        i += length - 1
+                        break
+            if kind is None:
+                shape.append(value)
+            else:
+                shape.append(f"{{{kind}}}")
+                slots.append((kind, value))
+            i += 1
+        return QuestionShape(detect_intent(question), ' '.join(shape), slots)
+
+    def validate(self, sql: str, dialect: Optional[str] = None) -> str:
+        """Single read-only SELECT over allowed tables, with the trailing semicolon removed.
+
+        The SQL is parsed (with sqlglot, in ``dialect``: a SQLAlchemy dialect
+        name) rather than pattern-matched, so every table reference counts:
+        comma joins, subqueries and CTE bodies included.
+        """
+        sql = sql.strip().rstrip(';').strip()
+        try:
+            statements = [s for s in sqlglot.parse(sql, read=_SQLGLOT_DIALECTS.get(dialect, dialect)) if s]
+        except sqlglot.errors.SqlglotError as e:
+            raise UnsafeQueryError(f"unparseable SQL: {e}")
+        if len(statements) != 1:
+            raise UnsafeQueryError("multiple statements")
+        tree = statements[0]
+        if not isinstance(tree, exp.Select):
+            raise UnsafeQueryError("only a single SELECT is allowed")
+        if tree.find(*_WRITE_NODES):
+            raise UnsafeQueryError("statement modifies the database")
+
+        for function in tree.find_all(exp.Func):
+            if isinstance(function, (exp.Connector, exp.Binary, exp.Predicate)):
+                continue  # operators sqlglot models as functions (AND, +, =, LIKE, ...)
+            name = (function.name if isinstance(function, exp.Anonymous) else function.sql_name()).lower()
+            if name not in SAFE_FUNCTIONS:
+                raise UnsafeQueryError(f"function not allowed: {name}")
+
+        ctes = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+        tables = set()
+        for table in tree.find_all(exp.Table):
+            if not isinstance(table.this, exp.Identifier) or table.args.get('db') or table.args.get('catalog'):
+                raise UnsafeQueryError(f"table reference not allowed: {table.sql()}")
+            if table.name.lower() not in ctes:
+                tables.add(table.name.lower())
+        if not tables or not tables <= self.allowed_tables:
+            raise UnsafeQueryError(f"tables outside the allowed set: {sorted(tables - self.allowed_tables)}")
+        return sql
+
+    def lookup(self, question_shape: QuestionShape) -> Optional[Tuple[QueryTemplate, dict]]:
+        template = self._templates.get(question_shape.key)
+        if template is None:
+            return None
+        template.uses += 1
+        return template, template.params_for(question_shape.slots)
+
+    def prepare(self, conn, question_shape: QuestionShape, sql: str) -> Tuple[QueryTemplate, dict, bool]:
+        """Validate planned SQL and check it compiles on ``conn``; cache it when its literals map onto the slots.
+
+        Returns (template, params, cached).
+        """
+        sql = self.validate(sql, conn.engine.dialect.name)
+        template_sql, literals = parameterize_sql(sql)
+        bindings = bind_literals(literals, question_shape.slots)
+        cacheable = bindings is not None
+        if bindings is None:
+            bindings = {f"p{i}": {'constant': literal} for i, literal in enumerate(literals)}
+        template = QueryTemplate(question_shape.key, template_sql, bindings)
+        params = template.params_for(question_shape.slots)
+
+        # Let the database parse and plan it once; syntax errors and unknown columns fail here
+        conn.execute(text(f"EXPLAIN {template_sql}"), params)
+        if cacheable:
+            self._templates.put(question_shape.key, template)
+        return template, params, cacheable
+
+    def stats(self) -> dict:
+        return self._templates.stats()
+
+
+def read_only_engine(url: str, allowed_tables: Iterable[str], **kwargs):
+    """An engine for running planned SQL that the database itself keeps read-only.
+
+    On SQLite every connection is ``query_only`` and an authorizer refuses
+    reads of any table outside ``allowed_tables`` and calls to functions
+    outside ``SAFE_FUNCTIONS``, so SQL that slipped past ``validate`` still
+    fails. On Postgres every transaction is READ ONLY; point ``url`` at a
+    role granted SELECT on the allowed tables only to limit what it sees.
+    """
+    engine = create_engine(url, **kwargs)
+    allowed = {table.lower() for table in allowed_tables}
+
+    def authorize(action, arg1, arg2, database, source):
+        if action == sqlite3.SQLITE_SELECT:
+            return sqlite3.SQLITE_OK
+        if action == sqlite3.SQLITE_READ:
+            # arg1 is None for reads of a CTE or subquery's own columns
+            return sqlite3.SQLITE_OK if arg1 is None or arg1.lower() in allowed else sqlite3.SQLITE_DENY
+        if action == sqlite3.SQLITE_FUNCTION:
+            return sqlite3.SQLITE_OK if arg2.lower() in SAFE_FUNCTIONS else sqlite3.SQLITE_DENY
+        return sqlite3.SQLITE_DENY
+
+    @event.listens_for(engine, 'connect')
+    def restrict(dbapi_connection, connection_record):
+        if engine.dialect.name == 'sqlite':
+            dbapi_connection.execute("PRAGMA query_only = ON")
+            dbapi_connection.set_authorizer(authorize)
+        elif engine.dialect.name == 'postgresql':
+            cursor = dbapi_connection.cursor()
+            cursor.execute("SET SESSION CHARACTERISTICS AS TRANSACTION READ ONLY")
+            cursor.close()
+
+    return engine
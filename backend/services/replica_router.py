@@ -0,0 +1,110 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, text
+
+
+class ReplicaSet:
+    """Read replica engines with round-robin selection and health tracking.
+
+    A replica that fails is taken out of rotation for ``retry_after`` seconds,
+    then probed with ``SELECT 1`` before it receives traffic again.
+    """
+
+    def __init__(self, urls: List[str], retry_after: float = 30.0, engine_options: Optional[dict] = None):
+        self.engines = [create_engine(url, **(engine_options or {})) for url in urls]
+        self.retry_after = retry_after
+        self._down_until = {}
+        self._cycle = itertools.cycle(range(len(self.engines))) if self.engines else None
+        self._lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self.engines)
+
+    def _probe(self, engine) -> bool:
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            return True
+        except Exception:
+            return False
+
+    def pick(self):
+        """Next healthy replica engine, or None if all are down"""
+        if not self.engines:
+            return None
+        for _ in range(len(self.engines)):
+            with self._lock:
+                index = next(self._cycle)
+                down_until = self._down_until.get(index)
+            if down_until is None:
+                return self.engines[index]
+            if time.monotonic() >= down_until:
+                if self._probe(self.engines[index]):
+                    with self._lock:
+                        self._down_until.pop(index, None)
+                    print(f"[REPLICA] Replica {index} is back in rotation")
+                    return self.engines[index]
+                self.mark_down(self.engines[index])
+        return None
+
+    def mark_down(self, engine):
+        index = self.engines.index(engine)
+        with self._lock:
+            self._down_until[index] = time.monotonic() + self.retry_after
+        print(f"[REPLICA] Replica {index} marked down for {self.retry_after:.0f}s")
+
+    def status(self):
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {'replica': i, 'healthy': self._down_until.get(i, 0) <= now}
+                for i in range(len(self.engines))
+            ]
+
+
+class RecentWriters:
+    """Bounded record of users who committed recently, for read-your-writes"""
+
+    def __init__(self, window: float = 5.0, max_entries: int = 100000):
+        self.window = window
+        self.max_entries = max_entries
+        self._writes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, key: str):
+        with self._lock:
+            self._writes[key] = time.monotonic()
+            self._writes.move_to_end(key)
+            while len(self._writes) > self.max_entries:
+                self._writes.popitem(last=False)
+
+    def wrote_recently(self, key: str) -> bool:
+        with self._lock:
+            written_at = self._writes.get(key)
+        return written_at is not None and time.monotonic() - written_at < self.window
+
+
+class RoutingSession(Session):
+    """Session that routes to the engines a request has chosen on ``g``.
+
+    ``g.db_shard`` (set per user when sharding is on) takes everything.
+    Otherwise reads go to ``g.db_replica`` when a route has chosen one, and
+    anything that flushes (inserts, updates, deletes) stays on the primary,
+    so a write inside a read-only route can't land on a replica.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            shard = g.get('db_shard')
+            if shard is not None:
+                return shard
+            replica = g.get('db_replica')
+            if replica is not None and not self._flushing:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+
+def _default(o):
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    if isinstance(o, Decimal):
+        return float(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def encode(results: Any) -> bytes:
+    """Compact, key-sorted JSON so equal results always encode (and hash) to the same bytes"""
+    if orjson is not None:
+        return orjson.dumps(results, default=_default, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(results, default=_default, sort_keys=True, separators=(',', ':'),
+                      ensure_ascii=False).encode('utf-8')
+
+
+def fits_inline(results: Any, inline_max_bytes: int) -> bool:
+    """Whether ``pack`` would keep ``results`` inline"""
+    return results is None or len(encode(results)) <= inline_max_bytes
+
+
+def decode(data: bytes) -> Any:
+    raw = zlib.decompress(data)
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+class PackedResults:
+    """database_results ready to store: inline JSON, or a compressed blob keyed by content hash"""
+
+    def __init__(self, inline: Any = None, digest: Optional[str] = None, data: Optional[bytes] = None,
+                 raw_size: int = 0, row_count: Optional[int] = None, stored_rows: Optional[int] = None,
+                 truncated: bool = False):
+        self.inline = inline
+        self.digest = digest
+        self.data = data
+        self.raw_size = raw_size
+        self.row_count = row_count
+        self.stored_rows = stored_rows
+        self.truncated = truncated
+
+    @property
+    def out_of_line(self) -> bool:
+        return self.digest is not None
+
+
+def _truncate(results: Any, encoded: bytes, max_bytes: int):
+    """Keep the longest prefix of a list that encodes within ``max_bytes``; other payloads are dropped.
+
+    Returns (results, encoded, stored_rows).
+    """
+    if not isinstance(results, list):
+        return None, encode(None), None
+    low, high = 0, len(results)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if len(encode(results[:middle])) <= max_bytes:
+            low = middle
+        else:
+            high = middle - 1
+    kept = results[:low]
+    return kept, encode(kept), low
+
+
+def pack(results: Any, inline_max_bytes: int, max_bytes: int, level: int = 6) -> PackedResults:
+    """Decide how to store ``results``.
+
+    Payloads up to ``inline_max_bytes`` encoded stay inline in the JSON
+    column, where compression and a second row would cost more than they
+    save. Larger ones are zlib-compressed and addressed by the sha256 of
+    their encoding, so repeated results share one blob. Anything over
+    ``max_bytes`` is truncated first: lists to their longest fitting prefix,
+    other payloads to nothing, with ``truncated`` set either way.
+    """
+    if results is None:
+        return PackedResults()
+    encoded = encode(results)
+    if len(encoded) <= inline_max_bytes:
+        return PackedResults(inline=results)
+
+    row_count = len(results) if isinstance(results, list) else None
+    stored_rows, truncated = row_count, False
+    if len(encoded) > max_bytes:
+        results, encoded, stored_rows = _truncate(results, encoded, max_bytes)
+        truncated = True
+    return PackedResults(
+        digest=hashlib.sha256(encoded).hexdigest(),
+        data=zlib.compress(encoded, level),
+        raw_size=len(encoded),
+        row_count=row_count,
+        stored_rows=stored_rows,
+        truncated=truncated
+    )
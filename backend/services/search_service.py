@@ -0,0 +1,135 @@
+import re
+from typing import Dict, List
+
+from sqlalchemy import text
+
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_END = '</mark>'
+
+# The FTS5 table indexes the owner's id as a token next to the content, so
+# the user scope is resolved inside the index instead of by post-filtering
+# every match. Its external content is a view joining message to its owner.
+SQLITE_USER_KEY = "(SELECT replace(user_id, '-', '') FROM conversation WHERE id = {row}.conversation_id)"
+
+SQLITE_INDEX_DDL = [
+    """CREATE VIEW IF NOT EXISTS message_search AS
+        SELECT m.rowid AS rowid, m.content AS content, replace(c.user_id, '-', '') AS user_key
+        FROM message m JOIN conversation c ON c.id = m.conversation_id""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS message_fts USING fts5(
+        content, user_key, content='message_search', content_rowid='rowid', tokenize='porter unicode61'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS message_fts_insert AFTER INSERT ON message BEGIN
+        INSERT INTO message_fts(rowid, content, user_key)
+        VALUES (new.rowid, new.content, {SQLITE_USER_KEY.format(row='new')});
+    END""",
+    # Messages are deleted before their conversation (ORM cascade), so the owner is still resolvable
+    f"""CREATE TRIGGER IF NOT EXISTS message_fts_delete AFTER DELETE ON message BEGIN
+        INSERT INTO message_fts(message_fts, rowid, content, user_key)
+        VALUES ('delete', old.rowid, old.content, {SQLITE_USER_KEY.format(row='old')});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS message_fts_update AFTER UPDATE OF content ON message BEGIN
+        INSERT INTO message_fts(message_fts, rowid, content, user_key)
+        VALUES ('delete', old.rowid, old.content, {SQLITE_USER_KEY.format(row='old')});
+        INSERT INTO message_fts(rowid, content, user_key)
+        VALUES (new.rowid, new.content, {SQLITE_USER_KEY.format(row='new')});
+    END""",
+]
+
+POSTGRES_INDEX_DDL = [
+    """ALTER TABLE message ADD COLUMN IF NOT EXISTS content_tsv tsvector
+        GENERATED ALWAYS AS (to_tsvector('english', content)) STORED""",
+    "CREATE INDEX IF NOT EXISTS idx_message_content_tsv ON message USING GIN (content_tsv)",
+]
+
+SQLITE_SEARCH_SQL = f"""
+    SELECT m.id, m.conversation_id, m.role, m.timestamp, c.title AS conversation_title,
+           snippet(message_fts, 0, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '...', 16) AS snippet,
+           bm25(message_fts, 1.0, 0.0) AS rank
+    FROM message_fts
+    JOIN message m ON m.rowid = message_fts.rowid
+    JOIN conversation c ON c.id = m.conversation_id
+    WHERE message_fts MATCH :query
+    ORDER BY rank
+    LIMIT :limit OFFSET :offset
+"""
+
+POSTGRES_SEARCH_SQL = f"""
+    SELECT m.id, m.conversation_id, m.role, m.timestamp, c.title AS conversation_title,
+           ts_headline('english', m.content, q,
+                       'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxFragments=1, MinWords=5, MaxWords=20') AS snippet,
+           ts_rank_cd(m.content_tsv, q) AS rank
+    FROM message m
+    JOIN conversation c ON c.id = m.conversation_id,
+         websearch_to_tsquery('english', :query) q
+    WHERE m.content_tsv @@ q AND c.user_id = :user_id
+    ORDER BY rank DESC
+    LIMIT :limit OFFSET :offset
+"""
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def fts5_query(raw: str, user_id: str) -> str:
+    """Turn free text into a safe FTS5 query scoped to one user.
+
+    Every term is required and the last one matches as a prefix.
+    """
+    tokens = _TOKEN_RE.findall(raw)
+    if not tokens:
+        return ''
+    quoted = [f'"{token}"' for token in tokens]
+    quoted[-1] += '*'
+    user_key = user_id.replace('-', '')
+    return f'user_key:"{user_key}" AND content:({" ".join(quoted)})'
+
+
+class MessageSearchService:
+    """Full-text search over message content, scoped to one user"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.dialect = engine.dialect.name
+
+    def ensure_index(self):
+        """Create the full-text index and its sync triggers; backfill on first creation"""
+        with self.engine.begin() as conn:
+            if self.dialect == 'sqlite':
+                existed = conn.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'message_fts'"
+                )).first() is not None
+                for ddl in SQLITE_INDEX_DDL:
+                    conn.execute(text(ddl))
+                if not existed:
+                    conn.execute(text("INSERT INTO message_fts(message_fts) VALUES ('rebuild')"))
+            elif self.dialect == 'postgresql':
+                # ALTER TABLE locks message exclusively even when the column exists; skip it once built
+                if conn.execute(text("SELECT to_regclass('idx_message_content_tsv')")).scalar() is not None:
+                    return
+                for ddl in POSTGRES_INDEX_DDL:
+                    conn.execute(text(ddl))
+            else:
+                raise NotImplementedError(f"Full-text search is not supported on {self.dialect}")
+
+    def search(self, session, user_id: str, query: str, limit: int = 20, offset: int = 0) -> List[Dict]:
+        if self.dialect == 'sqlite':
+            sql, query = SQLITE_SEARCH_SQL, fts5_query(query, user_id)
+            if not query:
+                return []
+        else:
+            sql = POSTGRES_SEARCH_SQL
+
+        rows = session.execute(text(sql), {
+            'query': query, 'user_id': user_id, 'limit': limit, 'offset': offset
+        }).mappings().all()
+        return [
+            {
+                'message_id': row['id'],
+                'conversation_id': row['conversation_id'],
+                'conversation_title': row['conversation_title'],
+                'role': row['role'],
+                'timestamp': row['timestamp'],
+                'snippet': row['snippet'],
+                'rank': float(row['rank'])
+            }
+            for row in rows
+        ]
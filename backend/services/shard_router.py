@@ -0,0 +1,73 @@
+import bisect
+import hashlib
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from sqlalchemy import create_engine
+
+
+def user_key(username: str) -> int:
+    """Stable 32-bit routing key for a username"""
+    return int(hashlib.sha1(username.encode('utf-8')).hexdigest()[:8], 16)
+
+
+class ShardMap:
+    """Deterministic user -> shard mapping on a consistent-hash ring.
+
+    Shards are identified by their position in the URL list, so appending a
+    shard only moves the users whose ring segment it takes over (~1/N).
+
+    Conversation ids carry their owner's routing key in the first 8 hex
+    digits, so routes that only know a conversation id find the right shard
+    without a directory lookup.
+    """
+
+    def __init__(self, urls: List[str], vnodes: int = 64, engine_options: Optional[dict] = None):
+        self.urls = urls
+        self.engines = [create_engine(url, **(engine_options or {})) for url in urls]
+        self._ring = sorted(
+            (user_key(f"shard-{index}-vnode-{v}"), index)
+            for index in range(len(urls))
+            for v in range(vnodes)
+        )
+        self._points = [point for point, _ in self._ring]
+
+    def __bool__(self):
+        return bool(self.engines)
+
+    def __len__(self):
+        return len(self.engines)
+
+    def shard_for_key(self, key: int) -> int:
+        position = bisect.bisect(self._points, key) % len(self._ring)
+        return self._ring[position][1]
+
+    def shard_for_user(self, username: str) -> int:
+        return self.shard_for_key(user_key(username))
+
+    def shard_for_conversation(self, conversation_id: str) -> int:
+        try:
+            return self.shard_for_key(int(conversation_id[:8], 16))
+        except ValueError:
+            return 0  # malformed id; the lookup on shard 0 will simply miss
+
+    def engine_for_user(self, username: str):
+        return self.engines[self.shard_for_user(username)]
+
+    def engine_for_conversation(self, conversation_id: str):
+        return self.engines[self.shard_for_conversation(conversation_id)]
+
+    @staticmethod
+    def conversation_id_for(username: str) -> str:
+        """A UUID4-shaped id whose first 8 hex digits are the owner's routing key"""
+        return str(uuid.UUID(f"{user_key(username):08x}{uuid.uuid4().hex[8:]}"))
+
+    @staticmethod
+    def conversation_matches_user(conversation_id: str, username: str) -> bool:
+        return conversation_id[:8] == f"{user_key(username):08x}"
+
+    def scatter(self, fn: Callable, max_workers: int = 8) -> list:
+        """Run ``fn(engine)`` on every shard concurrently and return the results in shard order"""
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(self.engines))) as pool:
+            return list(pool.map(fn, self.engines))
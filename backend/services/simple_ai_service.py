@@ -0,0 +1,78 @@
+# simple_ai_service.py - Rule-based responder used by the Flask app and as the LLM fallback
+
+from .product_index import parse_product_query
+
+
+class SimpleAIService:
+    """Simple AI service that generates responses based on user input"""
+
+    def __init__(self, product_index=None, product_results=3):
+        self.product_index = product_index
+        self.product_results = product_results
+
+    def find_products(self, user_message, min_score=0.0):
+        """Top catalog matches for a message, honouring any price/category/stock constraints in it.
+
+        With ``min_score`` above zero the message must match products by
+        its words; constraints alone ("over 3 days", "is support
+        available") don't list the catalog.
+        """
+        if self.product_index is None or not len(self.product_index):
+            return []
+        query, filters = parse_product_query(user_message, self.product_index.categories)
+        products = self.product_index.search(query, k=self.product_results, **filters)
+        if not products and filters and min_score <= 0:
+            # "anything under $20?" has no catalog terms, only constraints
+            return self.product_index.browse(k=self.product_results, **filters)
+        return [p for p in products if p['score'] >= min_score]
+
+    def describe_products(self, products):
+        lines = [
+            f"- {p['name']} (${p['price']:.2f}, {p['category']}, "
+            f"{'in stock' if p['stock_quantity'] > 0 else 'out of stock'})"
+            for p in products
+        ]
+        return "Here's what I found in our catalog:\n" + "\n".join(lines) + "\nWould you like more details on any of these?"
+
+    def generate_title(self, first_message, max_words=6, max_chars=60):
+        """Short conversation title from its opening message"""
+        text = " ".join(first_message.split())
+        for end in (". ", "? ", "! "):
+            idx = text.find(end)
+            if idx > 0:
+                text = text[:idx]
+        text = text.rstrip('.?!')
+        words = text.split()
+        title = " ".join(words[:max_words])
+        if len(words) > max_words or len(title) > max_chars:
+            title = title[:max_chars - 3].rstrip() + "..."
+        return title[:1].upper() + title[1:] if title else "New Conversation"
+
+    def generate_response(self, user_message, conversation_history=None):
+        """Generate a simple AI response based on user input"""
+
+        user_message_lower = user_message.lower()
+
+        # Simple response logic
+        if 'hello' in user_message_lower or 'hi' in user_message_lower:
+            return "Hello! How can I help you today?"
+        elif 'product' in user_message_lower or 'buy' in user_message_lower:
+            products = self.find_products(user_message)
+            if products:
+                return self.describe_products(products)
+            return "I can help you find products. We have electronics, accessories, and more. What are you looking for?"
+        elif 'price' in user_message_lower or 'cost' in user_message_lower:
+            products = self.find_products(user_message)
+            if products:
+                return self.describe_products(products)
+            return "Our products are competitively priced. Would you like me to check specific item prices for you?"
+        elif 'thank' in user_message_lower:
+            return "You're welcome! Is there anything else I can help you with?"
+        elif 'bye' in user_message_lower or 'goodbye' in user_message_lower:
+            return "Goodbye! Feel free to come back anytime if you need assistance."
+        else:
+            # Only answer with products when the message is clearly about one
+            products = self.find_products(user_message, min_score=0.3)
+            if products:
+                return self.describe_products(products)
+            return f"I understand you're asking about: '{user_message}'. Let me help you with that. Could you provide more details about what you're looking for?"
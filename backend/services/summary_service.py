@@ -0,0 +1,53 @@
+from typing import Dict, List, Optional
+
+
+class RollingSummarizer:
+    """Folds older conversation turns into a bounded running summary.
+
+    The default fold is extractive: each turn contributes its first sentence,
+    and the oldest lines are dropped once ``max_chars`` is reached, so the
+    summary never grows with the conversation. Pass ``summarize_fn`` to use an
+    LLM instead; it receives the previous summary and the new turns.
+    """
+
+    def __init__(self, max_chars: int = 2000, snippet_chars: int = 160, summarize_fn=None):
+        self.max_chars = max_chars
+        self.snippet_chars = snippet_chars
+        self.summarize_fn = summarize_fn
+
+    def _snippet(self, content: str) -> str:
+        text = " ".join(content.split())
+        for end in (". ", "? ", "! "):
+            idx = text.find(end)
+            if 0 < idx < self.snippet_chars:
+                return text[:idx + 1]
+        if len(text) > self.snippet_chars:
+            return text[:self.snippet_chars - 3] + "..."
+        return text
+
+    def fold(self, summary: Optional[str], messages: List[Dict]) -> str:
+        """Return a new summary covering ``summary`` followed by ``messages``"""
+        if not messages:
+            return summary or ""
+        if self.summarize_fn is not None:
+            return self.summarize_fn(summary or "", messages)[:self.max_chars]
+
+        lines = summary.splitlines() if summary else []
+        lines.extend(f"{msg['role']}: {self._snippet(msg['content'])}" for msg in messages)
+
+        total = sum(len(line) + 1 for line in lines)
+        while lines and total > self.max_chars:
+            total -= len(lines.pop(0)) + 1
+        return "\n".join(lines)
+
+    @staticmethod
+    def build_context(summary: Optional[str], recent_messages: List[Dict]) -> List[Dict]:
+        """Context for the AI service: a summary pseudo-message followed by recent turns"""
+        context = []
+        if summary:
+            context.append({
+                'role': 'system',
+                'content': f"Summary of earlier conversation:\n{summary}"
+            })
+        context.extend(recent_messages)
+        return context
@@ -0,0 +1,215 @@
+import json
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, Optional
+
+from sqlalchemy import (BigInteger, Column, DateTime, Index, Integer, MetaData, String, Table, Text,
+                        delete, select, update)
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+# Like schema_migrations, the queue table has its own metadata; migration 4 creates it
+task_metadata = MetaData()
+background_tasks = Table(
+    'background_task', task_metadata,
+    Column('id', BigInteger().with_variant(Integer, 'sqlite'), primary_key=True, autoincrement=True),
+    Column('name', String(100), nullable=False),
+    Column('payload', Text, nullable=False),
+    # At most one queued task per key, e.g. one pending summary fold per conversation
+    Column('dedupe_key', String(200), unique=True),
+    Column('status', String(20), nullable=False, default='pending'),  # 'pending' or 'failed'
+    Column('attempts', Integer, nullable=False, default=0),
+    # Next time a worker may claim the task: its retry time, or its lease expiry while running
+    Column('run_after', DateTime, nullable=False),
+    Column('last_error', Text),
+    Column('created_at', DateTime, nullable=False),
+    Index('ix_background_task_status_run_after', 'status', 'run_after'),
+)
+
+
+def _default(o):
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    if isinstance(o, Decimal):
+        return float(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class TaskQueue:
+    """Deferred work on a bounded thread pool, persisted in a queue table.
+
+    Handlers enqueue with the session or connection of their own
+    transaction, so a task exists exactly when the work that asked for it
+    committed, then ``notify()`` after the commit so it starts right away.
+    A dispatcher thread claims due tasks from every engine by pushing their
+    ``run_after`` out by ``lease_seconds``; a worker that dies mid-task just
+    lets the lease expire and the task runs again. Successful tasks are
+    deleted. A failed task is retried with exponential backoff, and after
+    ``max_attempts`` it stays in the table as ``failed`` for inspection.
+    Handlers therefore run at least once and must be idempotent.
+    """
+
+    def __init__(self, engines: Callable[[], Iterable], max_workers: int = 4, max_attempts: int = 5,
+                 retry_base_seconds: float = 2.0, lease_seconds: float = 60.0, poll_seconds: float = 1.0):
+        self.engines = engines
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.handlers: Dict[str, Callable[[dict], None]] = {}
+        self.stats = {'enqueued': 0, 'succeeded': 0, 'retried': 0, 'failed': 0}
+        self._stats_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._executor = None
+        self._dispatcher = None
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def register(self, name: str):
+        """Decorator registering ``handler(payload)`` for tasks called ``name``"""
+        def decorator(handler):
+            self.handlers[name] = handler
+            return handler
+        return decorator
+
+    def enqueue(self, executor, name: str, payload: dict, dedupe_key: Optional[str] = None,
+                delay_seconds: float = 0.0) -> None:
+        """Add a task inside the caller's transaction (``executor`` is a Session or Connection).
+
+        With ``dedupe_key`` the task is skipped if one with the same key is
+        still queued.
+        """
+        if name not in self.handlers:
+            raise ValueError(f"No handler registered for task {name!r}")
+        now = datetime.utcnow()
+        values = dict(
+            name=name,
+            payload=json.dumps(payload, default=_default),
+            dedupe_key=dedupe_key,
+            status='pending',
+            attempts=0,
+            run_after=now + timedelta(seconds=delay_seconds),
+            created_at=now
+        )
+        bind = executor.get_bind() if hasattr(executor, 'get_bind') else executor
+        if dedupe_key is not None and bind.dialect.name in ('sqlite', 'postgresql'):
+            insert = sqlite_insert if bind.dialect.name == 'sqlite' else postgresql_insert
+            statement = insert(background_tasks).values(**values).on_conflict_do_nothing(
+                index_elements=['dedupe_key'])
+        else:
+            statement = background_tasks.insert().values(**values)
+        executor.execute(statement)
+        self._count('enqueued')
+
+    def notify(self):
+        """Wake the dispatcher after committing new tasks"""
+        self._wake.set()
+
+    def _claim(self, engine, limit: int):
+        """Lease up to ``limit`` due tasks; a task another worker leased first is skipped"""
+        now = datetime.utcnow()
+        claimed = []
+        with engine.begin() as conn:
+            due = conn.execute(
+                select(background_tasks.c.id, background_tasks.c.run_after)
+                .where(background_tasks.c.status == 'pending', background_tasks.c.run_after <= now)
+                .order_by(background_tasks.c.run_after)
+                .limit(limit)
+            ).all()
+        for task_id, run_after in due:
+            with engine.begin() as conn:
+                won = conn.execute(
+                    update(background_tasks)
+                    .where(background_tasks.c.id == task_id, background_tasks.c.run_after == run_after)
+                    .values(run_after=now + timedelta(seconds=self.lease_seconds),
+                            attempts=background_tasks.c.attempts + 1)
+                ).rowcount
+                if won:
+                    claimed.append(conn.execute(
+                        select(background_tasks).where(background_tasks.c.id == task_id)
+                    ).one())
+        return claimed
+
+    def _execute(self, engine, task):
+        try:
+            self.handlers[task.name](json.loads(task.payload))
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}\n{traceback.format_exc(limit=5)}"
+            with engine.begin() as conn:
+                if task.attempts >= self.max_attempts or task.name not in self.handlers:
+                    conn.execute(update(background_tasks).where(background_tasks.c.id == task.id).values(
+                        status='failed', last_error=error, dedupe_key=None))
+                    self._count('failed')
+                    print(f"[TASKS] {task.name} #{task.id} failed permanently after {task.attempts} attempts: {e}")
+                else:
+                    delay = self.retry_base_seconds * 2 ** (task.attempts - 1)
+                    conn.execute(update(background_tasks).where(background_tasks.c.id == task.id).values(
+                        run_after=datetime.utcnow() + timedelta(seconds=delay), last_error=error))
+                    self._count('retried')
+                    print(f"[TASKS] {task.name} #{task.id} attempt {task.attempts} failed, retrying in {delay:.0f}s: {e}")
+            return
+        with engine.begin() as conn:
+            conn.execute(delete(background_tasks).where(background_tasks.c.id == task.id))
+        self._count('succeeded')
+
+    def run_pending(self, limit: int = 100) -> int:
+        """Claim and run due tasks on the calling thread; returns how many ran"""
+        ran = 0
+        for engine in self.engines():
+            for task in self._claim(engine, limit):
+                self._execute(engine, task)
+                ran += 1
+        return ran
+
+    def _run_on_worker(self, engine, task):
+        try:
+            self._execute(engine, task)
+        finally:
+            self._slots.release()
+            self._wake.set()
+
+    def _dispatch(self):
+        while not self._stop.is_set():
+            dispatched = 0
+            try:
+                for engine in self.engines():
+                    free, tasks = 0, []
+                    while self._slots.acquire(blocking=False):
+                        free += 1
+                    try:
+                        tasks = self._claim(engine, free) if free else []
+                    finally:
+                        # Slots not handed to a worker go back, even when the claim fails
+                        for _ in range(free - len(tasks)):
+                            self._slots.release()
+                    for task in tasks:
+                        self._executor.submit(self._run_on_worker, engine, task)
+                    dispatched += len(tasks)
+            except Exception as e:
+                print(f"[TASKS ERROR] Dispatcher: {e}")
+            if not dispatched:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+
+    def start(self):
+        if self._dispatcher is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='task')
+            self._dispatcher = threading.Thread(target=self._dispatch, name='task-dispatcher', daemon=True)
+            self._dispatcher.start()
+        return self
+
+    def stop(self, wait: bool = True):
+        self._stop.set()
+        self._wake.set()
+        if self._dispatcher is not None:
+            self._dispatcher.join()
+            self._executor.shutdown(wait=wait)
+            self._dispatcher = None
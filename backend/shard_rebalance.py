@@ -0,0 +1,157 @@
+# shard_rebalance.py - Move users to the shard the current shard map assigns them
+#
+# Run after changing SHARD_DATABASE_URLS (adding a shard, or sharding an
+# existing single database for the first time), with the app stopped:
+#
+#   python shard_rebalance.py --from sqlite:///conversational_ai.db \
+#       --to sqlite:///shard0.db,sqlite:///shard1.db,sqlite:///shard2.db
+#
+# Every user found on a --from database whose shard under the --to map is a
+# different database is copied there with all of their rows and then deleted
+# from the source. Conversations created before sharding have plain UUID ids;
+# they are re-keyed so the id embeds the owner's routing key, which is how
+# conversation-only routes find their shard. Each user is written to the
+# target in one transaction (clearing any partial copy first) before the
+# source is touched, so an interrupted run can simply be repeated.
+
+import argparse
+import time
+
+from sqlalchemy import create_engine
+
+from models import db
+from services.migrations import migrate
+from services.search_service import MessageSearchService
+from services.shard_router import ShardMap
+
+tables = db.metadata.tables
+USER = tables['user']
+CONVERSATION = tables['conversation']
+MESSAGE = tables['message']
+SUMMARY = tables['conversation_summary']
+SYNC_STATE = tables['user_sync_state']
+CHANGE_LOG = tables['change_log']
+
+
+def parse_urls(value):
+    return [url.strip() for url in value.split(',') if url.strip()]
+
+
+def load_user_rows(conn, user):
+    conversations = [dict(row) for row in conn.execute(
+        CONVERSATION.select().where(CONVERSATION.c.user_id == user['id'])).mappings()]
+    conversation_ids = [c['id'] for c in conversations]
+    return {
+        'user': [user],
+        'sync_state': [dict(row) for row in conn.execute(
+            SYNC_STATE.select().where(SYNC_STATE.c.user_id == user['id'])).mappings()],
+        'conversations': conversations,
+        'summaries': [dict(row) for row in conn.execute(
+            SUMMARY.select().where(SUMMARY.c.conversation_id.in_(conversation_ids))).mappings()],
+        'messages': [dict(row) for row in conn.execute(
+            MESSAGE.select().where(MESSAGE.c.conversation_id.in_(conversation_ids))).mappings()],
+        'change_log': [dict(row) for row in conn.execute(
+            CHANGE_LOG.select().where(CHANGE_LOG.c.user_id == user['id'])).mappings()],
+    }
+
+
+def rekey_conversations(rows, username):
+    """Give legacy conversation ids the owner's routing key; returns how many changed"""
+    new_ids = {
+        c['id']: ShardMap.conversation_id_for(username)
+        for c in rows['conversations']
+        if not ShardMap.conversation_matches_user(c['id'], username)
+    }
+    if not new_ids:
+        return 0
+    for c in rows['conversations']:
+        c['id'] = new_ids.get(c['id'], c['id'])
+    for row in rows['summaries'] + rows['messages'] + rows['change_log']:
+        row['conversation_id'] = new_ids.get(row['conversation_id'], row['conversation_id'])
+    for row in rows['change_log']:
+        if row['kind'] != 'message':
+            row['entity_id'] = new_ids.get(row['entity_id'], row['entity_id'])
+    return len(new_ids)
+
+
+def delete_user_rows(conn, username):
+    """Remove a user and everything they own; messages go first so the search triggers can resolve the owner"""
+    user_ids = [row.id for row in conn.execute(USER.select().where(USER.c.username == username))]
+    if not user_ids:
+        return
+    conversation_ids = CONVERSATION.select().with_only_columns(CONVERSATION.c.id).where(
+        CONVERSATION.c.user_id.in_(user_ids)).scalar_subquery()
+    conn.execute(MESSAGE.delete().where(MESSAGE.c.conversation_id.in_(conversation_ids)))
+    conn.execute(SUMMARY.delete().where(SUMMARY.c.conversation_id.in_(conversation_ids)))
+    conn.execute(CONVERSATION.delete().where(CONVERSATION.c.user_id.in_(user_ids)))
+    conn.execute(CHANGE_LOG.delete().where(CHANGE_LOG.c.user_id.in_(user_ids)))
+    conn.execute(SYNC_STATE.delete().where(SYNC_STATE.c.user_id.in_(user_ids)))
+    conn.execute(USER.delete().where(USER.c.id.in_(user_ids)))
+
+
+def insert_user_rows(conn, rows):
+    for table, key in ((USER, 'user'), (SYNC_STATE, 'sync_state'), (CONVERSATION, 'conversations'),
+                       (SUMMARY, 'summaries'), (MESSAGE, 'messages'), (CHANGE_LOG, 'change_log')):
+        if rows[key]:
+            conn.execute(table.insert(), rows[key])
+
+
+def rebalance(source_urls, target_urls, dry_run=False):
+    target_map = ShardMap(target_urls)
+    # A URL listed on both sides is the same database; reuse one engine for it
+    engines_by_url = dict(zip(target_map.urls, target_map.engines))
+    sources = [engines_by_url.get(url) or create_engine(url) for url in source_urls]
+
+    if not dry_run:
+        for engine in target_map.engines:
+            migrate(engine, db.metadata)
+            MessageSearchService(engine).ensure_index()
+
+    moved = rekeyed = stayed = 0
+    started = time.perf_counter()
+    for source_url, source in zip(source_urls, sources):
+        with source.connect() as conn:
+            users = [dict(row) for row in conn.execute(USER.select()).mappings()]
+        print(f"{source_url}: {len(users)} users")
+
+        for user in users:
+            target = target_map.engine_for_user(user['username'])
+            with source.connect() as conn:
+                rows = load_user_rows(conn, user)
+            changed_ids = rekey_conversations(rows, user['username'])
+            if target is source and not changed_ids:
+                stayed += 1
+                continue
+            if dry_run:
+                print(f"  would move {user['username']} ({len(rows['messages'])} messages) "
+                      f"to shard {target_map.shard_for_user(user['username'])}"
+                      + (f", re-keying {changed_ids} conversations" if changed_ids else ''))
+            elif target is source:
+                with source.begin() as conn:
+                    delete_user_rows(conn, user['username'])
+                    insert_user_rows(conn, rows)
+            else:
+                with target.begin() as conn:
+                    delete_user_rows(conn, user['username'])
+                    insert_user_rows(conn, rows)
+                with source.begin() as conn:
+                    delete_user_rows(conn, user['username'])
+            moved += target is not source
+            rekeyed += changed_ids
+
+    elapsed = time.perf_counter() - started
+    verb = 'Would move' if dry_run else 'Moved'
+    print(f"{verb} {moved} users, re-keyed {rekeyed} conversations, {stayed} users already in place "
+          f"({elapsed:.1f}s)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Move users onto the shards the shard map assigns them')
+    parser.add_argument('--from', dest='source', required=True,
+                        help='comma-separated database URLs currently holding the data')
+    parser.add_argument('--to', dest='target', required=True,
+                        help='comma-separated shard URLs in SHARD_DATABASE_URLS order')
+    parser.add_argument('--dry-run', action='store_true', help='print the plan without writing')
+    args = parser.parse_args()
+
+    rebalance(parse_urls(args.source), parse_urls(args.target), dry_run=args.dry_run)
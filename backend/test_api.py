@@ -2,12 +2,32 @@
 
 import requests
 import json
+import sys
 import time
 
+from services.query_counter import QUERY_BUDGETS
+
 # Configuration
 BASE_URL = 'http://localhost:5000'
 API_URL = f'{BASE_URL}/api'
 
+# Statement budgets, checked when the server reports its count in
+# X-DB-Queries (debug mode: python app.py); a scenario over budget fails the run
+over_budget = []
+
+def check_query_budget(response, scenario):
+    """Compare the request's statement count with its budget, recording the scenario when over it"""
+    count = response.headers.get('X-DB-Queries')
+    if count is None:
+        print(f"   (query count not reported for {scenario}; run the server in debug mode)")
+        return
+    budget = QUERY_BUDGETS[scenario]
+    if int(count) > budget:
+        print(f"   ❌ {scenario}: {count} queries, budget {budget} ({response.headers.get('X-DB-Time-Ms')}ms in DB)")
+        over_budget.append(scenario)
+        return
+    print(f"   ✅ {scenario}: {count} queries (budget {budget}, {response.headers.get('X-DB-Time-Ms')}ms in DB)")
+
 def test_health_check():
     """Test the health check endpoint"""
     print("=== TESTING HEALTH CHECK ===")
@@ -16,6 +36,7 @@ def test_health_check():
         response = requests.get(f'{API_URL}/health')
         print(f"Status Code: {response.status_code}")
         print(f"Response: {json.dumps(response.json(), indent=2)}")
+        check_query_budget(response, 'health')
         return response.status_code == 200
     except requests.exceptions.ConnectionError:
         print("❌ Cannot connect to server. Make sure Flask app is running!")
@@ -43,6 +64,7 @@ def test_primary_chat_endpoint():
         print(f"Status Code: {response.status_code}")
         result = response.json()
         print(f"Response: {json.dumps(result, indent=2)}")
+        check_query_budget(response, 'chat_new_conversation')
         
         if response.status_code == 200:
             conversation_id = result.get('conversation_id')
@@ -80,6 +102,7 @@ def test_conversation_continuation(conversation_id):
         print(f"Status Code: {response.status_code}")
         result = response.json()
         print(f"Response: {json.dumps(result, indent=2)}")
+        check_query_budget(response, 'chat_continue')
         
         if response.status_code == 200:
             print("✅ Conversation continuation working!")
@@ -114,6 +137,7 @@ def test_message_persistence():
         time.sleep(0.1)  # Small delay to ensure persistence
         
         messages_response = requests.get(f'{API_URL}/conversations/{conversation_id}/messages')
+        check_query_budget(messages_response, 'conversation_messages')
         
         if messages_response.status_code == 200:
             messages_data = messages_response.json()
@@ -143,6 +167,7 @@ def test_error_handling():
     print("   Testing missing message:")
     response = requests.post(f'{API_URL}/chat', json={})
     print(f"   Status Code: {response.status_code}")
+    check_query_budget(response, 'chat_missing_message')
     
     if response.status_code == 400:
         print("   ✅ Proper error handling for missing message")
@@ -156,6 +181,7 @@ def test_error_handling():
         "conversation_id": "invalid-uuid-123"
     })
     print(f"   Status Code: {response.status_code}")
+    check_query_budget(response, 'chat_invalid_conversation')
     
     if response.status_code == 404:
         print("   ✅ Proper error handling for invalid conversation ID")
@@ -170,6 +196,7 @@ def test_additional_endpoints():
     print("   Testing GET /api/conversations:")
     response = requests.get(f'{API_URL}/conversations?user_id=test_user_milestone4')
     print(f"   Status Code: {response.status_code}")
+    check_query_budget(response, 'list_conversations')
     
     if response.status_code == 200:
         data = response.json()
@@ -205,6 +232,10 @@ def run_comprehensive_test():
     # Test additional endpoints
     test_additional_endpoints()
     
+    if over_budget:
+        print(f"\n❌ Over query budget: {', '.join(over_budget)}")
+        sys.exit(1)
+    
     print("\n" + "="*60)
     print("MILESTONE 4 TESTING COMPLETED")
     print("="*60)
@@ -0,0 +1,69 @@
+# test_batch_runner.py - Batch items run per conversation in order, conversations concurrently
+
+import threading
+import time
+
+from services.batch_runner import group_items, latency_summary, run_batch
+
+
+def test_items_group_by_conversation_id_or_label():
+    items = [{'message': 'a', 'conversation': 1}, {'message': 'b', 'conversation_id': 'c9'},
+             {'message': 'c', 'conversation': 1}, {'message': 'd'}, {'message': 'e', 'conversation_id': 'c9'},
+             {'message': 'f', 'conversation': 1, 'user_id': 'someone else'}]
+    assert [[index for index, _ in group] for group in group_items(items)] == [[0, 2], [1, 4], [3], [5]]
+
+
+def test_groups_run_concurrently_and_stream_before_the_batch_ends():
+    items = [{'message': f"m{n}", 'conversation': n % 4} for n in range(12)]
+    seen, active, peak = [], [0], [0]
+    lock = threading.Lock()
+
+    def run_group(group, emit):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        for index, item in group:
+            time.sleep(0.01)
+            seen.append(index)
+            emit({'index': index, 'status': 200, 'latency_ms': 10.0})
+        with lock:
+            active[0] -= 1
+
+    results = list(run_batch(group_items(items), run_group, workers=4))
+    summary = results.pop()
+    assert sorted(r['index'] for r in results) == list(range(12))
+    assert peak[0] > 1
+    for label in range(4):
+        order = [index for index in seen if index % 4 == label]
+        assert order == sorted(order)
+    assert summary['type'] == 'summary' and summary['succeeded'] == 12 and summary['conversations'] == 4
+    assert summary['latency_ms']['p50'] == 10.0
+
+
+def test_unreported_items_of_a_failed_group_become_errors():
+    def run_group(group, emit):
+        index, item = group[0]
+        emit({'index': index, 'status': 200, 'latency_ms': 1.0})
+        raise RuntimeError("database went away")
+
+    results = list(run_batch(group_items([{'message': 'a', 'conversation': 'x'}] * 3), run_group, workers=2))
+    summary = results.pop()
+    assert [r['status'] for r in results] == [200, 500, 500]
+    assert 'database went away' in results[-1]['error']
+    assert summary['failed'] == 2
+    assert latency_summary([]) == {'count': 0}
+
+
+def test_batch_endpoint_streams_ndjson_and_rejects_bad_workers(flask_app):
+    assert flask_app.init_database()
+    client = flask_app.app.test_client()
+    body = {'user_id': 'batch_user', 'items': [{'message': 'Hello', 'conversation': 1, 'id': 'a'},
+                                               {'message': 'Any headphones?', 'conversation': 1, 'id': 'b'}]}
+
+    assert client.post('/api/chat/batch', json={**body, 'workers': 'lots'}).status_code == 400
+
+    response = client.post('/api/chat/batch', json={**body, 'workers': '2'})
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [flask_app.app.json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line.get('id') for line in lines] == ['a', 'b', None]
+    assert all(line['status'] == 200 for line in lines[:2]) and lines[-1]['succeeded'] == 2
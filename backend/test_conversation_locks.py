@@ -0,0 +1,74 @@
+# test_conversation_locks.py - Turns on one conversation run in order; others run in parallel
+
+import threading
+import time
+
+import pytest
+
+from services.conversation_locks import ConversationBusy, ConversationLocks, advisory_key
+
+
+def run_turns(locks, turns, hold_seconds):
+    """Start one thread per (conversation_id, n) in order; each records when it held the lock"""
+    spans, threads = [], []
+
+    def turn(conversation_id, n):
+        with locks.hold(conversation_id):
+            started = time.perf_counter()
+            time.sleep(hold_seconds)
+            spans.append((conversation_id, n, started, time.perf_counter()))
+
+    for conversation_id, n in turns:
+        thread = threading.Thread(target=turn, args=(conversation_id, n))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.005)  # fixes the arrival order
+    for thread in threads:
+        thread.join()
+    return spans
+
+
+def test_same_conversation_turns_run_one_at_a_time_in_arrival_order():
+    locks = ConversationLocks(stripes=64)
+    spans = run_turns(locks, [('c1', n) for n in range(6)], hold_seconds=0.02)
+    assert [n for _, n, _, _ in spans] == list(range(6))
+    assert all(earlier[3] <= later[2] for earlier, later in zip(spans, spans[1:]))
+    stats = locks.stats()
+    assert stats['acquired'] == 6 and stats['contended'] == 5 and stats['stripe_collisions'] == 0
+
+
+def test_different_conversations_do_not_wait():
+    locks = ConversationLocks(stripes=4096)
+    ids = [f"conversation-{n}" for n in range(8)]
+    assert len({hash(locks._stripe(cid)) for cid in ids}) == len(ids)
+    started = time.perf_counter()
+    run_turns(locks, [(cid, 0) for cid in ids], hold_seconds=0.1)
+    assert time.perf_counter() - started < 0.5
+    assert locks.stats()['contended'] == 0
+
+
+def test_stripe_collisions_and_timeouts_are_counted():
+    locks = ConversationLocks(stripes=1, timeout=0.05)
+    holding, release = threading.Event(), threading.Event()
+
+    def slow_turn():
+        with locks.hold('a'):
+            holding.set()
+            release.wait()
+
+    thread = threading.Thread(target=slow_turn)
+    thread.start()
+    holding.wait()
+    with pytest.raises(ConversationBusy):
+        with locks.hold('b'):
+            pass
+    assert locks.stats()['timeouts'] == 1
+
+    # Waiting for a different conversation on the same stripe is a collision
+    threading.Timer(0.05, release.set).start()
+    with locks.hold('b', timeout=5):
+        pass
+    thread.join()
+    stats = locks.stats()
+    assert stats['acquired'] == 2 and stats['contended'] == 1 and stats['stripe_collisions'] == 1
+    assert -2 ** 31 <= advisory_key('a') < 2 ** 31
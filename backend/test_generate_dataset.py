@@ -0,0 +1,65 @@
+# test_generate_dataset.py - The synthetic dataset is a pure function of the seed
+
+import hashlib
+import random
+from datetime import datetime, time
+
+from sqlalchemy import create_engine, text
+
+from generate_dataset import DatasetConfig, ZipfSampler, dataset_partitions, generate, generate_user, prepare
+from services.shard_router import ShardMap
+
+
+def fingerprint(url):
+    engine = create_engine(url)
+    digest = hashlib.sha256()
+    with engine.connect() as conn:
+        for query in ('SELECT id, username, created_at FROM "user" ORDER BY id',
+                      'SELECT id, user_id, title, created_at, updated_at FROM conversation ORDER BY id',
+                      'SELECT id, conversation_id, content, role, timestamp FROM message ORDER BY id'):
+            for row in conn.execute(text(query)):
+                digest.update(repr(tuple(row)).encode())
+    engine.dispose()
+    return digest.hexdigest()
+
+
+def test_users_are_reproducible_and_well_formed():
+    config = DatasetConfig(seed=7)
+    assert generate_user(config, 3) == generate_user(DatasetConfig(seed=7), 3)
+    assert generate_user(config, 3) != generate_user(DatasetConfig(seed=8), 3)
+
+    user, conversations, messages = generate_user(config, 11)
+    ids = {c['id'] for c in conversations}
+    assert all(ShardMap.conversation_matches_user(cid, user['username']) for cid in ids)
+    assert {m['conversation_id'] for m in messages} == ids
+    timestamps = [m['timestamp'] for m in messages]
+    assert timestamps == sorted(timestamps) and timestamps[0] >= user['created_at']
+
+
+def test_zipf_sampler_is_heavy_tailed():
+    sampler, rng = ZipfSampler(1.7, 500), random.Random(1)
+    draws = sorted(sampler.sample(rng) for _ in range(20000))
+    assert draws[len(draws) // 2] <= 2
+    assert draws[-1] > 50 and max(draws) <= 500
+
+
+def test_partitions_cover_every_generated_message():
+    config = DatasetConfig(seed=5, start=datetime(2024, 1, 20), days=40, max_turns=50)
+    partitions = dataset_partitions(config)
+    assert [name for name, start, end in partitions] == [
+        'message_p2024_01', 'message_p2024_02', 'message_p2024_03']
+    first, last = datetime.combine(partitions[0][1], time()), datetime.combine(partitions[-1][2], time())
+    for number in range(200):
+        _, _, messages = generate_user(config, number)
+        assert all(first <= message['timestamp'] < last for message in messages)
+
+
+def test_output_does_not_depend_on_worker_count(tmp_path):
+    config = DatasetConfig(seed=3, max_turns=20)
+    urls = {}
+    for workers, chunk_users in ((1, 40), (2, 7)):
+        url = f"sqlite:///{tmp_path / f'workers_{workers}.db'}"
+        prepare([url], search_index=False, config=config)
+        assert generate([url], 40, config, workers=workers, chunk_users=chunk_users)[0] == 40
+        urls[workers] = url
+    assert fingerprint(urls[1]) == fingerprint(urls[2])
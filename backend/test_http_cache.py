@@ -0,0 +1,24 @@
+# test_http_cache.py - Listing and history ETags change whenever the response would
+
+def revalidate(client, url, etag):
+    return client.get(url, headers={'If-None-Match': etag})
+
+
+def test_title_change_invalidates_listing_and_history_etags(flask_app):
+    assert flask_app.init_database()
+    client = flask_app.app.test_client()
+    conversation_id = client.post('/api/chat', json={'message': 'My wireless headphones stopped charging',
+                                                     'user_id': 'etag_user'}).get_json()['conversation_id']
+    urls = ['/api/conversations?user_id=etag_user', f'/api/conversations/{conversation_id}/messages']
+    first = [client.get(url) for url in urls]
+    placeholder = first[1].get_json()['conversation_title']
+    etags = [response.headers['ETag'] for response in first]
+    assert all(revalidate(client, url, etag).status_code == 304 for url, etag in zip(urls, etags))
+
+    # The title task (not run by the test client's request) keeps updated_at as it was
+    flask_app.generate_conversation_title({'conversation_id': conversation_id})
+
+    listing, history = (revalidate(client, url, etag) for url, etag in zip(urls, etags))
+    assert listing.status_code == history.status_code == 200
+    title = history.get_json()['conversation_title']
+    assert title != placeholder and listing.get_json()['conversations'][0]['title'] == title
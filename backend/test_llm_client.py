@@ -0,0 +1,78 @@
+# test_llm_client.py - Exercise ResilientLLMClient against the fake LLM server
+
+import time
+
+from fake_llm_server import FakeLLMConfig, start_fake_llm_server
+from services.llm_client import CircuitBreaker, ResilientLLMClient
+from services.simple_ai_service import SimpleAIService
+
+
+def make_client(base_url, slo_seconds=2.0, max_retries=2, failure_threshold=3):
+    return ResilientLLMClient(
+        api_key='test-key',
+        base_url=base_url,
+        model='fake-model',
+        slo_seconds=slo_seconds,
+        max_retries=max_retries,
+        min_attempt_seconds=0.05,
+        backoff_base=0.01,
+        breaker=CircuitBreaker(failure_threshold=failure_threshold, reset_timeout=0.2),
+        fallback=SimpleAIService().generate_response
+    )
+
+
+def test_healthy_upstream():
+    """Healthy upstream answers through the LLM"""
+    server, base_url = start_fake_llm_server(FakeLLMConfig())
+    try:
+        result = make_client(base_url).complete(
+            [{'role': 'user', 'content': 'hello'}], 'hello'
+        )
+        assert result == {'content': '[fake-llm] hello', 'source': 'llm'}
+    finally:
+        server.shutdown()
+
+
+def test_slow_upstream_falls_back_within_deadline():
+    """A hung upstream is cut off at the SLO and the fallback answers"""
+    server, base_url = start_fake_llm_server(FakeLLMConfig(latency=1.0))
+    try:
+        started = time.monotonic()
+        result = make_client(base_url, slo_seconds=0.3).complete(
+            [{'role': 'user', 'content': 'hello'}], 'hello'
+        )
+        elapsed = time.monotonic() - started
+        assert result['source'] == 'fallback'
+        assert result['content'] == 'Hello! How can I help you today?'
+        assert elapsed < 0.6, f"took {elapsed:.2f}s with a 0.3s SLO"
+    finally:
+        server.shutdown()
+
+
+def test_breaker_opens_and_recovers():
+    """Repeated errors open the breaker; a successful probe closes it again"""
+    config = FakeLLMConfig(error_rate=1.0)
+    server, base_url = start_fake_llm_server(config)
+    try:
+        client = make_client(base_url, max_retries=0, failure_threshold=2)
+        for _ in range(2):
+            assert client.complete([{'role': 'user', 'content': 'x'}], 'x')['source'] == 'fallback'
+        assert client.breaker.state == CircuitBreaker.OPEN
+
+        served = config.requests_served
+        client.complete([{'role': 'user', 'content': 'x'}], 'x')
+        assert config.requests_served == served, "open breaker must not call upstream"
+
+        config.error_rate = 0.0
+        time.sleep(0.25)
+        assert client.complete([{'role': 'user', 'content': 'x'}], 'x')['source'] == 'llm'
+        assert client.breaker.state == CircuitBreaker.CLOSED
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    for test in (test_healthy_upstream, test_slow_upstream_falls_back_within_deadline,
+                 test_breaker_opens_and_recovers):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,77 @@
+# test_memory_index.py - Recalling a user's relevant older turns from compact vectors
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from services.memory_index import MemoryIndex, embed, pair_turns
+
+START = datetime(2024, 1, 1)
+
+
+def turn(n, question, answer, conversation_id='c1'):
+    return {'conversation_id': conversation_id, 'user_message_id': f"u{n}", 'assistant_message_id': f"a{n}",
+            'started_at': START + timedelta(days=n), 'ended_at': START + timedelta(days=n, seconds=2),
+            'user_content': question, 'assistant_content': answer}
+
+
+TURNS = [
+    turn(0, 'My wireless headphones battery drains overnight', 'Try a firmware update for the headphones.'),
+    turn(1, 'What is your refund policy for damaged items?', 'Damaged items can be refunded within 30 days.'),
+    turn(2, 'Do you ship to Canada?', 'Yes, delivery to Canada takes 5-7 days.', conversation_id='c2'),
+    turn(3, 'Can I change the shipping address on my order?', 'Yes, until the order is dispatched.'),
+]
+
+
+def test_embedding_is_unit_length_and_topical():
+    a, b, c = (embed(text) for text in ('headphones battery drains', 'battery of my headphones', 'refund policy'))
+    assert abs(np.linalg.norm(a) - 1) < 1e-6
+    assert a @ b > 0.5 > abs(a @ c)
+    assert not embed('hi there, thanks').any()
+
+
+def test_search_recalls_relevant_turns_from_any_conversation():
+    index = MemoryIndex(min_score=0.15)
+    assert index.search('user', 'headphones') == []
+    index.load('user', TURNS[:3])
+    assert index.add('user', TURNS[3]) and not index.add('stranger', TURNS[3])
+
+    [hit] = index.search('user', 'the headphones battery died again', k=1)
+    assert hit['user_message_id'] == 'u0' and hit['score'] > 0.15 and 'user_content' not in hit
+    assert index.search('user', 'delivery to canada', k=2)[0]['conversation_id'] == 'c2'
+    # Turns already in the recent context aren't recalled again
+    assert [h['user_message_id'] for h in index.search('user', 'headphones battery', exclude={'u0'})] == []
+
+    index.forget_conversation('user', 'c2')
+    assert all(h['conversation_id'] != 'c2' for h in index.search('user', 'delivery to canada'))
+
+
+def test_memory_is_bounded_per_user():
+    index = MemoryIndex(max_turns=3, min_score=0.0)
+    index.load('user', TURNS)
+    assert index._users.get('user').vectors.dtype == np.float16
+    recalled = {h['user_message_id'] for h in index.search('user', 'headphones battery refund shipping', k=10)}
+    assert recalled <= {'u1', 'u2', 'u3'}
+
+
+def test_pair_turns_matches_replies_within_each_conversation():
+    messages = [
+        {'id': 'm1', 'conversation_id': 'c1', 'role': 'user', 'content': 'q1', 'timestamp': START},
+        {'id': 'm2', 'conversation_id': 'c2', 'role': 'user', 'content': 'q2', 'timestamp': START},
+        {'id': 'm3', 'conversation_id': 'c1', 'role': 'assistant', 'content': 'r1', 'timestamp': START},
+        {'id': 'm4', 'conversation_id': 'c2', 'role': 'assistant', 'content': 'r2', 'timestamp': START},
+        {'id': 'm5', 'conversation_id': 'c1', 'role': 'assistant', 'content': 'orphan', 'timestamp': START},
+    ]
+    assert [(t['user_message_id'], t['assistant_message_id']) for t in pair_turns(messages)] == [
+        ('m1', 'm3'), ('m2', 'm4')]
+
+
+def test_memory_written_elsewhere_is_dropped_for_reload():
+    index = MemoryIndex(min_score=0.15)
+    index.load('user', TURNS[:2], seq=6)
+    assert index.advance('user', 9, 3) and index.add('user', TURNS[2])
+    # seq 10 was another process's turn: this memory never saw it
+    assert not index.advance('user', 13, 3)
+    assert not index.loaded('user') and not index.add('user', TURNS[3])
+    assert not index.advance('stranger', 3, 3)
+
@@ -0,0 +1,30 @@
+# test_partitions.py - Monthly partition planning and retention cutoffs
+
+from datetime import date
+
+from sqlalchemy import create_engine
+
+from services.partitions import (PartitionMaintainer, add_months, expired_partitions, partition_month,
+                                 planned_partitions)
+
+
+def test_plan_covers_history_through_months_ahead():
+    planned = planned_partitions('message', date(2024, 11, 20), date(2025, 1, 3), months_ahead=2)
+    assert [name for name, _, _ in planned] == [
+        'message_p2024_11', 'message_p2024_12', 'message_p2025_01', 'message_p2025_02', 'message_p2025_03']
+    assert planned[1][1:] == (date(2024, 12, 1), date(2025, 1, 1))
+    assert add_months(date(2025, 1, 1), -13) == date(2023, 12, 1)
+
+
+def test_only_whole_months_past_retention_expire():
+    names = ['message_p2024_03', 'message_default', 'message_p2024_01', 'message_p2024_02', 'messages_p2023_01']
+    assert partition_month('message', 'message_default') is None
+    # Keeping 12 months on 2025-02-10 keeps February 2024 onwards
+    assert expired_partitions('message', names, date(2025, 2, 10), 12) == ['message_p2024_01']
+    assert expired_partitions('message', names, date(2025, 4, 1), 12) == [
+        'message_p2024_01', 'message_p2024_02', 'message_p2024_03']
+
+
+def test_maintenance_leaves_unpartitioned_databases_alone(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'plain.db'}")
+    assert PartitionMaintainer(engine, retention_months=1, drop=True).run() == {'created': [], 'expired': []}
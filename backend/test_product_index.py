@@ -0,0 +1,67 @@
+# test_product_index.py - Ranking, filters and incremental updates of the product retrieval index
+
+from services.product_index import ProductIndex, parse_product_query
+from services.simple_ai_service import SimpleAIService
+
+CATALOG = [
+    {'id': 'p1', 'name': 'Wireless Headphones', 'description': 'High-quality wireless Bluetooth headphones',
+     'price': 99.99, 'category': 'Electronics', 'stock_quantity': 50},
+    {'id': 'p2', 'name': 'Smartphone Case', 'description': 'Protective case for smartphones',
+     'price': 19.99, 'category': 'Accessories', 'stock_quantity': 100},
+    {'id': 'p3', 'name': 'USB Cable', 'description': 'High-speed USB-C charging cable',
+     'price': 12.99, 'category': 'Accessories', 'stock_quantity': 0},
+    {'id': 'p4', 'name': 'Bluetooth Speaker', 'description': 'Portable wireless speaker',
+     'price': 49.00, 'category': 'Electronics', 'stock_quantity': 3},
+]
+
+
+def make_index(**kwargs):
+    index = ProductIndex(**kwargs)
+    index.add(CATALOG)
+    return index
+
+
+def test_ranks_by_cosine_similarity():
+    """Name matches outrank description matches and plurals match singulars"""
+    results = make_index().search('wireless headphone', k=2)
+    assert [p['id'] for p in results] == ['p1', 'p4']
+    assert results[0]['score'] > results[1]['score'] > 0
+
+
+def test_filters_apply_before_top_k():
+    index = make_index()
+    assert [p['id'] for p in index.search('wireless', k=3, max_price=60)] == ['p4']
+    assert index.search('cable', in_stock=True) == []
+    assert {p['id'] for p in index.search('case cable', category='accessories')} == {'p2', 'p3'}
+
+
+def test_truncated_postings_fall_back_when_filters_reject_them():
+    """With one posting scanned per term, a filter that rejects it still finds the next match"""
+    index = make_index(max_postings=1)
+    assert [p['id'] for p in index.search('wireless', k=1, max_price=60)] == ['p4']
+
+
+def test_incremental_adds_replace_and_compact():
+    index = make_index(max_segments=2)
+    index.add([dict(CATALOG[2], price=9.99, stock_quantity=5)])
+    index.add([{'id': 'p5', 'name': 'Charging Dock', 'description': 'charging cable dock',
+                'price': 29.99, 'category': 'Accessories', 'stock_quantity': 7}])
+    assert len(index) == 5
+    results = index.search('charging cable', k=5, in_stock=True)
+    assert {p['id']: p['price'] for p in results} == {'p3': 9.99, 'p5': 29.99}
+
+
+def test_parse_product_query():
+    text, filters = parse_product_query('Any wireless headphones under $100 in stock in electronics?',
+                                        ['Electronics', 'Accessories'])
+    assert filters == {'max_price': 100.0, 'in_stock': True, 'category': 'Electronics'}
+    assert 'wireless headphones' in text
+    assert parse_product_query('speakers between $20 and $50', [])[1] == {'min_price': 20.0, 'max_price': 50.0}
+
+
+def test_constraints_alone_only_browse_when_products_were_asked_for():
+    ai = SimpleAIService(product_index=make_index())
+    assert [p['id'] for p in ai.find_products('any products under $20?')] == ['p3', 'p2']
+    for message in ('I waited over 3 days', 'more than 10 times', 'is support available'):
+        assert ai.find_products(message, min_score=0.3) == [], message
+        assert 'catalog' not in ai.generate_response(message)
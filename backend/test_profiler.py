@@ -0,0 +1,112 @@
+# test_profiler.py - Opt-in request profiling, flamegraph rendering and the on-disk ring buffer
+
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.testclient import TestClient
+from flask import Flask
+
+from services.profiler import (PROFILE_HEADER, PROFILE_ID_HEADER, ProfileStore, RequestProfiler,
+                               StackSampler, init_fastapi_profiling, init_profiling, profiled,
+                               render_flamegraph)
+
+
+def busy_handler(seconds):
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(100))
+    return total
+
+
+def make_app(profiler):
+    app = Flask(__name__)
+    init_profiling(app, profiler)
+
+    @app.route('/api/chat', methods=['POST'])
+    def chat():
+        busy_handler(0.1)
+        return {'ok': True}
+
+    return app
+
+
+def test_sampler_captures_the_running_stack():
+    sampler = StackSampler(threading.get_ident(), interval=0.002).start()
+    busy_handler(0.1)
+    sampler.stop()
+    assert sampler.samples > 10
+    assert any('busy_handler (test_profiler.py' in stack.split(';')[-1] for stack in sampler.stacks)
+
+    svg = render_flamegraph(sampler.stacks, title='POST /api/chat')
+    assert svg.startswith('<svg') and 'busy_handler' in svg
+
+
+def test_ring_buffer_keeps_newest_profiles(tmp_path):
+    store = ProfileStore(str(tmp_path / 'profiles'), max_profiles=3)
+    assert store.list() == []
+    for n in range(5):
+        store.save({'path': f"/request/{n}"}, {'main;handler': n + 1})
+    assert [p['id'] for p in store.list()] == [5, 4, 3]
+    assert store.read(1) is None
+    assert store.read(5, 'folded') == 'main;handler 5\n'
+    assert len(list((tmp_path / 'profiles').iterdir())) == 9
+
+    # Numbering continues across restarts
+    assert ProfileStore(str(tmp_path / 'profiles'), max_profiles=3).save({}, {'a': 1}) == 6
+
+
+def test_header_triggers_profile_only_with_the_token(tmp_path):
+    profiler = RequestProfiler(ProfileStore(str(tmp_path)), token='secret', interval=0.002)
+    client = make_app(profiler).test_client()
+
+    assert PROFILE_ID_HEADER not in client.post('/api/chat').headers
+    assert PROFILE_ID_HEADER not in client.post('/api/chat', headers={PROFILE_HEADER: 'wrong'}).headers
+    response = client.post('/api/chat', headers={PROFILE_HEADER: 'secret'})
+    profile_id = int(response.headers[PROFILE_ID_HEADER])
+
+    [profile] = profiler.store.list()
+    assert profile['id'] == profile_id
+    assert profile['path'] == '/api/chat' and profile['trigger'] == 'header' and profile['samples'] > 10
+    assert 'busy_handler' in profiler.store.read(profile_id)
+
+
+def test_sample_rate_profiles_without_header(tmp_path):
+    profiler = RequestProfiler(ProfileStore(str(tmp_path)), sample_rate=1.0, interval=0.002)
+    response = make_app(profiler).test_client().post('/api/chat')
+    assert profiler.store.list()[0]['trigger'] == 'sampled'
+    assert PROFILE_ID_HEADER in response.headers
+
+
+def test_disabled_profiler_installs_no_hooks(tmp_path):
+    profiler = RequestProfiler(ProfileStore(str(tmp_path / 'unused')))
+    app = make_app(profiler)
+    assert not app.before_request_funcs and not app.after_request_funcs
+    app.test_client().post('/api/chat', headers={PROFILE_HEADER: ''})
+    assert not (tmp_path / 'unused').exists()
+
+
+def test_fastapi_profile_samples_thread_pool_work_and_always_stops(tmp_path):
+    profiler = RequestProfiler(ProfileStore(str(tmp_path)), token='secret', interval=0.002)
+    app = FastAPI()
+    init_fastapi_profiling(app, profiler)
+
+    @app.post('/api/chat')
+    async def chat():
+        await run_in_threadpool(profiled(lambda: busy_handler(0.1)))
+        return {'ok': True}
+
+    @app.post('/api/broken')
+    async def broken():
+        raise RuntimeError('boom')
+
+    client = TestClient(app, raise_server_exceptions=False)
+    response = client.post('/api/chat', headers={PROFILE_HEADER: 'secret'})
+    folded = profiler.store.read(int(response.headers[PROFILE_ID_HEADER]), 'folded')
+    assert 'busy_handler (test_profiler.py' in folded
+
+    assert client.post('/api/broken', headers={PROFILE_HEADER: 'secret'}).status_code == 500
+    assert profiler.store.list()[0]['status'] == 500
+    assert not any(thread.name == 'profiler' for thread in threading.enumerate())
@@ -0,0 +1,58 @@
+# test_pubsub.py - The push channel: relay framing and authentication, and /api/events
+
+import socket
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from services.pubsub import RelayBroker, create_broker, decode_frame, encode_frame, run_relay
+
+
+def free_address():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()
+
+
+def test_relay_needs_an_explicit_authkey():
+    with pytest.raises(ValueError):
+        create_broker('relay://127.0.0.1:6380', b'')
+    with pytest.raises(ValueError):
+        run_relay(free_address(), b'')
+
+
+def test_frames_are_json():
+    sent_at = datetime(2026, 1, 2, 3, 4, 5)
+    frame = encode_frame('user:1', {'type': 'messages', 'cursor': 7, 'sent_at': sent_at})
+    assert frame.startswith(b'["user:1",')
+    assert decode_frame(frame) == ('user:1', {'type': 'messages', 'cursor': 7, 'sent_at': '2026-01-02T03:04:05'})
+
+
+def test_relay_forwards_events_between_workers():
+    address = free_address()
+    threading.Thread(target=run_relay, args=(address, b'test-key'), daemon=True).start()
+    for _ in range(100):
+        try:
+            publisher, subscriber_broker = RelayBroker(address, b'test-key'), RelayBroker(address, b'test-key')
+            break
+        except ConnectionRefusedError:
+            time.sleep(0.05)
+    subscription = subscriber_broker.subscribe('user:1')
+
+    # The relay registers a connection just after its handshake, so the first publish can miss it
+    for _ in range(50):
+        publisher.publish('user:1', {'type': 'messages', 'cursor': 1})
+        event = subscription.get(timeout=0.1)
+        if event is not None:
+            break
+    assert event == {'type': 'messages', 'cursor': 1}
+
+
+def test_events_for_an_unknown_user_is_an_empty_stream(flask_app):
+    assert flask_app.init_database()
+    response = flask_app.app.test_client().get('/api/events?user_id=nobody_yet')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    assert response.get_data(as_text=True) == 'retry: 3000\n\n'
@@ -0,0 +1,61 @@
+# test_query_counts.py - Per-endpoint SQL statement budgets for the test_api.py scenarios
+#
+# Runs each scenario in-process against a scratch database and fails when it
+# issues more statements than QUERY_BUDGETS allows, so an N+1 loop (a query
+# per conversation or message) cannot slip back in unnoticed.
+
+import pytest
+
+from services.query_counter import QUERY_BUDGETS, QUERY_COUNT_HEADER, count_queries, max_queries
+
+
+@pytest.fixture(scope='module')
+def client(flask_app):
+    assert flask_app.init_database()
+    return flask_app.app.test_client()
+
+
+def test_chat_scenarios_stay_within_budget(client):
+    with max_queries(QUERY_BUDGETS['health'], 'GET /api/health'):
+        client.get('/api/health')
+
+    with max_queries(QUERY_BUDGETS['chat_new_conversation'], 'POST /api/chat (new conversation)'):
+        response = client.post('/api/chat', json={'message': 'Hello, I need help with products',
+                                                  'user_id': 'budget_user'})
+    conversation_id = response.get_json()['conversation_id']
+
+    for text in ('What products do you have available?', 'any headphones?', 'thanks'):
+        with max_queries(QUERY_BUDGETS['chat_continue'], 'POST /api/chat (continue)'):
+            client.post('/api/chat', json={'message': text, 'conversation_id': conversation_id,
+                                           'user_id': 'budget_user'})
+
+    with max_queries(QUERY_BUDGETS['conversation_messages'], 'GET /api/conversations/<id>/messages'):
+        client.get(f'/api/conversations/{conversation_id}/messages')
+
+    with max_queries(QUERY_BUDGETS['chat_missing_message'], 'POST /api/chat (no message)'):
+        assert client.post('/api/chat', json={}).status_code == 400
+
+    with max_queries(QUERY_BUDGETS['chat_invalid_conversation'], 'POST /api/chat (unknown conversation)'):
+        assert client.post('/api/chat', json={'message': 'Test message',
+                                              'conversation_id': 'invalid-uuid-123'}).status_code == 404
+
+
+def test_conversation_listing_is_not_n_plus_one(client):
+    for n in range(8):
+        client.post('/api/chat', json={'message': f'question {n}', 'user_id': 'listing_user'})
+
+    with count_queries() as tally:
+        response = client.get('/api/conversations?user_id=listing_user')
+    assert len(response.get_json()['conversations']) == 8
+    assert tally.count <= QUERY_BUDGETS['list_conversations'], tally.report()
+    assert tally.most_repeated()[1] == 1, tally.report()
+
+
+def test_debug_headers_report_the_count(client):
+    client.application.debug = True
+    try:
+        response = client.get('/api/conversations?user_id=listing_user')
+    finally:
+        client.application.debug = False
+    assert int(response.headers[QUERY_COUNT_HEADER]) <= QUERY_BUDGETS['list_conversations']
+    assert QUERY_COUNT_HEADER not in client.get('/api/health').headers
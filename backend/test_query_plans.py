@@ -0,0 +1,43 @@
+# test_query_plans.py - Fail if a hot API query scans a whole table
+#
+# Runs the chat, listing, history, sync, search and delete routes against a
+# scratch database at the latest migration and EXPLAINs every SELECT they
+# issue. Point TEST_DATABASE_URL at a Postgres database to check its plans
+# instead (see conftest.py).
+
+from services.migrations import current_version, latest_version
+from services.query_plans import QueryPlanRecorder
+
+
+def exercise_hot_paths(client):
+    first = client.post('/api/chat', json={'message': 'my wireless headphones broke', 'user_id': 'plan_user'})
+    conversation_id = first.get_json()['conversation_id']
+    for text in ('they will not charge', 'order number 1234', 'can I get a refund'):
+        client.post('/api/chat', json={'message': text, 'user_id': 'plan_user', 'conversation_id': conversation_id})
+    client.post('/api/chat', json={'message': 'another question', 'user_id': 'plan_user'})
+
+    client.get('/api/conversations?user_id=plan_user')
+    client.get(f'/api/conversations/{conversation_id}/messages')
+    page = client.get(f'/api/conversations/{conversation_id}/messages?limit=2').get_json()
+    client.get(f"/api/conversations/{conversation_id}/messages?limit=2&before={page['next_before']}")
+    client.get('/api/sync?user_id=plan_user&since=0')
+    client.get('/api/search?user_id=plan_user&q=wireless')
+    client.delete(f'/api/conversations/{conversation_id}')
+
+
+def test_migrations_reach_latest_version(flask_app):
+    assert flask_app.init_database()
+    with flask_app.app.app_context():
+        assert current_version(flask_app.db.engine) == latest_version()
+
+
+def test_hot_queries_use_indexes(flask_app):
+    assert flask_app.init_database()
+    with flask_app.app.app_context():
+        engine = flask_app.db.engine
+    # Seed first so plans reflect tables with rows in them
+    exercise_hot_paths(flask_app.app.test_client())
+    with QueryPlanRecorder(engine) as plans:
+        exercise_hot_paths(flask_app.app.test_client())
+    assert plans.explained > 0
+    assert not plans.full_scans, f"Full table scans in hot queries:\n{plans.report()}"
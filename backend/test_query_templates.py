@@ -0,0 +1,175 @@
+# test_query_templates.py - Question shapes, SQL parameterization and template reuse for LLM-planned queries
+
+import json
+import os
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import DatabaseError
+
+from services.llm_service import LLMIntegrationService
+from services.query_templates import (QueryTemplateCache, UnsafeQueryError, bind_literals,
+                                      parameterize_sql, read_only_engine)
+
+PRODUCTS = [
+    ('p1', 'Wireless Headphones', 99.99, 'Electronics', 50),
+    ('p2', 'Smartphone Case', 19.99, 'Accessories', 100),
+    ('p3', 'USB Cable', 12.99, 'Accessories', 0),
+]
+
+
+@pytest.fixture
+def database_url():
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE product (id TEXT PRIMARY KEY, name TEXT, description TEXT, "
+                          "price NUMERIC, category TEXT, stock_quantity INTEGER)"))
+        conn.execute(text("CREATE TABLE conversations (id INTEGER PRIMARY KEY, user_message TEXT)"))
+        for row in PRODUCTS:
+            conn.execute(text("INSERT INTO product (id, name, price, category, stock_quantity) "
+                              "VALUES (:id, :name, :price, :category, :stock)"),
+                         dict(zip(['id', 'name', 'price', 'category', 'stock'], row)))
+    engine.dispose()
+    yield f"sqlite:///{path}"
+    os.remove(path)
+
+
+def make_cache():
+    return QueryTemplateCache(allowed_tables=['product'], entities={
+        'product': [name for _, name, _, _, _ in PRODUCTS],
+        'category': ['Electronics', 'Accessories'],
+    })
+
+
+def test_shape_lifts_entities_and_numbers():
+    cache = make_cache()
+    first = cache.shape("What is the price of the USB Cable?")
+    second = cache.shape("what is the price of the wireless headphones")
+    assert first.key == second.key == ('price_lookup', 'what is the price of the {product}')
+    assert first.slots == [('product', 'USB Cable')]
+    assert second.slots == [('product', 'Wireless Headphones')]
+
+    shaped = cache.shape("Show me accessories under $25")
+    assert shaped.shape == 'show me {category} under {num}'
+    assert shaped.slots == [('category', 'Accessories'), ('num', '25')]
+
+
+def test_parameterize_and_bind_literals():
+    sql, literals = parameterize_sql("SELECT name FROM product WHERE name LIKE '%usb cable%' AND price < 20")
+    assert sql == "SELECT name FROM product WHERE name LIKE :p0 AND price < :p1"
+    assert literals == ['%usb cable%', 20]
+
+    bindings = bind_literals(literals, [('product', 'USB Cable'), ('num', '20')])
+    assert bindings['p0'] == {'slot': 0, 'prefix': '%', 'suffix': '%', 'numeric': False, 'case': 'lower'}
+    assert bindings['p1'] == {'slot': 1, 'numeric': True}
+    # A slot the SQL never used means the template would ignore part of the next question
+    assert bind_literals(literals, [('product', 'USB Cable'), ('num', '20'), ('num', '5')]) is None
+
+
+def test_validate_rejects_unsafe_sql():
+    cache = make_cache()
+    assert cache.validate("SELECT * FROM product;") == "SELECT * FROM product"
+    assert cache.validate("SELECT * FROM product WHERE name = 'drop zone'")
+    assert cache.validate("WITH cheap AS (SELECT * FROM product WHERE price < 20) SELECT count(*) FROM cheap")
+    for sql in ["DELETE FROM product", "SELECT 1; DROP TABLE product", "SELECT * FROM user",
+                "SELECT * FROM product JOIN message ON 1 = 1",
+                "SELECT * FROM product, conversations", "SELECT name, sql FROM product, sqlite_master",
+                "SELECT * FROM product WHERE id IN (SELECT user_id FROM message)",
+                "SELECT name FROM product UNION SELECT name FROM sqlite_master",
+                "SELECT pg_read_file('/etc/passwd') FROM product", "SELECT load_extension('x')",
+                "WITH gone AS (DELETE FROM product RETURNING *) SELECT * FROM gone",
+                "SELECT * INTO copy FROM product", "SELECT * FROM main.product"]:
+        with pytest.raises(UnsafeQueryError):
+            cache.validate(sql)
+
+
+def test_read_only_engine_only_reads_allowed_tables(database_url):
+    engine = read_only_engine(database_url, ['product'])
+    with engine.connect() as conn:
+        assert len(conn.execute(text("SELECT name FROM product WHERE lower(name) LIKE '%usb%'")).all()) == 1
+        # Even SQL that got past validate() can't reach other tables or write
+        for sql in ["SELECT * FROM product, conversations", "SELECT sql FROM sqlite_master",
+                    "SELECT load_extension('x')", "DELETE FROM product"]:
+            with pytest.raises(DatabaseError):
+                conn.execute(text(sql))
+    engine.dispose()
+
+
+def test_prepared_template_is_reused_with_new_values(database_url):
+    cache = make_cache()
+    engine = create_engine(database_url)
+    with engine.connect() as conn:
+        shape = cache.shape("How much is the USB Cable?")
+        template, params, cached = cache.prepare(conn, shape, "SELECT name, price FROM product WHERE name = 'USB Cable'")
+        assert cached and params == {'p0': 'USB Cable'}
+
+        hit = cache.lookup(cache.shape("how much is the smartphone case?"))
+        assert hit is not None
+        reused, params = hit
+        assert reused is template
+        assert params == {'p0': 'Smartphone Case'}
+        assert conn.execute(reused.statement, params).one().price == pytest.approx(19.99)
+    engine.dispose()
+
+
+class StubLLMClient:
+    def __init__(self):
+        self.planned = []
+
+    def deadline_for(self, slo_seconds=None):
+        return 0.0
+
+    def chat_completion(self, messages, deadline, **params):
+        question = messages[-1]['content']
+        self.planned.append(question)
+        name = 'USB Cable' if 'usb' in question.lower() else 'Smartphone Case'
+        return json.dumps({'intent': 'price_lookup', 'sql': f"SELECT name, price FROM product WHERE name = '{name}'"})
+
+    def complete(self, messages, user_message, conversation_history=None, slo_seconds=None, **params):
+        rows = json.loads(messages[0]['content'].split('Catalog rows (JSON): ', 1)[1])
+        return {'content': ', '.join(f"{row['name']} costs ${row['price']}" for row in rows), 'source': 'llm'}
+
+
+class StubDatabaseService:
+    def __init__(self):
+        self.stored = []
+
+    def get_conversation_history(self, conversation_id, limit=10):
+        return []
+
+    def store_interaction(self, interaction_data, task_queue=None):
+        self.stored.append(interaction_data)
+
+
+def test_repeat_shape_skips_planning(database_url):
+    llm_client, database_service = StubLLMClient(), StubDatabaseService()
+    service = LLMIntegrationService(None, database_service, llm_client, database_url=database_url)
+
+    first = service.query_database_and_respond("What is the price of the USB Cable?", 'c1')
+    second = service.query_database_and_respond("What is the price of the Smartphone Case?", 'c1')
+
+    assert first['response'] == 'USB Cable costs $12.99'
+    assert second['response'] == 'Smartphone Case costs $19.99'
+    assert len(llm_client.planned) == 1
+    assert service.stats == {'template_hits': 1, 'planned': 1, 'plan_failures': 0}
+    assert database_service.stored[1]['database_results'] == [{'name': 'Smartphone Case', 'price': 19.99}]
+    service.catalog_engine.dispose()
+
+
+def test_catalog_entities_load_after_a_failed_read(database_url, tmp_path):
+    service = LLMIntegrationService(None, StubDatabaseService(), StubLLMClient(), database_url=database_url)
+    catalog_engine = service.catalog_engine
+    service.catalog_engine = create_engine(f"sqlite:///{tmp_path / 'missing' / 'catalog.db'}")
+
+    service._load_entities()
+    assert not service._entities_loaded
+    assert service.templates.shape("What is the price of the USB Cable?").slots == []
+
+    service.catalog_engine = catalog_engine
+    service._load_entities()
+    assert service._entities_loaded
+    assert service.templates.shape("What is the price of the USB Cable?").slots == [('product', 'USB Cable')]
+    catalog_engine.dispose()
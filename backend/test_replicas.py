@@ -0,0 +1,16 @@
+# test_replicas.py - Read routes fall back to the primary when a replica fails
+
+from services.replica_router import ReplicaSet
+
+
+def test_health_falls_back_to_primary_and_marks_a_failed_replica_down(flask_app, tmp_path, monkeypatch):
+    assert flask_app.init_database()
+    broken = ReplicaSet([f"sqlite:///{tmp_path / 'missing' / 'replica.db'}"], retry_after=60)
+    monkeypatch.setattr(flask_app, 'replicas', broken)
+
+    response = flask_app.app.test_client().get('/api/health')
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['read_source'] == 'primary'
+    assert body['replicas'] == [{'replica': 0, 'healthy': False}]
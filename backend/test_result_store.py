@@ -0,0 +1,114 @@
+# test_result_store.py - Inline vs out-of-line database_results, dedup, truncation and lazy loading
+
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import Session
+
+from config.models.conversation import Base, Conversation, ResultBlob, upgrade_schema
+from services import result_store
+
+ROWS = [{'id': f"p{i}", 'name': f"Product {i}", 'price': Decimal('9.99'), 'created_at': datetime(2024, 1, 1)}
+        for i in range(200)]
+
+
+def test_small_results_stay_inline():
+    packed = result_store.pack([{'name': 'USB Cable'}], inline_max_bytes=1024, max_bytes=4096)
+    assert not packed.out_of_line
+    assert packed.inline == [{'name': 'USB Cable'}]
+    assert not result_store.pack(None, 1024, 4096).out_of_line
+    assert result_store.fits_inline([{'name': 'USB Cable'}], 1024) and result_store.fits_inline(None, 0)
+    assert not result_store.fits_inline(ROWS, 1024)
+
+
+def test_large_results_are_compressed_and_content_addressed():
+    packed = result_store.pack(ROWS, inline_max_bytes=1024, max_bytes=1 << 20)
+    assert packed.out_of_line and not packed.truncated
+    assert len(packed.data) < packed.raw_size / 4
+    assert packed.row_count == packed.stored_rows == 200
+    assert result_store.decode(packed.data)[0] == {'created_at': '2024-01-01T00:00:00', 'id': 'p0',
+                                                   'name': 'Product 0', 'price': 9.99}
+    # Key order doesn't change the digest
+    reordered = [dict(reversed(list(row.items()))) for row in ROWS]
+    assert result_store.pack(reordered, 1024, 1 << 20).digest == packed.digest
+
+
+def test_oversized_results_are_truncated():
+    packed = result_store.pack(ROWS, inline_max_bytes=1024, max_bytes=4096)
+    assert packed.truncated and packed.row_count == 200
+    assert 0 < packed.stored_rows < 200
+    assert packed.raw_size <= 4096
+    assert result_store.decode(packed.data) == result_store.decode(
+        result_store.pack(ROWS[:packed.stored_rows], 1024, 1 << 20).data)
+
+    blob = result_store.pack({'rows': ROWS}, inline_max_bytes=1024, max_bytes=4096)
+    assert blob.truncated and result_store.decode(blob.data) is None
+
+
+def test_history_reads_never_load_results():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    packed = result_store.pack(ROWS, inline_max_bytes=1024, max_bytes=1 << 20)
+    with Session(engine) as db:
+        db.add(ResultBlob(digest=packed.digest, data=packed.data, raw_size=packed.raw_size,
+                          row_count=packed.row_count, stored_rows=packed.stored_rows, truncated=packed.truncated))
+        db.add(Conversation(conversation_id='c1', user_message='list products', ai_response='...',
+                            interaction_type='response', results_digest=packed.digest))
+        db.commit()
+
+    with Session(engine) as db:
+        interaction = db.query(Conversation).one()
+        assert 'database_results' not in interaction.__dict__
+        with pytest.raises(InvalidRequestError):
+            interaction.results_blob
+        blob = db.get(ResultBlob, interaction.results_digest)
+        assert len(result_store.decode(blob.data)) == 200
+    engine.dispose()
+
+
+def test_history_flags_inline_and_out_of_line_results_without_loading_them():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        blob = result_store.pack(ROWS, inline_max_bytes=1024, max_bytes=1 << 20)
+        db.add(ResultBlob(digest=blob.digest, data=blob.data, raw_size=blob.raw_size,
+                          row_count=blob.row_count, stored_rows=blob.stored_rows, truncated=blob.truncated))
+        for conversation_id, packed in [('inline', result_store.pack([{'id': 1}], 1024, 1 << 20)),
+                                        ('blob', blob), ('none', result_store.pack(None, 1024, 1 << 20))]:
+            db.add(Conversation(conversation_id=conversation_id, database_results=packed.inline,
+                                results_digest=packed.digest))
+        db.commit()
+    with engine.begin() as conn:
+        # Written before database_results stored None as SQL NULL
+        conn.execute(text("INSERT INTO conversations (conversation_id, database_results) VALUES ('legacy', 'null')"))
+
+    with Session(engine) as db:
+        interactions = db.query(Conversation).all()
+        assert {i.conversation_id: i.has_database_results for i in interactions} == {
+            'inline': True, 'blob': True, 'none': False, 'legacy': False}
+        assert all('database_results' not in i.__dict__ for i in interactions)
+    engine.dispose()
+
+
+def test_upgrade_brings_an_existing_table_up_to_the_model():
+    engine = create_engine('sqlite://')
+    with engine.begin() as conn:
+        # conversations as the first release created it
+        conn.execute(text("CREATE TABLE conversations (id INTEGER PRIMARY KEY, conversation_id VARCHAR, "
+                          "user_message TEXT, ai_response TEXT, interaction_type VARCHAR, "
+                          "database_results JSON, timestamp DATETIME)"))
+        conn.execute(text("CREATE UNIQUE INDEX ix_conversations_conversation_id ON conversations (conversation_id)"))
+        conn.execute(text("INSERT INTO conversations (conversation_id, user_message) VALUES ('old', 'hi')"))
+        Base.metadata.create_all(conn)
+        upgrade_schema(conn)
+        upgrade_schema(conn)  # a no-op once applied
+
+    with Session(engine) as db:
+        assert db.query(Conversation).one().results_digest is None
+        # A conversation's second turn is a second row
+        db.add(Conversation(conversation_id='old', user_message='and again'))
+        db.commit()
+    engine.dispose()
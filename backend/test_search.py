@@ -0,0 +1,87 @@
+# test_search.py - Full-text message search on SQLite FTS5: scoping, ranking, snippets and index sync
+
+import pytest
+from sqlalchemy import create_engine
+
+from models import Conversation, Message, User, db
+from services.search_service import HIGHLIGHT_END, HIGHLIGHT_START, MessageSearchService, fts5_query
+
+ALICE, BOB = 'a1b2c3d4-0000-4000-8000-00000000000a', 'a1b2c3d4-0000-4000-8000-00000000000b'
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    db.metadata.create_all(engine, tables=[User.__table__, Conversation.__table__, Message.__table__])
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [{'id': ALICE, 'username': 'alice'}, {'id': BOB, 'username': 'bob'}])
+        conn.execute(Conversation.__table__.insert(), [
+            {'id': 'ca', 'user_id': ALICE, 'title': 'Audio'},
+            {'id': 'cb', 'user_id': BOB, 'title': 'Also audio'},
+        ])
+    yield engine
+    engine.dispose()
+
+
+def add_messages(engine, rows):
+    with engine.begin() as conn:
+        conn.execute(Message.__table__.insert(), [
+            {'id': message_id, 'conversation_id': conversation_id, 'content': content, 'role': 'user'}
+            for message_id, conversation_id, content in rows
+        ])
+
+
+def search(engine, user_id, query, **kwargs):
+    with engine.connect() as conn:
+        return MessageSearchService(engine).search(conn, user_id, query, **kwargs)
+
+
+def test_fts5_query_quotes_terms_and_scopes_to_the_user():
+    assert fts5_query('wireless "head-phones" OR', ALICE) == (
+        'user_key:"a1b2c3d400004000800000000000000a" AND content:("wireless" "head" "phones" "OR"*)')
+    assert fts5_query('  ?! ', ALICE) == ''
+
+
+def test_first_ensure_index_indexes_existing_messages(engine):
+    add_messages(engine, [('m1', 'ca', 'My headphones stopped charging')])
+    MessageSearchService(engine).ensure_index()
+    assert [hit['message_id'] for hit in search(engine, ALICE, 'headphones')] == ['m1']
+
+    # Later calls keep the index without rebuilding it; triggers keep it in sync
+    MessageSearchService(engine).ensure_index()
+    add_messages(engine, [('m2', 'ca', 'New headphones arrived')])
+    with engine.begin() as conn:
+        conn.execute(Message.__table__.delete().where(Message.__table__.c.id == 'm1'))
+    assert [hit['message_id'] for hit in search(engine, ALICE, 'headphones')] == ['m2']
+
+
+def test_search_only_sees_the_users_own_messages(engine):
+    MessageSearchService(engine).ensure_index()
+    user_key = ALICE.replace('-', '')
+    add_messages(engine, [
+        ('m1', 'ca', 'Where is my headphones order?'),
+        ('m2', 'cb', 'My headphones order never came'),
+        # Another user quoting Alice's key in their content must not match her scope
+        ('m3', 'cb', f'headphones {user_key}'),
+    ])
+    assert [hit['message_id'] for hit in search(engine, ALICE, 'headphones')] == ['m1']
+    assert sorted(hit['message_id'] for hit in search(engine, BOB, 'headphones')) == ['m2', 'm3']
+    assert search(engine, ALICE, 'order never came') == []
+
+
+def test_results_are_ranked_with_highlighted_snippets(engine):
+    MessageSearchService(engine).ensure_index()
+    add_messages(engine, [
+        ('m1', 'ca', 'Is shipping free on orders over fifty dollars, or only on some items in the sale?'),
+        ('m2', 'ca', 'Free shipping? Shipping costs on headphones'),
+        ('m3', 'ca', 'Do you sell cables?'),
+    ])
+    hits = search(engine, ALICE, 'shipping')
+    assert [hit['message_id'] for hit in hits] == ['m2', 'm1']
+    assert hits[0]['rank'] <= hits[1]['rank']  # bm25: lower is better
+    assert f'{HIGHLIGHT_START}Shipping{HIGHLIGHT_END}' in hits[0]['snippet']
+    assert hits[0]['conversation_title'] == 'Audio'
+
+    # The last term matches as a prefix while the user is still typing
+    assert [hit['message_id'] for hit in search(engine, ALICE, 'cab')] == ['m3']
+    assert [hit['message_id'] for hit in search(engine, ALICE, 'shipping', limit=1, offset=1)] == ['m1']
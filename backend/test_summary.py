@@ -0,0 +1,82 @@
+# test_summary.py - Rolling conversation summaries: the fold, the context and the summary task
+
+from services.summary_service import RollingSummarizer
+from services.task_queue import background_tasks
+
+
+def message(role, content):
+    return {'role': role, 'content': content}
+
+
+def test_fold_keeps_first_sentences_and_drops_the_oldest_lines():
+    summarizer = RollingSummarizer(max_chars=75, snippet_chars=30)
+    summary = summarizer.fold(None, [
+        message('user', 'Do you sell headphones? I need a pair for travel.'),
+        message('assistant', 'x' * 50),
+    ])
+    assert summary == 'user: Do you sell headphones?\nassistant: ' + 'x' * 27 + '...'
+
+    summary = summarizer.fold(summary, [message('user', 'Which one is cheapest? Thanks.')])
+    assert len(summary) <= 75
+    # The oldest line gave way to the newest one
+    assert summary.splitlines() == ['assistant: ' + 'x' * 27 + '...', 'user: Which one is cheapest?']
+    assert summarizer.fold(summary, []) == summary
+
+
+def test_fold_truncates_a_custom_summary_to_max_chars():
+    summarizer = RollingSummarizer(max_chars=10, summarize_fn=lambda summary, messages: summary + 'abcdefghijklmnop')
+    assert summarizer.fold('', [message('user', 'hello')]) == 'abcdefghij'
+
+
+def test_build_context_puts_the_summary_before_recent_turns():
+    recent = [message('user', 'And in blue?'), message('assistant', 'Yes, blue is in stock.')]
+
+    context = RollingSummarizer.build_context('user: Do you sell headphones?', recent)
+
+    assert context[0] == {'role': 'system', 'content': 'Summary of earlier conversation:\nuser: Do you sell headphones?'}
+    assert context[1:] == recent
+    assert RollingSummarizer.build_context(None, recent) == recent
+
+
+def test_summary_task_is_triggered_and_folds_each_message_once(flask_app, monkeypatch):
+    monkeypatch.setattr(flask_app.settings, 'SUMMARY_TRIGGER_MESSAGES', 4)
+    monkeypatch.setattr(flask_app.settings, 'SUMMARY_KEEP_RECENT', 2)
+    assert flask_app.init_database()
+    client = flask_app.app.test_client()
+    conversation_id = None
+
+    def chat(text):
+        nonlocal conversation_id
+        body = {'message': text, 'user_id': 'summary_user', 'conversation_id': conversation_id}
+        conversation_id = client.post('/api/chat', json=body).get_json()['conversation_id']
+
+    def summary_queued():
+        with flask_app.app.app_context():
+            return flask_app.db.session.execute(flask_app.db.select(background_tasks.c.id).where(
+                background_tasks.c.dedupe_key == f"summary:{conversation_id}")).first() is not None
+
+    def summary():
+        with flask_app.app.app_context():
+            return flask_app.db.session.get(flask_app.ConversationSummary, conversation_id)
+
+    chat('Question one.')
+    chat('Question two.')
+    assert not summary_queued()  # 4 messages: at the threshold, not over it
+    chat('Question three.')
+    assert summary_queued()
+
+    # 6 messages, 2 kept recent: the first two turns are folded
+    flask_app.update_conversation_summary({'conversation_id': conversation_id})
+    first = summary()
+    assert first.summarized_count == 4
+    assert [line.split(': ')[0] for line in first.summary.splitlines()] == ['user', 'assistant'] * 2
+    assert first.summary.startswith('user: Question one.')
+
+    # Two more messages: only the turn that left the recent window is appended
+    chat('Question four.')
+    flask_app.update_conversation_summary({'conversation_id': conversation_id})
+    second = summary()
+    assert second.summarized_count == 6
+    assert second.summary.startswith(first.summary + '\n')
+    assert second.summary.splitlines()[4] == 'user: Question three.'
+    assert second.summary.count('user: Question one.') == 1
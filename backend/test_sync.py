@@ -0,0 +1,46 @@
+# test_sync.py - The per-user change counter and change log retention
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+
+def test_concurrent_first_changes_get_disjoint_ranges(flask_app):
+    assert flask_app.init_database()
+    with flask_app.app.app_context():
+        owner_id = flask_app.resolve_user_id('sync_race_user', create=True)
+
+    def write(i):
+        with flask_app.app.app_context():
+            last_seq = flask_app.record_changes(owner_id, [('message', f'm{i}a', 'c'), ('message', f'm{i}b', 'c')])
+            flask_app.db.session.commit()
+            return last_seq
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        last_seqs = sorted(pool.map(write, range(8)))
+    assert last_seqs == list(range(2, 17, 2))
+    with flask_app.app.app_context():
+        seqs = flask_app.db.session.execute(
+            flask_app.db.select(flask_app.ChangeLog.seq).where(flask_app.ChangeLog.user_id == owner_id)
+        ).scalars().all()
+    assert sorted(seqs) == list(range(1, 17))
+
+
+def test_cursor_behind_pruned_changes_must_resync(flask_app):
+    assert flask_app.init_database()
+    client = flask_app.app.test_client()
+    conversation_id = None
+    for text in ['Do you sell running shoes?', 'What about trail shoes?']:
+        body = {'message': text, 'user_id': 'sync_prune_user', 'conversation_id': conversation_id}
+        conversation_id = client.post('/api/chat', json=body).get_json()['conversation_id']
+    cursor = client.get('/api/sync?user_id=sync_prune_user&since=0').get_json()['cursor']
+    assert cursor > 2
+
+    with flask_app.app.app_context():
+        flask_app.prune_change_log(flask_app.db.engine, datetime.utcnow() + timedelta(days=1), batch_size=2)
+
+    # The newest change survives, so an up-to-date cursor is still just up to date
+    current = client.get(f'/api/sync?user_id=sync_prune_user&since={cursor}').get_json()
+    assert current['resync'] is False and current['cursor'] == cursor
+    for since in (0, 1):
+        stale = client.get(f'/api/sync?user_id=sync_prune_user&since={since}').get_json()
+        assert stale['resync'] is True and stale['cursor'] == cursor and stale['messages'] == []
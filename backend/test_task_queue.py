@@ -0,0 +1,147 @@
+# test_task_queue.py - Transactional enqueue, retry with backoff, dedupe and lease recovery
+
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, select, update
+
+from services.task_queue import TaskQueue, background_tasks, task_metadata
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tasks.db'}")
+    task_metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def make_queue(engine, **kwargs):
+    return TaskQueue(lambda: [engine], retry_base_seconds=0.0, **kwargs)
+
+
+def rows(engine):
+    with engine.connect() as conn:
+        return conn.execute(select(background_tasks)).all()
+
+
+def test_task_exists_only_if_its_transaction_commits(engine):
+    queue = make_queue(engine)
+    done = []
+    queue.register('echo')(done.append)
+
+    with pytest.raises(RuntimeError):
+        with engine.begin() as conn:
+            queue.enqueue(conn, 'echo', {'n': 1})
+            raise RuntimeError("request failed after enqueue")
+    with engine.begin() as conn:
+        queue.enqueue(conn, 'echo', {'n': 2, 'at': datetime(2024, 1, 1)})
+
+    assert queue.run_pending() == 1
+    assert done == [{'n': 2, 'at': '2024-01-01T00:00:00'}]
+    assert rows(engine) == []
+
+    with pytest.raises(ValueError):
+        with engine.begin() as conn:
+            queue.enqueue(conn, 'unknown', {})
+
+
+def test_failures_retry_then_park_as_failed(engine):
+    queue = make_queue(engine, max_attempts=3)
+    calls = []
+
+    @queue.register('flaky')
+    def flaky(payload):
+        calls.append(payload)
+        if len(calls) < 2:
+            raise ConnectionError("upstream down")
+
+    @queue.register('broken')
+    def broken(payload):
+        raise ValueError("bad payload")
+
+    with engine.begin() as conn:
+        queue.enqueue(conn, 'flaky', {})
+        queue.enqueue(conn, 'broken', {}, dedupe_key='broken:1')
+
+    for _ in range(4):
+        queue.run_pending()
+    assert len(calls) == 2
+    [failed] = rows(engine)
+    assert failed.name == 'broken' and failed.status == 'failed' and failed.attempts == 3
+    assert 'bad payload' in failed.last_error and failed.dedupe_key is None
+    assert queue.stats == {'enqueued': 2, 'succeeded': 1, 'retried': 3, 'failed': 1}
+
+
+def test_dedupe_key_keeps_one_queued_task(engine):
+    queue = make_queue(engine)
+    queue.register('summary')(lambda payload: None)
+    for _ in range(3):
+        with engine.begin() as conn:
+            queue.enqueue(conn, 'summary', {'conversation_id': 'c1'}, dedupe_key='summary:c1')
+    assert len(rows(engine)) == 1
+    queue.run_pending()
+    with engine.begin() as conn:
+        queue.enqueue(conn, 'summary', {'conversation_id': 'c1'}, dedupe_key='summary:c1')
+    assert len(rows(engine)) == 1
+
+
+def test_expired_lease_is_reclaimed(engine):
+    queue = make_queue(engine, lease_seconds=60)
+    done = []
+    queue.register('echo')(done.append)
+    with engine.begin() as conn:
+        queue.enqueue(conn, 'echo', {'n': 1})
+
+    # A worker claims the task and dies before finishing it
+    [claimed] = queue._claim(engine, 10)
+    assert queue.run_pending() == 0
+    with engine.begin() as conn:
+        conn.execute(update(background_tasks).values(run_after=datetime.utcnow() - timedelta(seconds=1)))
+    assert queue.run_pending() == 1
+    assert done == [{'n': 1}] and claimed.attempts == 1
+
+
+def test_worker_pool_runs_tasks_after_notify(engine):
+    queue = make_queue(engine, max_workers=2, poll_seconds=5)
+    done = []
+    queue.register('echo')(lambda payload: done.append(payload['n']))
+    queue.start()
+    try:
+        with engine.begin() as conn:
+            for n in range(5):
+                queue.enqueue(conn, 'echo', {'n': n})
+        queue.notify()
+        deadline = time.monotonic() + 3
+        while len(done) < 5 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        queue.stop()
+    assert sorted(done) == [0, 1, 2, 3, 4]
+
+
+def test_failed_claim_gives_its_worker_slots_back(engine):
+    queue = make_queue(engine, max_workers=2, poll_seconds=0.05)
+    done = []
+    queue.register('echo')(lambda payload: done.append(payload['n']))
+    claim = queue._claim
+    failures = []
+
+    def flaky_claim(engine, limit):
+        if not failures:
+            failures.append(limit)
+            raise RuntimeError('database is locked')
+        return claim(engine, limit)
+
+    queue._claim = flaky_claim
+    with engine.begin() as conn:
+        queue.enqueue(conn, 'echo', {'n': 1})
+    queue.start()
+    try:
+        deadline = time.monotonic() + 3
+        while not done and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        queue.stop()
+    assert failures == [2] and done == [1]
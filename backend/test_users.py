@@ -0,0 +1,58 @@
+# test_users.py - Username to user id resolution: get-or-create, ownership and the id cache
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine
+
+
+def count_users(flask_app, username):
+    with flask_app.app.app_context():
+        return flask_app.User.query.filter_by(username=username).count()
+
+
+def test_concurrent_get_or_create_makes_one_user(flask_app):
+    assert flask_app.init_database()
+    flask_app.user_ids.clear()
+    start = threading.Barrier(8)
+
+    def resolve(_):
+        with flask_app.app.test_request_context():
+            start.wait()
+            return flask_app.resolve_user_id('race_user', create=True)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        owner_ids = set(pool.map(resolve, range(8)))
+    assert len(owner_ids) == 1
+    assert count_users(flask_app, 'race_user') == 1
+
+
+def test_unknown_or_foreign_conversation_creates_no_user(flask_app):
+    assert flask_app.init_database()
+    client = flask_app.app.test_client()
+    owned = client.post('/api/chat', json={'message': 'Hello there', 'user_id': 'owner_user'}).get_json()
+
+    for conversation_id in (owned['conversation_id'], 'no-such-conversation'):
+        response = client.post('/api/chat', json={'message': 'Hi', 'user_id': 'intruder_user',
+                                                  'conversation_id': conversation_id})
+        assert response.status_code == 404
+    assert count_users(flask_app, 'intruder_user') == 0
+
+
+def test_cached_ids_are_per_shard(flask_app, tmp_path):
+    engines = [create_engine(f"sqlite:///{tmp_path / f'shard{i}.db'}") for i in range(2)]
+    for engine in engines:
+        flask_app.User.__table__.create(engine)
+
+    def resolve_on(engine, create=False):
+        with flask_app.app.test_request_context():
+            flask_app.g.db_shard = engine
+            return flask_app.resolve_user_id('sharded_user', create=create)
+
+    first = resolve_on(engines[0], create=True)
+    assert resolve_on(engines[1]) is None  # not served from the other shard's entry
+    second = resolve_on(engines[1], create=True)
+    assert first != second
+    hits = flask_app.user_ids.hits
+    assert resolve_on(engines[0]) == first and resolve_on(engines[1]) == second
+    assert flask_app.user_ids.hits == hits + 2
@@ -0,0 +1,59 @@
+import React from 'react';
+import { render, act } from '@testing-library/react';
+import MessageList from './MessageList';
+
+// Render benchmark for long threads. Timings are logged for comparison
+// across changes; the assertions only guard that the list stays windowed.
+
+const THREAD_SIZE = 10000;
+
+const makeThread = (count) => {
+  const start = Date.now() - count * 1000;
+  const messages = new Array(count);
+  for (let i = 0; i < count; i++) {
+    messages[i] = {
+      id: `m${i}`,
+      text: `Message ${i} in a very long support conversation`,
+      sender: i % 2 === 0 ? 'user' : 'ai',
+      timestamp: new Date(start + i * 1000).toISOString()
+    };
+  }
+  return messages;
+};
+
+test(`renders a ${THREAD_SIZE}-message thread with a bounded number of rows`, () => {
+  const messages = makeThread(THREAD_SIZE);
+
+  const started = performance.now();
+  const { container } = render(<MessageList messages={messages} version={0} height={600} />);
+  const initialRenderMs = performance.now() - started;
+
+  const mountedRows = container.querySelectorAll('.message').length;
+  console.log(`[bench] initial render of ${THREAD_SIZE} messages: ${initialRenderMs.toFixed(1)}ms, ${mountedRows} rows mounted`);
+
+  expect(mountedRows).toBeGreaterThan(0);
+  expect(mountedRows).toBeLessThan(100);
+});
+
+test(`appending to a ${THREAD_SIZE}-message thread re-renders only the window`, () => {
+  const messages = makeThread(THREAD_SIZE);
+  const { container, rerender } = render(<MessageList messages={messages} version={0} height={600} />);
+
+  const appends = 200;
+  const started = performance.now();
+  for (let i = 0; i < appends; i++) {
+    messages.push({
+      id: `new${i}`,
+      text: `Appended message ${i}`,
+      sender: 'user',
+      timestamp: new Date().toISOString()
+    });
+    act(() => {
+      rerender(<MessageList messages={messages} version={i + 1} height={600} />);
+    });
+  }
+  const perAppendMs = (performance.now() - started) / appends;
+
+  console.log(`[bench] append to ${THREAD_SIZE}-message thread: ${perAppendMs.toFixed(2)}ms per message`);
+  expect(container.querySelectorAll('.message').length).toBeLessThan(100);
+});
@@ -0,0 +1,152 @@
+import React, { useState, useEffect, useLayoutEffect, useRef, useCallback, useMemo } from 'react';
+
+const ESTIMATED_ROW_HEIGHT = 72;
+const OVERSCAN_PX = 400;
+const TOP_THRESHOLD_PX = 200;
+const BOTTOM_STICK_PX = 80;
+
+// Binary search for the first row whose bottom edge is below `offset`
+const findStartIndex = (offsets, count, offset) => {
+  let lo = 0;
+  let hi = count - 1;
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1;
+    if (offsets[mid + 1] <= offset) lo = mid + 1;
+    else hi = mid;
+  }
+  return lo;
+};
+
+const MessageRow = React.memo(({ message, onHeight }) => {
+  const ref = useRef(null);
+
+  useLayoutEffect(() => {
+    const node = ref.current;
+    if (!node) return undefined;
+    onHeight(message.id, node.offsetHeight);
+    if (typeof ResizeObserver === 'undefined') return undefined;
+    const observer = new ResizeObserver(() => onHeight(message.id, node.offsetHeight));
+    observer.observe(node);
+    return () => observer.disconnect();
+  }, [message.id, onHeight]);
+
+  return (
+    <div ref={ref} className={`message message-${message.sender}${message.isError ? ' message-error' : ''}`}>
+      <div className="message-text">{message.text}</div>
+      <div className="message-time">
+        {new Date(message.timestamp).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' })}
+      </div>
+    </div>
+  );
+});
+
+/**
+ * Windowed message list: only rows intersecting the viewport (plus overscan)
+ * are mounted. Row heights are measured as they render and cached by message
+ * id; unmeasured rows use an estimate. Scrolling near the top calls
+ * `onLoadOlder`, and the scroll position is preserved when older rows are
+ * prepended. The list only follows new messages while the user is already
+ * at the bottom.
+ *
+ * `messages` may be mutated in place by the owner as long as `version` is
+ * bumped, so appending a message does not copy the whole thread.
+ */
+const MessageList = ({ messages, version = 0, isLoading, hasMore = false, isLoadingOlder = false, onLoadOlder, height }) => {
+  const containerRef = useRef(null);
+  const heightsRef = useRef(new Map());
+  const stickToBottomRef = useRef(true);
+  const anchorRef = useRef(null);
+  const [scrollTop, setScrollTop] = useState(0);
+  const [viewportHeight, setViewportHeight] = useState(height || 600);
+  const [measureVersion, setMeasureVersion] = useState(0);
+
+  const onHeight = useCallback((id, rowHeight) => {
+    // Zero means the row isn't laid out (hidden, or no layout engine); keep the estimate
+    if (rowHeight && heightsRef.current.get(id) !== rowHeight) {
+      heightsRef.current.set(id, rowHeight);
+      setMeasureVersion(v => v + 1);
+    }
+  }, []);
+
+  const offsets = useMemo(() => {
+    const result = new Float64Array(messages.length + 1);
+    for (let i = 0; i < messages.length; i++) {
+      result[i + 1] = result[i] + (heightsRef.current.get(messages[i].id) || ESTIMATED_ROW_HEIGHT);
+    }
+    return result;
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [messages, messages.length, version, measureVersion]);
+
+  const totalHeight = offsets[messages.length];
+
+  useEffect(() => {
+    const node = containerRef.current;
+    if (!node || height) return undefined;
+    setViewportHeight(node.clientHeight || viewportHeight);
+    if (typeof ResizeObserver === 'undefined') return undefined;
+    const observer = new ResizeObserver(() => setViewportHeight(node.clientHeight));
+    observer.observe(node);
+    return () => observer.disconnect();
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [height]);
+
+  // Keep the first visible message in place when older pages are prepended
+  useLayoutEffect(() => {
+    const node = containerRef.current;
+    const anchor = anchorRef.current;
+    if (!node) return;
+    if (anchor) {
+      const index = messages.findIndex(m => m.id === anchor.id);
+      if (index >= 0) node.scrollTop = offsets[index] + anchor.delta;
+      anchorRef.current = null;
+    } else if (stickToBottomRef.current) {
+      node.scrollTop = totalHeight;
+    }
+  }, [messages, offsets, totalHeight]);
+
+  const handleScroll = () => {
+    const node = containerRef.current;
+    if (!node) return;
+    setScrollTop(node.scrollTop);
+    stickToBottomRef.current = node.scrollHeight - node.scrollTop - node.clientHeight < BOTTOM_STICK_PX;
+
+    if (node.scrollTop < TOP_THRESHOLD_PX && hasMore && !isLoadingOlder && onLoadOlder && messages.length) {
+      const index = findStartIndex(offsets, messages.length, node.scrollTop);
+      anchorRef.current = { id: messages[index].id, delta: node.scrollTop - offsets[index] };
+      onLoadOlder();
+    }
+  };
+
+  let start = 0;
+  let end = 0;
+  if (messages.length) {
+    start = findStartIndex(offsets, messages.length, Math.max(0, scrollTop - OVERSCAN_PX));
+    end = start;
+    const bottom = scrollTop + viewportHeight + OVERSCAN_PX;
+    while (end < messages.length && offsets[end] < bottom) end++;
+  }
+
+  const rows = [];
+  for (let i = start; i < end; i++) {
+    rows.push(<MessageRow key={messages[i].id} message={messages[i]} onHeight={onHeight} />);
+  }
+
+  return (
+    <div
+      ref={containerRef}
+      className="message-list"
+      onScroll={handleScroll}
+      style={{ overflowY: 'auto', position: 'relative', height: height || '100%' }}
+    >
+      {isLoadingOlder && <div className="message-list-loading" style={{ position: 'sticky', top: 0, height: 0, overflow: 'visible', zIndex: 1 }}>Loading earlier messages...</div>}
+      <div style={{ height: totalHeight, position: 'relative' }}>
+        <div style={{ position: 'absolute', top: offsets[start], left: 0, right: 0 }}>
+          {rows}
+        </div>
+      </div>
+      {isLoading && <div className="message-list-typing">AI is thinking...</div>}
+    </div>
+  );
+};
+
+export default MessageList;
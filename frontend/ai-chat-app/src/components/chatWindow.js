@@ -1,79 +1,169 @@
-import React, { useState, useEffect, useRef } from 'react';
+import React, { useState, useEffect, useRef, useCallback } from 'react';
 import MessageList from './MessageList';
 import UserInput from './UserInput';
 import ApiService from '../services/api';
 
+const PAGE_SIZE = 50;
+
+// Backend rows use content/role; the UI uses text/sender
+const normalizeMessage = (msg) => ({
+  id: msg.id,
+  text: msg.text ?? msg.content,
+  sender: msg.sender || (msg.role === 'assistant' ? 'ai' : msg.role),
+  timestamp: msg.timestamp,
+  isError: msg.isError
+});
+
 const ChatWindow = ({ currentConversationId, onNewConversation }) => {
-  const [messages, setMessages] = useState([]);
+  // The thread lives in a ref and is mutated in place; `version` tells the
+  // list to re-render, so appending never copies the whole history.
+  const messagesRef = useRef([]);
+  const [version, setVersion] = useState(0);
   const [isLoading, setIsLoading] = useState(false);
-  const messagesEndRef = useRef(null);
+  const [isLoadingOlder, setIsLoadingOlder] = useState(false);
+  const [hasMore, setHasMore] = useState(false);
+  const nextBeforeRef = useRef(null);
+  const loadTokenRef = useRef(0);
+  const seenIdsRef = useRef(new Set());
+  const pendingSendsRef = useRef(new Map());
+  const conversationIdRef = useRef(currentConversationId);
+  conversationIdRef.current = currentConversationId;
+
+  const appendMessage = (message) => {
+    seenIdsRef.current.add(message.id);
+    messagesRef.current.push(message);
+    setVersion(v => v + 1);
+  };
+
+  const resetMessages = (messages) => {
+    seenIdsRef.current = new Set(messages.map(m => m.id));
+    messagesRef.current = messages;
+    setVersion(v => v + 1);
+  };
 
-  const scrollToBottom = () => {
-    messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
+  // Give an optimistic local message its server id so pushes don't duplicate it
+  const confirmLocalMessage = (content, serverId) => {
+    const local = pendingSendsRef.current.get(content);
+    if (!local) return false;
+    pendingSendsRef.current.delete(content);
+    local.id = serverId;
+    seenIdsRef.current.add(serverId);
+    return true;
   };
 
   useEffect(() => {
-    scrollToBottom();
-  }, [messages]);
+    return ApiService.subscribeToEvents({
+      messages: (event) => {
+        if (event.conversation.id !== conversationIdRef.current) return;
+        let changed = false;
+        event.messages.forEach((raw) => {
+          if (seenIdsRef.current.has(raw.id)) return;
+          if (raw.role === 'user' && confirmLocalMessage(raw.content, raw.id)) return;
+          seenIdsRef.current.add(raw.id);
+          messagesRef.current.push(normalizeMessage(raw));
+          changed = true;
+        });
+        if (changed) setVersion(v => v + 1);
+      },
+      resync: () => {
+        if (conversationIdRef.current) loadConversationHistory(conversationIdRef.current);
+      }
+    });
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, []);
 
   useEffect(() => {
     if (currentConversationId) {
       loadConversationHistory(currentConversationId);
     } else {
-      setMessages([]);
+      loadTokenRef.current += 1;
+      nextBeforeRef.current = null;
+      setHasMore(false);
+      resetMessages([]);
     }
   }, [currentConversationId]);
 
   const loadConversationHistory = async (conversationId) => {
+    const token = ++loadTokenRef.current;
     try {
       setIsLoading(true);
-      const history = await ApiService.getConversationHistory(conversationId);
-      setMessages(history.messages || []);
+      const page = await ApiService.getConversationMessagesPage(conversationId, { limit: PAGE_SIZE });
+      if (token !== loadTokenRef.current) return;
+      nextBeforeRef.current = page.next_before;
+      setHasMore(Boolean(page.has_more));
+      resetMessages((page.messages || []).map(normalizeMessage));
     } catch (error) {
       console.error('Failed to load conversation history:', error);
     } finally {
-      setIsLoading(false);
+      if (token === loadTokenRef.current) setIsLoading(false);
     }
   };
 
+  const loadOlderMessages = useCallback(async () => {
+    if (!currentConversationId || !nextBeforeRef.current || isLoadingOlder) return;
+    const token = loadTokenRef.current;
+    try {
+      setIsLoadingOlder(true);
+      const page = await ApiService.getConversationMessagesPage(currentConversationId, {
+        before: nextBeforeRef.current,
+        limit: PAGE_SIZE
+      });
+      if (token !== loadTokenRef.current) return;
+      nextBeforeRef.current = page.next_before;
+      setHasMore(Boolean(page.has_more));
+      const older = (page.messages || []).map(normalizeMessage);
+      older.forEach(m => seenIdsRef.current.add(m.id));
+      messagesRef.current.unshift(...older);
+      setVersion(v => v + 1);
+    } catch (error) {
+      console.error('Failed to load older messages:', error);
+    } finally {
+      setIsLoadingOlder(false);
+    }
+  }, [currentConversationId, isLoadingOlder]);
+
   const handleSendMessage = async (messageText) => {
     if (!messageText.trim()) return;
 
-    const userMessage = {
-      id: Date.now(),
+    const localMessage = {
+      id: `local-${Date.now()}`,
       text: messageText,
       sender: 'user',
       timestamp: new Date().toISOString()
     };
-
-    setMessages(prev => [...prev, userMessage]);
+    pendingSendsRef.current.set(messageText, localMessage);
+    appendMessage(localMessage);
     setIsLoading(true);
 
     try {
       const response = await ApiService.sendMessage(messageText, currentConversationId);
-      
-      const aiMessage = {
-        id: Date.now() + 1,
-        text: response.response,
-        sender: 'ai',
-        timestamp: new Date().toISOString()
-      };
 
-      setMessages(prev => [...prev, aiMessage]);
+      if (response.user_message) {
+        confirmLocalMessage(messageText, response.user_message.id);
+      }
+      // The push channel may already have delivered the reply
+      if (!response.ai_response || !seenIdsRef.current.has(response.ai_response.id)) {
+        appendMessage({
+          id: response.ai_response?.id || `local-${Date.now() + 1}`,
+          text: response.ai_response?.content ?? response.response,
+          sender: 'ai',
+          timestamp: response.ai_response?.timestamp || new Date().toISOString()
+        });
+      }
 
       // If this is a new conversation, notify parent component
       if (!currentConversationId && response.conversation_id) {
         onNewConversation(response.conversation_id);
       }
     } catch (error) {
-      const errorMessage = {
-        id: Date.now() + 1,
+      pendingSendsRef.current.delete(messageText);
+      appendMessage({
+        id: `local-${Date.now() + 1}`,
         text: 'Sorry, I encountered an error. Please try again.',
         sender: 'ai',
         timestamp: new Date().toISOString(),
         isError: true
-      };
-      setMessages(prev => [...prev, errorMessage]);
+      });
     } finally {
       setIsLoading(false);
     }
@@ -84,20 +174,22 @@ const ChatWindow = ({ currentConversationId, onNewConversation }) => {
       <div className="chat-header">
         <h2>Customer Support Chat</h2>
       </div>
-      
-      <MessageList 
-        messages={messages} 
+
+      <MessageList
+        messages={messagesRef.current}
+        version={version}
         isLoading={isLoading}
+        hasMore={hasMore}
+        isLoadingOlder={isLoadingOlder}
+        onLoadOlder={loadOlderMessages}
       />
-      
-      <UserInput 
-        onSendMessage={handleSendMessage} 
+
+      <UserInput
+        onSendMessage={handleSendMessage}
         disabled={isLoading}
       />
-      
-      <div ref={messagesEndRef} />
     </div>
   );
 };
 
-export default ChatWindow;
\ No newline at end of file
+export default ChatWindow;
@@ -1,6 +1,32 @@
+import conversationCache from './conversationCache';
+
 const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:5000';
 
 class ApiService {
+  // GET with ETag revalidation against the local conversation cache
+  async cachedGet(url) {
+    const cached = await conversationCache.get(url);
+    const headers = cached?.etag ? { 'If-None-Match': cached.etag } : {};
+
+    // no-store keeps the browser's HTTP cache out of the way; we revalidate ourselves
+    const response = await fetch(url, { headers, cache: 'no-store' });
+
+    if (response.status === 304 && cached) {
+      return cached.body;
+    }
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const body = await response.json();
+    const etag = response.headers.get('ETag');
+    if (etag) {
+      await conversationCache.put(url, etag, body);
+    }
+    return body;
+  }
+
   async sendMessage(message, conversationId = null) {
     try {
       const response = await fetch(`${API_BASE_URL}/api/chat`, {
@@ -27,28 +53,62 @@ class ApiService {
 
   async getConversationHistory(conversationId) {
     try {
-      const response = await fetch(`${API_BASE_URL}/api/conversations/${conversationId}`);
-      
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
-      }
-
-      return await response.json();
+      return await this.cachedGet(`${API_BASE_URL}/api/conversations/${conversationId}/messages`);
     } catch (error) {
       console.error('Error fetching conversation history:', error);
       throw error;
     }
   }
 
-  async getAllConversations() {
+  async getConversationMessagesPage(conversationId, { before = null, limit = 50 } = {}) {
     try {
-      const response = await fetch(`${API_BASE_URL}/api/conversations`);
-      
+      const params = new URLSearchParams({ limit: String(limit) });
+      if (before) params.set('before', before);
+
+      return await this.cachedGet(`${API_BASE_URL}/api/conversations/${conversationId}/messages?${params}`);
+    } catch (error) {
+      console.error('Error fetching conversation messages:', error);
+      throw error;
+    }
+  }
+
+  // Changes across all conversations after `since`; pass back the returned cursor next time
+  async syncChanges(since = 0, limit = 500) {
+    try {
+      const params = new URLSearchParams({ since: String(since), limit: String(limit) });
+      const response = await fetch(`${API_BASE_URL}/api/sync?${params}`);
+
       if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
 
       return await response.json();
+    } catch (error) {
+      console.error('Error syncing changes:', error);
+      throw error;
+    }
+  }
+
+  // Live push channel (Server-Sent Events). Returns a function that closes it.
+  subscribeToEvents(handlers, since = null) {
+    const params = new URLSearchParams();
+    if (since !== null) params.set('since', String(since));
+    const source = new EventSource(`${API_BASE_URL}/api/events?${params}`);
+
+    Object.entries(handlers).forEach(([type, handler]) => {
+      source.addEventListener(type, (event) => handler(JSON.parse(event.data), event));
+    });
+    source.onerror = (error) => {
+      // EventSource reconnects by itself and resends Last-Event-ID
+      console.warn('Event stream interrupted, reconnecting:', error);
+    };
+
+    return () => source.close();
+  }
+
+  async getAllConversations() {
+    try {
+      return await this.cachedGet(`${API_BASE_URL}/api/conversations`);
     } catch (error) {
       console.error('Error fetching conversations:', error);
       throw error;
@@ -0,0 +1,78 @@
+// IndexedDB-backed cache of GET responses keyed by URL. Each entry keeps the
+// server's ETag so the next request can be revalidated with If-None-Match;
+// a 304 is then served from here without re-downloading the payload.
+// Recently used entries are also held in memory, capped at MEMORY_ENTRIES
+// with least-recently-used eviction; IndexedDB, when available, keeps the rest.
+
+const DB_NAME = 'ai-chat-cache';
+const STORE_NAME = 'responses';
+const DB_VERSION = 1;
+const MEMORY_ENTRIES = 200;
+
+class ConversationCache {
+  constructor() {
+    this.memory = new Map(); // insertion order doubles as recency order
+    this.dbPromise = null;
+  }
+
+  remember(url, entry) {
+    this.memory.delete(url);
+    this.memory.set(url, entry);
+    while (this.memory.size > MEMORY_ENTRIES) {
+      this.memory.delete(this.memory.keys().next().value);
+    }
+  }
+
+  openDb() {
+    if (typeof indexedDB === 'undefined') return Promise.resolve(null);
+    if (!this.dbPromise) {
+      this.dbPromise = new Promise((resolve) => {
+        const request = indexedDB.open(DB_NAME, DB_VERSION);
+        request.onupgradeneeded = () => {
+          request.result.createObjectStore(STORE_NAME, { keyPath: 'url' });
+        };
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => {
+          console.warn('IndexedDB unavailable, using in-memory cache:', request.error);
+          resolve(null);
+        };
+      });
+    }
+    return this.dbPromise;
+  }
+
+  async get(url) {
+    if (this.memory.has(url)) {
+      const entry = this.memory.get(url);
+      this.remember(url, entry);
+      return entry;
+    }
+    const db = await this.openDb();
+    if (!db) return null;
+    return new Promise((resolve) => {
+      const request = db.transaction(STORE_NAME, 'readonly').objectStore(STORE_NAME).get(url);
+      request.onsuccess = () => {
+        if (request.result) this.remember(url, request.result);
+        resolve(request.result || null);
+      };
+      request.onerror = () => resolve(null);
+    });
+  }
+
+  async put(url, etag, body) {
+    const entry = { url, etag, body, storedAt: Date.now() };
+    this.remember(url, entry);
+    const db = await this.openDb();
+    if (!db) return;
+    db.transaction(STORE_NAME, 'readwrite').objectStore(STORE_NAME).put(entry);
+  }
+
+  async clear() {
+    this.memory.clear();
+    const db = await this.openDb();
+    if (!db) return;
+    db.transaction(STORE_NAME, 'readwrite').objectStore(STORE_NAME).clear();
+  }
+}
+
+export default new ConversationCache();